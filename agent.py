@@ -1,33 +1,99 @@
 from datetime import datetime
-from typing import Dict, List, Tuple, Any
+from typing import Annotated, Dict, List, Tuple, Any
 from dataclasses import dataclass, field
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
-from langgraph.graph import Graph, StateGraph
-from langgraph.prebuilt import ToolExecutor
-from langchain_openai import ChatOpenAI
-from langchain.agents import Tool, AgentExecutor, create_react_agent
-from langchain_core.prompts import PromptTemplate
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 import operator
 from dotenv import load_dotenv
 import os
 import re
-
-# Added import for CDP Agentkit
-from cdp_langchain.agent_toolkits import CdpToolkit
-from cdp_langchain.utils import CdpAgentkitWrapper
+import threading
+import contextvars
+import copy
+import functools
+import hashlib
+import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
 
 # Load environment variables
 load_dotenv()
 
 # Initialize components from the provided functions
 from src.utils.github import parse_github_url, fetch_user_data, fetch_repo_data, rate_repo_activity
-from src.utils.contract_code import fetch_contract_source_code
-from src.utils.trading_data import get_details
+from src.utils.github_tokens import RateLimitExhausted
+from src.utils.contract_code import fetch_contract_source_code, split_solidity_source, estimate_tokens
+from src.utils.trading_data import TokenSnapshot, get_details, get_token_prices, with_price
+from src.utils.llm import get_chat_model
+from src.utils.cache import MISS, ResponseCache
+from src.utils.metrics import registry, span
+from src.utils.singleflight import SingleFlight
+from src.utils.prompt_budget import build_prompt
+from src.utils import scoring
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Per-branch time limits for the parallel data-gathering nodes. A branch that
+# runs over only loses its own section of the analysis.
+BRANCH_TIMEOUTS = {
+    "github_search": float(os.getenv("RESEARCH_TIMEOUT_GITHUB_SEARCH", "15")),
+    "github_research": float(os.getenv("RESEARCH_TIMEOUT_GITHUB", "30")),
+    "contract_analysis": float(os.getenv("RESEARCH_TIMEOUT_CONTRACT", "90")),
+    "token_analysis": float(os.getenv("RESEARCH_TIMEOUT_TOKEN", "20")),
+}
+
+# Pipelines that can run at once: API workers, in-process job workers and batch analyses
+CONCURRENT_PIPELINES = (
+    int(os.getenv("PIPELINE_WORKERS", "4"))
+    + int(os.getenv("JOB_WORKERS", "2"))
+    + int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+)
+# Longest a branch may wait for a free thread before it gives up, apart from its own time limit
+BRANCH_QUEUE_TIMEOUT = float(os.getenv("RESEARCH_QUEUE_TIMEOUT", "30"))
+
+# Threads that actually run branch work: three branches per pipeline, doubled
+# because a call that timed out keeps its thread until the upstream request returns
+_branch_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RESEARCH_BRANCH_WORKERS") or 3 * CONCURRENT_PIPELINES * 2),
+    thread_name_prefix="research-branch"
+)
+
 
-# Initialize search tool
-tavily_search = TavilySearchResults(max_results=3)
+def run_with_timeout(branch: str, fn, *args):
+    """
+    Run fn(*args) under the time limit for the given branch, counted from
+    when it starts running; time spent waiting for a thread has its own limit.
+    Returns (result, error) where error is a message or None.
+    """
+    timeout = BRANCH_TIMEOUTS[branch]
+    started = threading.Event()
+
+    def run():
+        started.set()
+        return fn(*args)
+
+    future = _branch_executor.submit(contextvars.copy_context().run, run)
+    if not started.wait(BRANCH_QUEUE_TIMEOUT) and future.cancel():
+        registry.inc("research_branch_timeouts_total", branch=branch, stage="queue")
+        return None, f"{branch} waited over {BRANCH_QUEUE_TIMEOUT:g}s for a free thread"
+    try:
+        return future.result(timeout=timeout), None
+    except FutureTimeout:
+        registry.inc("research_branch_timeouts_total", branch=branch, stage="run")
+        return None, f"{branch} timed out after {timeout:g}s"
+    except Exception as e:
+        return None, f"{branch} failed: {str(e)}"
+
+def traced_node(name: str, fn):
+    """Wrap a graph node so every run is timed as a "node" span"""
+    @functools.wraps(fn)
+    def node(state):
+        try:
+            with span("node", name):
+                return fn(state)
+        except Exception:
+            registry.inc("research_node_errors_total", node=name)
+            raise
+    return node
 
 @dataclass
 class AgentState:
@@ -42,18 +108,12 @@ class AgentState:
     github_url: str = None
     contract_address: str = None
     project_name: str = None
-    errors: List[str] = None
+    errors: Annotated[List[str], operator.add] = field(default_factory=list)  # Appended to by parallel branches
     conversation_history: List[Dict] = field(default_factory=list)
     context: Dict = field(default_factory=dict)
     trading_decision: str = None  # New field for trading decision
     trading_result: str = None    # New field for trading result
 
-    def __post_init__(self):
-
-        if self.errors is None:
-
-            self.errors = []
-
     def add_to_history(self, role: str, content: str):
         self.conversation_history.append({
             "role": role,
@@ -62,7 +122,13 @@ class AgentState:
 
 def initialize_trading_agent():
     """Initialize the CDP trading agent"""
-    llm = ChatOpenAI(model="gpt-4")
+    # Only needed once a trade is requested, so kept off the import path
+    from cdp_langchain.agent_toolkits import CdpToolkit
+    from cdp_langchain.utils import CdpAgentkitWrapper
+    from langchain.agents import AgentExecutor, create_react_agent
+    from langchain_core.prompts import PromptTemplate
+
+    llm = get_chat_model("gpt-4", temperature=None)
     
     # Initialize CDP Agentkit
     agentkit = CdpAgentkitWrapper()
@@ -119,6 +185,74 @@ def initialize_trading_agent():
     return agent_executor
 
 
+# Components shared by every ResearchBot in the process. They are built once,
+# lazily on first use or eagerly via warmup_shared_components(), so a new
+# session only costs an AgentState.
+_shared_components = {}
+_shared_components_lock = threading.RLock()
+
+
+def _get_shared_component(name: str, factory):
+    component = _shared_components.get(name)
+    if component is not None:
+        return component
+
+    with _shared_components_lock:
+        component = _shared_components.get(name)
+        if component is None:
+            component = factory()
+            _shared_components[name] = component
+        return component
+
+
+def create_tavily_search():
+    from langchain_community.tools.tavily_search import TavilySearchResults
+
+    return TavilySearchResults(max_results=3)
+
+
+def get_tavily_search():
+    """Return the process-wide Tavily search tool"""
+    return _get_shared_component("tavily_search", create_tavily_search)
+
+
+def get_trading_agent():
+    """Return the process-wide CDP trading agent executor"""
+    return _get_shared_component("trading_agent", initialize_trading_agent)
+
+
+def get_research_graph():
+    """Return the process-wide compiled research graph"""
+    return _get_shared_component("research_graph", create_research_graph)
+
+
+def get_trading_graph():
+    """Return the process-wide compiled trading graph"""
+    return _get_shared_component("trading_graph", create_trading_graph)
+
+
+def warmup_shared_components(include_trading_agent: bool = False):
+    """
+    Build the shared graph and LLM clients ahead of the first request.
+    The CDP trading agent is optional since it needs wallet credentials.
+    """
+    get_chat_model("gpt-4")
+    get_chat_model("gpt-4o")
+    get_research_graph()
+    get_trading_graph()
+
+    try:
+        get_tavily_search()
+    except Exception as e:
+        logger.warning("Error warming up Tavily search: %s", e)
+
+    if include_trading_agent:
+        try:
+            get_trading_agent()
+        except Exception as e:
+            logger.warning("Error warming up trading agent: %s", e)
+
+
 def execute_trade(state: AgentState, agent_executor) -> str:
     """Execute token purchase using CDP agent"""
     if not state.contract_address:
@@ -151,23 +285,21 @@ def analyze_user_input(input_text: str, llm) -> Dict:
     
     try:
         # First try to extract GitHub URL and contract address from the text
-        print('inside analyze_user_input')
         github_match = re.search(github_pattern, input_text)
         eth_address_match = re.search(eth_address_pattern, input_text)
-        print('inside analyze_user_input var',github_match, eth_address_match)
         if github_match:
-            print('inside analyze_user_input if', github_match)
+            logger.debug("Input is a GitHub URL: %s", github_match.group())
             return {"type": "github_url", "value": github_match.group(), "confidence": "high"}
         elif eth_address_match:
-            print('inside analyze_user_input elif', eth_address_match)
+            logger.debug("Input is a contract address: %s", eth_address_match.group())
             return {"type": "contract_address", "value": eth_address_match.group(), "confidence": "high"}
         
         # If no matches, treat as project name
-        print('inside analyze_user_input else', input_text)
+        logger.debug("Input treated as a project name")
         return {"type": "project_name", "value": input_text.strip(), "confidence": "medium"}
             
     except Exception as e:
-        print(f"Error during input analysis: {e}")
+        logger.warning("Error during input analysis: %s", e)
         return {"type": "project_name", "value": input_text.strip(), "confidence": "low"}
     
 def analyze_github_repo(url: str) -> Dict:
@@ -187,8 +319,12 @@ def analyze_github_repo(url: str) -> Dict:
         # Get repository data
         repo_data = fetch_repo_data(parsed["username"], parsed["repo"])
         
-        # Get user data for additional context
-        user_data = fetch_user_data(parsed["username"])
+        # Get user data for additional context; skipped when the GitHub budget runs low
+        try:
+            user_data = fetch_user_data(parsed["username"])
+        except RateLimitExhausted as e:
+            logger.warning("Skipping GitHub owner metrics for %s: %s", parsed["username"], e)
+            user_data = {"unavailable": str(e)}
         
         # Get repository rating
         repo_rating = rate_repo_activity(repo_data)
@@ -212,30 +348,127 @@ def analyze_github_repo(url: str) -> Dict:
             "rating": repo_rating,
             "url": url
         }
+        if "unavailable" in user_data:
+            # No zeros that would read as an inactive developer
+            analysis["developer"] = {"username": parsed["username"], "unavailable": user_data["unavailable"]}
         
         return analysis
         
     except Exception as e:
         return {"error": f"Failed to analyze repository: {str(e)}"}
 
-def analyze_blockchain_security(contract_code: str, llm) -> str:
-    """Analyze smart contract for security issues"""
-    prompt = """Analyze this smart contract code for:
+CONTRACT_AUDIT_PROMPT = """Analyze this smart contract code for:
     1. Security vulnerabilities (reentrancy, overflow, etc.)
     2. Access control and ownership patterns
     3. Potential centralization risks
     4. Common best practices compliance
     
+    Start each finding on its own line with its severity tag, exactly one of:
+    SEVERITY: CRITICAL, SEVERITY: HIGH, SEVERITY: MEDIUM, SEVERITY: LOW, SEVERITY: INFO
+    If there is nothing to report, write the single line SEVERITY: NONE.
+    
     Provide a clear summary of findings:
     """
+
+CONTRACT_AUDIT_MERGE_PROMPT = """The smart contract below was audited in {count} parts. Merge these per-part findings into one report:
+    - combine duplicate findings and keep the most severe assessment
+    - keep the same four sections (vulnerabilities, access control, centralization, best practices)
+    - drop parts that reported nothing of note
+    - start each finding's line with its "SEVERITY: <LEVEL>" tag as in the parts; write SEVERITY: NONE if no part found anything
     
+    Provide a clear summary of findings:
+    """
+
+# Large verified sources are audited in chunks of about this many tokens
+CONTRACT_CHUNK_TOKENS = int(os.getenv("CONTRACT_CHUNK_TOKENS", "6000"))
+CONTRACT_ANALYSIS_CONCURRENCY = int(os.getenv("CONTRACT_ANALYSIS_CONCURRENCY", "4"))
+
+# Part of every audit cache key, so editing the prompts (or the chunking)
+# invalidates old audits
+CONTRACT_AUDIT_PROMPT_VERSION = hashlib.sha256(
+    f"{CONTRACT_AUDIT_PROMPT}|{CONTRACT_AUDIT_MERGE_PROMPT}|{CONTRACT_CHUNK_TOKENS}".encode()
+).hexdigest()[:16]
+
+# Audits of deployed (immutable) code never expire; they are kept on disk
+audit_cache = ResponseCache(
+    max_entries=int(os.getenv("AUDIT_CACHE_MAX_ENTRIES", "256")),
+    ttls={"contract_audit": None},
+    path=os.getenv("AUDIT_CACHE_PATH", ".cache/contract_audits.sqlite") or None
+)
+
+# Identical sources audited at the same time (e.g. a trending token) share one audit
+audit_flights = SingleFlight("audit")
+
+def normalize_contract_source(contract_code) -> str:
+    """Canonical text of the contract files: unified line endings, no trailing whitespace"""
+    files = contract_code if isinstance(contract_code, (list, tuple)) else [contract_code]
+    return "\n\n".join(
+        "\n".join(line.rstrip() for line in str(source).replace("\r\n", "\n").split("\n")).strip()
+        for source in files
+    )
+
+def contract_audit_key(contract_code, llm) -> str:
+    """Content address of an audit: hash of (normalized source, prompt version, model name)"""
+    model_name = getattr(llm, "model_name", None) or getattr(llm, "model", "")
+    digest = hashlib.sha256()
+    for part in (normalize_contract_source(contract_code), CONTRACT_AUDIT_PROMPT_VERSION, str(model_name)):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def audit_contract_chunk(chunk: str, part: int, count: int, llm) -> str:
+    """Map step: audit one chunk of the contract source"""
+    header = f"Contract (part {part} of {count}):" if count > 1 else "Contract:"
+    message = HumanMessage(content=f"{CONTRACT_AUDIT_PROMPT}\n\n{header}\n{chunk}")
+    return llm.invoke([message]).content
+
+def merge_contract_findings(findings: List[str], llm) -> str:
+    """Reduce step: merge per-chunk findings into one report"""
+    parts = "\n\n".join(f"Part {i} findings:\n{finding}" for i, finding in enumerate(findings, 1))
+    message = HumanMessage(content=f"{CONTRACT_AUDIT_MERGE_PROMPT.format(count=len(findings))}\n\n{parts}")
+    return llm.invoke([message]).content
+
+def analyze_blockchain_security(contract_code, llm) -> str:
+    """
+    Analyze smart contract for security issues, reusing cached audits of identical code.
+    Sources larger than one chunk are audited chunk by chunk in parallel
+    (map) and the findings merged in a final call (reduce).
+    """
+    cache_key = contract_audit_key(contract_code, llm)
+    cached_analysis = audit_cache.get("contract_audit", cache_key)
+    if cached_analysis is not MISS:
+        return cached_analysis
+
     try:
-        message = HumanMessage(content=f"{prompt}\n\nContract:\n{contract_code}")
-        response = llm.invoke([message])
-        return response.content
+        analysis, _ = audit_flights.do(cache_key, audit_contract, contract_code, cache_key, llm)
+        return analysis
     except Exception as e:
         return f"Error analyzing contract: {str(e)}"
 
+def audit_contract(contract_code, cache_key: str, llm) -> str:
+    """Run the (map-reduce) audit of a source missing from the audit cache and store it"""
+    chunks = split_solidity_source(contract_code, CONTRACT_CHUNK_TOKENS)
+    if not chunks:
+        return "Error analyzing contract: no source code available"
+    logger.info(
+        "Contract audit: ~%d tokens in %d chunk(s)", sum(estimate_tokens(chunk) for chunk in chunks), len(chunks)
+    )
+
+    if len(chunks) == 1:
+        analysis = audit_contract_chunk(chunks[0], 1, 1, llm)
+    else:
+        workers = min(CONTRACT_ANALYSIS_CONCURRENCY, len(chunks))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="contract-audit") as pool:
+            # A context copy per chunk keeps the trace span and correlation id in each call
+            futures = [
+                pool.submit(contextvars.copy_context().run, audit_contract_chunk, chunk, part, len(chunks), llm)
+                for part, chunk in enumerate(chunks, 1)
+            ]
+            findings = [future.result() for future in futures]
+        analysis = merge_contract_findings(findings, llm)
+    audit_cache.set("contract_audit", cache_key, analysis)
+    return analysis
+
 @dataclass
 class AnalysisMetrics:
     rating: float  # 0-10 scale
@@ -253,17 +486,24 @@ class InvestmentAnalysis:
     final_recommendation: str
     timestamp: str = datetime.now().isoformat()
 
-def assess_investment_potential(
-    github_data: Dict,
-    contract_analysis: str,
-    token_metrics: Dict,
-    llm
-) -> Dict:
-    """Generate structured investment recommendation based on all collected data"""
-    
-    try:
-        response = llm.with_structured_output(InvestmentAnalysis).invoke(
-            f"""Analyze the following cryptocurrency investment data and provide a detailed assessment.
+@dataclass
+class InvestmentNarrative:
+    """Text of an assessment whose ratings were computed locally"""
+    code_activity_comment: str
+    smart_contract_risk_comment: str
+    token_performance_comment: str
+    social_sentiment_comment: str
+    final_recommendation: str
+
+# Token budget per section of the investment prompt; oversized sections are
+# condensed deterministically so the prompt (and the call's latency) stays bounded
+PROMPT_BUDGETS = {
+    "github_data": int(os.getenv("PROMPT_BUDGET_GITHUB", "600")),
+    "contract_analysis": int(os.getenv("PROMPT_BUDGET_CONTRACT", "1500")),
+    "token_metrics": int(os.getenv("PROMPT_BUDGET_TOKEN", "500")),
+}
+
+INVESTMENT_PROMPT = """Analyze the following cryptocurrency investment data and provide a detailed assessment.
             
             GitHub Analysis Data:
             {github_data}
@@ -288,14 +528,110 @@ def assess_investment_potential(
             Keep comments concise but informative (30-50 words).
             Base the final recommendation on the weighted average of all metrics.
             """
-        )
+
+NARRATIVE_PROMPT = """Write the comments of a cryptocurrency investment assessment whose ratings are already decided.
+
+            Ratings (0-10, final; do not change them):
+            {ratings}
+
+            GitHub Analysis Data:
+            {github_data}
+            
+            Smart Contract Security Analysis:
+            {contract_analysis}
+            
+            Token and socialmedia Metrics:
+            {token_metrics}
+
+            For each section, write a concise comment (30-50 words) explaining its rating from the data.
+            Then write a final investment recommendation consistent with: {recommendation}
+            """
+
+def assess_investment_potential(
+    github_data: Dict,
+    contract_analysis: str,
+    token_metrics: Dict,
+    llm
+) -> Dict:
+    """
+    Generate structured investment recommendation based on all collected data.
+    Ratings are computed locally (src.utils.scoring); SCORING_MODE decides
+    whether llm still rates everything ("llm", or "hybrid" when the data is
+    ambiguous), writes nothing ("local") or leaves the comments to the small
+    narrative model ("hybrid"). How the result was made is under "scoring".
+    """
+    local = scoring.score_investment(github_data, contract_analysis, token_metrics)
+    local["timestamp"] = datetime.now().isoformat()
+    ambiguous = local["scoring"]["ambiguous"]
+    sections = {"github_data": github_data, "contract_analysis": contract_analysis, "token_metrics": token_metrics}
+
+    if scoring.escalate("investment", ambiguous):
+        if ambiguous:
+            logger.info("Escalating investment assessment to the LLM, ambiguous: %s", ", ".join(ambiguous))
+        response = llm_investment_assessment(sections, llm)
+        if isinstance(response, dict):
+            response = {**response, "scoring": {**local["scoring"], "mode": scoring.SCORING_MODE, "path": "llm"}}
+        return response
+
+    local["scoring"].update(mode=scoring.SCORING_MODE, path="local")
+    if scoring.SCORING_MODE == scoring.HYBRID:
+        write_investment_narrative(local, sections)
+    return local
+
+def write_investment_narrative(result: Dict, sections: Dict):
+    """Replace the templated comments of a local result with the narrative model's, keeping the ratings"""
+    model = get_chat_model(scoring.NARRATIVE_MODEL)
+    ratings = "\n".join(
+        f"- {name.replace('_', ' ')}: {result[name]['rating']}" + (f" ({result[name]['error']})" if result[name]["error"] else "")
+        for name in scoring.SECTION_WEIGHTS
+    )
+    prompt, usage = build_prompt(
+        NARRATIVE_PROMPT,
+        {**sections, "ratings": ratings, "recommendation": result["final_recommendation"]},
+        PROMPT_BUDGETS,
+        scoring.NARRATIVE_MODEL
+    )
+    result["prompt_usage"] = usage
+    try:
+        narrative = model.with_structured_output(InvestmentNarrative).invoke(prompt)
+    except Exception:
+        logger.exception("Error writing investment narrative, keeping the computed comments")
+        return
+    if not isinstance(narrative, dict):
+        return
+    for name in scoring.SECTION_WEIGHTS:
+        comment = narrative.get(f"{name}_comment")
+        if comment and not result[name]["error"]:
+            result[name]["comment"] = comment
+    if narrative.get("final_recommendation"):
+        result["final_recommendation"] = narrative["final_recommendation"]
+    result["scoring"]["narrative_model"] = scoring.NARRATIVE_MODEL
+
+def llm_investment_assessment(sections: Dict, llm) -> Dict:
+    """
+    Full assessment by llm, ratings included.
+    Each section is held to its PROMPT_BUDGETS entry; the token counts are
+    returned under "prompt_usage".
+    """
+    prompt, usage = build_prompt(
+        INVESTMENT_PROMPT,
+        sections,
+        PROMPT_BUDGETS,
+        getattr(llm, "model_name", None) or "gpt-4o"
+    )
+    compacted = [name for name, section in usage["sections"].items() if section["tokens"] < section["original_tokens"]]
+    if compacted:
+        logger.info("Investment prompt sections condensed to budget: %s", ", ".join(compacted))
+
+    try:
+        response = llm.with_structured_output(InvestmentAnalysis).invoke(prompt)
+        if isinstance(response, dict):
+            response = {**response, "prompt_usage": usage}
         
         return response
         
     except Exception as e:
-        print(f"Error generating recommendation: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error generating recommendation")
         return {
             "error": f"Error generating recommendation: {str(e)}",
             "code_activity": {"rating": 0, "comment": "", "error": "Analysis failed"},
@@ -305,7 +641,8 @@ def assess_investment_potential(
             "risk_reward_ratio": 0,
             "confidence_score": 0,
             "final_recommendation": "Analysis failed due to error",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now().isoformat(),
+            "prompt_usage": usage
         }
     
 def handle_followup_question(state: AgentState, question: str, llm) -> str:
@@ -332,11 +669,36 @@ Provide a specific answer based on the available information."""
     except Exception as e:
         return f"Error processing follow-up question: {str(e)}"
 
+def token_details(contract_address: str, prefetched_prices: Dict = None):
+    """
+    get_details for a token, with any gaps filled from the price a batch
+    prefetched for it (see analyze_batch)
+    """
+    token_data = get_details(contract_address)
+    price = (prefetched_prices or {}).get(contract_address.lower())
+    return with_price(token_data, price) if price else token_data
+
+# Concurrent initial queries for the same target share one research graph run
+analysis_flights = SingleFlight("analysis")
+
+def analysis_key(query: str, context: Dict = None) -> Tuple[str, ...]:
+    """
+    Normalized research target of a query: lowercased address, repo URL or
+    project name. A non-empty context (e.g. a batch's prefetched prices)
+    changes the result, so its hash is part of the key.
+    """
+    analysis = analyze_user_input(query, None)
+    key = (analysis["type"], " ".join(analysis["value"].split()).lower())
+    if context:
+        key += (hashlib.sha256(json.dumps(context, sort_keys=True, default=str).encode()).hexdigest(),)
+    return key
+
 class ResearchBot:
     def __init__(self):
-        self.llm = ChatOpenAI(temperature=0, model="gpt-4")
+        # Only the state is per session; the LLM client and graph are shared.
+        self.llm = get_chat_model("gpt-4")
         self.state = None
-        self.research_graph = create_research_graph()
+        self.research_graph = get_research_graph()
 
     def _create_summary(self, state: AgentState) -> str:
         """Create a summary of the research findings"""
@@ -381,14 +743,44 @@ class ResearchBot:
             
         return "\n".join(summary_parts)
 
-    def process_initial_query(self, query: str) -> str:
+    def process_initial_query(self, query: str, context: Dict = None) -> str:
         """Process the initial research query"""
         self.state = AgentState(
             messages=[HumanMessage(content=query)],
-            current_step="start"
+            current_step="start",
+            context=context or {}
         )
         
-        final_state_dict = self.research_graph.invoke(self.state)
+        key = analysis_key(query, self.state.context)
+        final_state_dict, shared = analysis_flights.do(key, self.research_graph.invoke, self.state)
+        if shared:
+            # The same result went to other sessions; each keeps its own copy
+            final_state_dict = copy.deepcopy(final_state_dict)
+        return self._finish_initial_query(query, final_state_dict)
+
+    def stream_initial_query(self, query: str):
+        """
+        Process the initial research query, yielding (node, update) as each
+        graph node finishes. The final state is stored on the bot as with
+        process_initial_query.
+        """
+        self.state = AgentState(
+            messages=[HumanMessage(content=query)],
+            current_step="start"
+        )
+
+        final_state_dict = None
+        for mode, chunk in self.research_graph.stream(self.state, stream_mode=["updates", "values"]):
+            if mode == "values":
+                final_state_dict = chunk
+                continue
+            for node, update in chunk.items():
+                if update:
+                    yield node, update
+
+        self._finish_initial_query(query, final_state_dict)
+
+    def _finish_initial_query(self, query: str, final_state_dict: Dict):
         self.state = AgentState(**final_state_dict)
         
         summary = self.state.final_analysis
@@ -399,12 +791,17 @@ class ResearchBot:
         return summary
 
     def process_trading_decision(self, decision: str) -> str:
-        """Process user's trading decision"""
+        """
+        Process user's trading decision. The stored research state is the
+        checkpoint: only the trading graph runs, research is not repeated.
+        """
         if not self.state:
             return "Please provide an initial query first."
+        if self.state.current_step != "await_trading_decision":
+            return "No trade recommendation is awaiting a decision."
             
         self.state.trading_decision = decision
-        final_state_dict = self.research_graph.invoke(self.state)
+        final_state_dict = get_trading_graph().invoke(self.state)
         self.state = AgentState(**final_state_dict)
         
         if self.state.trading_result:
@@ -422,189 +819,247 @@ class ResearchBot:
         
         return response
 
+def node_update_payload(update: Dict) -> Dict:
+    """Client-facing copy of a graph node's update"""
+    # Contract source can be large and is of no use to the client
+    payload = dict(update)
+    if payload.get("contract_data"):
+        payload["contract_data"] = {"analysis": payload["contract_data"].get("analysis")}
+    if isinstance(payload.get("token_data"), TokenSnapshot):
+        payload["token_data"] = payload["token_data"].to_dict()
+    return payload
+
+# Pipelines running for batches, across all batch requests; a client's
+# max_concurrency can only lower it for its own batch
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_CONCURRENCY, thread_name_prefix="batch")
+
+def analyze_batch(queries: List[str], max_concurrency: int = None):
+    """
+    Analyze many projects at once, yielding (query, result) pairs in completion
+    order, where result is {"result": ...} or {"error": ...}.
+    - Queries that resolve to the same contract address or repository are
+      analyzed once and the result is yielded for each of them.
+    - Prices for all contract addresses are fetched up front with batched
+      CoinGecko requests and fill in what a token's own details lack.
+    - At most max_concurrency (capped at BATCH_MAX_CONCURRENCY) pipelines of
+      the batch run at the same time, on the executor shared by all batches.
+    """
+    targets = {}
+    for query in queries:
+        targets.setdefault(analysis_key(query), []).append(query)
+
+    addresses = [value for input_type, value in targets if input_type == "contract_address"]
+    prices = {}
+    if addresses:
+        try:
+            prices = get_token_prices(addresses)
+        except Exception as e:
+            logger.warning("Error prefetching token prices: %s", e)
+
+    def run(query):
+        return ResearchBot().process_initial_query(query, context={"prefetched_prices": prices})
+
+    workers = max(1, min(max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY, len(targets)))
+    pending = iter(targets.items())
+    futures = {}
+
+    def submit_next():
+        for target, target_queries in pending:
+            futures[_batch_executor.submit(contextvars.copy_context().run, run, target_queries[0])] = target
+            return
+
+    # Only `workers` of this batch are queued at a time, so one large batch
+    # cannot fill the shared executor ahead of the others
+    for _ in range(workers):
+        submit_next()
+    try:
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                target = futures.pop(future)
+                submit_next()
+                try:
+                    result = {"result": future.result()}
+                except Exception as e:
+                    result = {"error": str(e)}
+                for query in targets[target]:
+                    yield query, result
+    finally:
+        # The client went away: drop the analyses that have not started
+        for future in futures:
+            future.cancel()
+
 def create_research_graph():
-    # Initialize LLM
-    llm = ChatOpenAI(
-        temperature=0,
-        model="gpt-4o"
-    )
-    trading_agent = initialize_trading_agent()
+    # Shared LLM; the trading agent is only built once a trade is requested
+    llm = get_chat_model("gpt-4o")
     
+    from langgraph.graph import StateGraph
+
     # Create workflow graph
     workflow = StateGraph(AgentState)
     
-    # Define nodes
-    def input_analysis(state: AgentState) -> AgentState:
+    # Define nodes. Each node returns only the fields it changes, since the
+    # data-gathering branches run in parallel and must not overwrite each other.
+    def input_analysis(state: AgentState) -> Dict:
         """Analyze user input and determine next steps"""
         if not state.messages:
-            return state
+            return {}
             
         query = state.messages[-1].content
         analysis = analyze_user_input(query, llm)
         
-        state.input_type = analysis["type"]
-        
+        update = {"input_type": analysis["type"], "current_step": "research"}
         if analysis["type"] == "github_url":
-            state.github_url = analysis["value"]
-            state.current_step = "github_research"
+            update["github_url"] = analysis["value"]
         elif analysis["type"] == "contract_address":
-            state.contract_address = analysis["value"]
-            state.current_step = "contract_analysis"
+            update["contract_address"] = analysis["value"]
         else:
-            state.project_name = analysis["value"]
-            state.current_step = "generate_analysis"
+            update["project_name"] = analysis["value"]
             
-        return state
+        return update
     
-    def github_search(state: AgentState) -> AgentState:
-        """Search for GitHub repository if only project name is provided"""
-        if state.github_url:  # Skip if we already have a GitHub URL
-            return state
-            
-        search_results = tavily_search.run(f"github repository {state.project_name}")
-        if search_results:
-            state.github_url = search_results[0]["url"]
-        state.current_step = "generate_analysis"
-        return state
-    
-    def github_research(state):
-        """Analyze GitHub repository"""
-        if not state.github_url:
-            return state
+    def github_research(state: AgentState) -> Dict:
+        """
+        Analyze GitHub repository, searching for it first if only a project
+        name or contract address was provided. The search runs inside this
+        node so the branch does not wait on a graph step boundary.
+        """
+        update = {}
+        github_url = state.github_url
+        if not github_url:
+            search_results, error = run_with_timeout(
+                "github_search",
+                lambda query: get_tavily_search().run(query),
+                f"github repository {state.project_name or state.contract_address}"
+            )
+            if error:
+                return {"errors": [error]}
+            if not search_results:
+                return {}
+            github_url = search_results[0]["url"]
+            update["github_url"] = github_url
             
-        github_data = analyze_github_repo(state.github_url)
-        state.github_data = github_data
-        
-        if state.contract_address:
-            state.current_step = "contract_analysis"
+        github_data, error = run_with_timeout("github_research", analyze_github_repo, github_url)
+        if error:
+            update["github_data"] = {"error": error}
+            update["errors"] = [error]
         else:
-            state.current_step = "final_analysis"
-        return state
+            update["github_data"] = github_data
+        return update
     
-    def contract_analysis(state):
+    def contract_analysis(state: AgentState) -> Dict:
         """Analyze smart contract code"""
         if not state.contract_address:
-            return state
-            
-        contract_data = fetch_contract_source_code(state.contract_address)
-        if contract_data["success"]:
+            return {}
+
+        def fetch_and_audit(address):
+            contract_data = fetch_contract_source_code(address)
+            if not contract_data["success"]:
+                return None
             security_analysis = analyze_blockchain_security(
                 contract_data["data"],
                 llm
             )
-            state.contract_data = {
+            return {
                 "code": contract_data["data"],
                 "analysis": security_analysis
             }
-            
-        if state.github_data:
-            state.current_step = "token_analysis"
-        else:
-            state.current_step = "github_search"
-        return state
+
+        contract_data, error = run_with_timeout("contract_analysis", fetch_and_audit, state.contract_address)
+        if error:
+            return {"errors": [error]}
+        return {"contract_data": contract_data}
     
-    def token_analysis(state):
-        """Analyze token metrics and generate recommendation"""
+    def token_analysis(state: AgentState) -> Dict:
+        """Fetch token metrics"""
         if not state.contract_address:
-            return state
+            return {}
             
-        token_data = get_details(state.contract_address)
-        state.token_data = token_data
-        
-        state.current_step = "final_analysis"
-        return state
+        token_data, error = run_with_timeout(
+            "token_analysis", token_details, state.contract_address, state.context.get("prefetched_prices")
+        )
+        if error:
+            return {"errors": [error]}
+        return {"token_data": token_data}
     
-    def generate_analysis(state):
+    def generate_analysis(state: AgentState) -> Dict:
         """Generate final analysis and handle trading prompt"""
-        if state.token_data and state.github_data and state.contract_data:
+        if state.contract_address and (state.token_data or state.github_data or state.contract_data):
+            # Missing sections are rated 0 by the model instead of failing the whole analysis
             recommendation = assess_investment_potential(
-                state.github_data,
-                state.contract_data["analysis"],
-                state.token_data,
+                state.github_data or {"error": "Not enough data"},
+                state.contract_data["analysis"] if state.contract_data else "Not enough data",
+                state.token_data or {"error": "Not enough data"},
                 llm
             )
-            state.final_analysis = recommendation
             
             # Add trading prompt
             trading_prompt = "\n\nWould you like me to buy this token for you? (yes/no): "
             # state.final_analysis += trading_prompt
-            state.current_step = "await_trading_decision"
+            # Research stops here; the trading graph resumes from this state
+            return {"final_analysis": recommendation, "current_step": "await_trading_decision"}
             
         elif state.github_data:
-            state.final_analysis = f"GitHub Analysis Only:\n{state.github_data}"
+            return {"final_analysis": f"GitHub Analysis Only:\n{state.github_data}"}
             
-        return state
-        
-    def handle_trading_decision(state):
-        """Process user's trading decision"""
-        if state.trading_decision and state.trading_decision.lower() == "yes":
-            trading_result = execute_trade(state, trading_agent)
-            state.trading_result = trading_result
-            
-        return state
+        return {}
+
 
-    def end_node(state):
+    def end_node(state: AgentState) -> Dict:
         """Final node to properly end the workflow"""
-        return state
+        return {}
     
     # Add nodes to graph
-    workflow.add_node("input_analysis", input_analysis)
-    workflow.add_node("github_search", github_search)
-    workflow.add_node("github_research", github_research)
-    workflow.add_node("contract_analysis", contract_analysis)
-    workflow.add_node("token_analysis", token_analysis)
-    workflow.add_node("generate_analysis", generate_analysis)
-    workflow.add_node("handle_trading_decision", handle_trading_decision)
-    workflow.add_node("end", end_node)  # Add the end node explicitly
+    workflow.add_node("input_analysis", traced_node("input_analysis", input_analysis))
+    workflow.add_node("github_research", traced_node("github_research", github_research))
+    workflow.add_node("contract_analysis", traced_node("contract_analysis", contract_analysis))
+    workflow.add_node("token_analysis", traced_node("token_analysis", token_analysis))
+    workflow.add_node("generate_analysis", traced_node("generate_analysis", generate_analysis))
+    workflow.add_node("end", traced_node("end", end_node))  # Add the end node explicitly
     
     # Set entry point
     workflow.set_entry_point("input_analysis")
     
-    # Define edges with proper conditional routing
-    workflow.add_conditional_edges(
-        "input_analysis",
-        lambda x: {
-            "github_url": "github_research",
-            "contract_address": "contract_analysis",
-            "project_name": "github_search"
-        }[x.input_type]
-    )
-    
-    workflow.add_conditional_edges(
-        "github_search",
-        lambda x: "github_research"
-    )
-    
-    workflow.add_conditional_edges(
-        "github_research",
-        lambda x: "contract_analysis" if x.contract_address else "generate_analysis"
-    )
-    
-    workflow.add_conditional_edges(
-        "contract_analysis",
-        lambda x: "token_analysis" if x.github_data else "github_search"
-    )
-    
-    workflow.add_conditional_edges(
-        "token_analysis",
-        lambda x: "generate_analysis"
-    )
+    # Fan out to the independent data-gathering branches. Branches that do not
+    # apply to the input type return immediately.
+    workflow.add_edge("input_analysis", "github_research")
+    workflow.add_edge("input_analysis", "contract_analysis")
+    workflow.add_edge("input_analysis", "token_analysis")
     
-    workflow.add_conditional_edges(
-        "generate_analysis",
-        lambda x: "handle_trading_decision" if x.current_step == "await_trading_decision" else "end"
-    )
+    # Join: generate_analysis waits for every branch to finish
+    workflow.add_edge(["github_research", "contract_analysis", "token_analysis"], "generate_analysis")
     
-    workflow.add_conditional_edges(
-        "handle_trading_decision",
-        lambda x: "end"
-    )
+    workflow.add_edge("generate_analysis", "end")
     
     # Set proper end point
     workflow.set_finish_point("end")
     
     return workflow.compile()
 
+def create_trading_graph():
+    """
+    Graph for the trading step alone. It is invoked with the state saved at
+    the end of the research graph, so a decision costs one CDP call.
+    """
+    from langgraph.graph import StateGraph
+
+    workflow = StateGraph(AgentState)
+
+    def handle_trading_decision(state: AgentState) -> Dict:
+        """Process user's trading decision"""
+        if state.trading_decision and state.trading_decision.lower() == "yes":
+            trading_result = execute_trade(state, get_trading_agent())
+            return {"trading_result": trading_result, "current_step": "trade_complete"}
+            
+        return {"current_step": "trade_declined"}
+
+    workflow.add_node("handle_trading_decision", traced_node("handle_trading_decision", handle_trading_decision))
+    workflow.set_entry_point("handle_trading_decision")
+    workflow.set_finish_point("handle_trading_decision")
+
+    return workflow.compile()
+
 def main():
     bot = ResearchBot()
     
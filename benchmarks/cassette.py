@@ -0,0 +1,146 @@
+"""
+VCR-style recording and replay of upstream HTTP traffic.
+
+Every upstream call (GitHub, BaseScan, Covalent, CoinGecko, Tavily) goes
+through requests, so a Cassette patches requests' HTTPAdapter.send: the
+retry, pooling, caching and metrics code above it runs unchanged.
+
+  - replay: answer from the cassette file and never touch the network.
+    Unknown requests raise CassetteMiss. Each response is delayed by its
+    recorded latency times latency_scale (0 measures pure CPU overhead).
+  - record: send requests for real and save what came back.
+
+Requests are matched on method, URL and JSON body with credentials removed,
+so cassettes can be committed.
+"""
+
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# Query parameters and JSON body fields that carry credentials
+SECRET_FIELDS = {"apikey", "api_key", "key", "access_token", "token"}
+
+# Response headers worth keeping (ETag drives conditional GitHub requests)
+KEPT_HEADERS = {"content-type", "etag", "link", "retry-after", "x-ratelimit-remaining", "x-ratelimit-reset"}
+
+
+class CassetteMiss(Exception):
+    """A request in replay mode that the cassette has no recording for"""
+
+
+def _scrub_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in SECRET_FIELDS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def _scrub_body(body) -> str:
+    if not body:
+        return ""
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    if isinstance(data, dict):
+        data = {k: v for k, v in data.items() if k.lower() not in SECRET_FIELDS}
+    return json.dumps(data, sort_keys=True)
+
+
+def _match_key(method: str, url: str, body) -> str:
+    return f"{method.upper()} {_scrub_url(url)} {_scrub_body(body)}"
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str = "replay", latency_scale: float = 1.0):
+        if mode not in ("replay", "record"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.interactions = {}
+        self.misses = []
+        self.replayed = 0
+        self._lock = threading.Lock()
+        self._original_send = None
+        if os.path.exists(path):
+            with open(path) as f:
+                for interaction in json.load(f)["interactions"]:
+                    request = interaction["request"]
+                    self.interactions[_match_key(request["method"], request["url"], request.get("body"))] = interaction
+
+    def __enter__(self):
+        self._original_send = HTTPAdapter.send
+        cassette = self
+
+        def send(adapter, request, **kwargs):
+            return cassette._send(adapter, request, **kwargs)
+
+        HTTPAdapter.send = send
+        return self
+
+    def __exit__(self, *exc):
+        HTTPAdapter.send = self._original_send
+        if self.mode == "record":
+            self.save()
+
+    def _send(self, adapter, request, **kwargs):
+        key = _match_key(request.method, request.url, request.body)
+        if self.mode == "record":
+            started = time.perf_counter()
+            response = self._original_send(adapter, request, **kwargs)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self.interactions[key] = {
+                    "request": {"method": request.method, "url": _scrub_url(request.url), "body": _scrub_body(request.body)},
+                    "response": {
+                        "status": response.status_code,
+                        "headers": {k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS},
+                        "body": response.content.decode("utf-8", "replace"),
+                        "elapsed_ms": round(elapsed_ms, 1),
+                    },
+                }
+            return response
+
+        interaction = self.interactions.get(key)
+        if interaction is None:
+            with self._lock:
+                self.misses.append(key)
+            raise CassetteMiss(f"No recording for {key}")
+        with self._lock:
+            self.replayed += 1
+        recorded = interaction["response"]
+        if self.latency_scale:
+            time.sleep(recorded.get("elapsed_ms", 0) / 1000 * self.latency_scale)
+        etag = CaseInsensitiveDict(recorded.get("headers", {})).get("etag")
+        if etag and request.headers.get("If-None-Match") == etag:
+            # Conditional request for an unchanged resource, as the server would answer it
+            recorded = {"status": 304, "headers": recorded["headers"], "body": ""}
+        return self._build_response(request, recorded)
+
+    @staticmethod
+    def _build_response(request, recorded: dict) -> Response:
+        response = Response()
+        response.status_code = recorded["status"]
+        response.headers = CaseInsensitiveDict(recorded.get("headers", {}))
+        response._content = recorded["body"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.reason = "Recorded"
+        return response
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump({"interactions": list(self.interactions.values())}, f, indent=1)
@@ -0,0 +1,90 @@
+"""
+Deterministic stand-in for ChatOpenAI used by the offline benchmarks.
+
+It is a real LangChain chat model, so invoke(), __call__() and
+with_structured_output() behave as they do for ChatOpenAI and the usage
+callbacks fire. Responses depend only on the prompt, and each call sleeps
+for a latency derived from the response length to mimic a hosted model.
+Install it with src.utils.llm.set_chat_model_factory(FakeChatModel).
+"""
+
+import dataclasses
+import hashlib
+import json
+import time
+import typing
+from typing import Any, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import Field
+
+WORDS = (
+    "access control reentrancy ownership upgradeable proxy oracle liquidity supply mint burn "
+    "allowance overflow centralization timelock multisig audit event modifier fee slippage"
+).split()
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+
+
+def _estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def _sample(schema, seed: int):
+    """Deterministic instance of a dataclass schema, as the dict structured output returns"""
+    hints = typing.get_type_hints(schema)
+    result = {}
+    for index, field in enumerate(dataclasses.fields(schema)):
+        value_seed = seed + index * 7919
+        field_type = hints.get(field.name)
+        if dataclasses.is_dataclass(field_type):
+            result[field.name] = _sample(field_type, value_seed)
+        elif field_type in (float, int):
+            result[field.name] = round((value_seed % 1000) / 100, 2)
+        elif field.default is not dataclasses.MISSING:
+            result[field.name] = field.default
+        else:
+            result[field.name] = " ".join(WORDS[(value_seed >> i) % len(WORDS)] for i in range(12))
+    return result
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model with deterministic output and simulated latency"""
+
+    model_name: str = Field(default="fake", alias="model")
+    temperature: Optional[float] = None
+    # Simulated time to first token, and per generated token
+    base_latency: float = 0.2
+    seconds_per_token: float = 0.002
+    response_tokens: int = 150
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        seed = _seed(f"{self.model_name}\0{prompt}")
+
+        schema = kwargs.get("structured_schema")
+        if schema is not None:
+            content = json.dumps(_sample(schema, seed))
+        else:
+            words = [WORDS[(seed >> (i % 48)) % len(WORDS)] for i in range(self.response_tokens)]
+            content = f"Findings ({seed % 10}/10): " + " ".join(words)
+
+        completion_tokens = _estimate_tokens(content)
+        time.sleep(self.base_latency + completion_tokens * self.seconds_per_token)
+        usage = {"prompt_tokens": _estimate_tokens(prompt), "completion_tokens": completion_tokens}
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=content))],
+            llm_output={"token_usage": usage, "model_name": self.model_name},
+        )
+
+    def with_structured_output(self, schema, **kwargs):
+        return self.bind(structured_schema=schema) | RunnableLambda(lambda message: json.loads(message.content))
@@ -0,0 +1,82 @@
+"""
+Cold-start import benchmark.
+
+Imports each module in a fresh interpreter under `python -X importtime` and
+reports the wall time of the import plus the packages that cost the most.
+Exits non-zero when a module takes longer than the budget, so it can guard
+worker boot time in CI:
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py server --budget-ms 1500 --top 15
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = ["server", "worker", "agent", "src.utils.github", "src.utils.twitter", "src.utils.web"]
+
+# Cold-start budget per module, in milliseconds
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1000"))
+
+PROBE = "import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+
+
+def measure(module: str) -> dict:
+    """Import module in a fresh interpreter and return its wall time and time spent per package"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module)],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    # Lines look like "import time: self [us] | cumulative | <indent>module";
+    # self times are summed per root package (langchain_core, pydantic, ...)
+    packages = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us)
+
+    return {
+        "module": module,
+        "wall_ms": float(completed.stdout.strip().splitlines()[-1]) * 1000,
+        "packages": sorted(((us, name) for name, us in packages.items()), reverse=True),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time of the server modules")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="fail if any module takes longer than this to import")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per module; the fastest is reported")
+    parser.add_argument("--top", type=int, default=8, help="heaviest packages to list per module")
+    args = parser.parse_args()
+
+    over_budget = []
+    for module in args.modules:
+        runs = [measure(module) for _ in range(args.repeat)]
+        best = min(runs, key=lambda run: run["wall_ms"])
+        status = "ok" if best["wall_ms"] <= args.budget_ms else "OVER BUDGET"
+        print(f"{module:<20} {best['wall_ms']:8.1f} ms  {status}")
+        for self_us, name in best["packages"][:args.top]:
+            print(f"    {self_us / 1000:8.1f} ms  {name}")
+        if status != "ok":
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"\nOver the {args.budget_ms:.0f} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Load test of the FastAPI server with synthetic sessions.
+
+Virtual users run whole sessions against the app in-process: upstream APIs
+are replayed from the benchmark cassette, models are FakeChatModel and the
+CDP trading agent is a stub, so the numbers reflect the server itself. Each
+session follows one flow, picked by weight from --mix:
+
+  browse    analyze, then reset
+  followup  analyze, --followups follow-up questions, then reset
+  trade     analyze a token, then a yes/no trading decision (ends the session)
+  abandon   analyze and walk away (the session stays until TTL/eviction)
+
+Reports p50/p95/p99 latency and error rate per endpoint, and samples the
+BotStateManager session store (sessions, bytes) and process RSS over time.
+
+    python benchmarks/load_test.py --users 16 --duration 60
+    python benchmarks/load_test.py --mix followup=1,abandon=3 --json load.json
+
+PIPELINE_WORKERS, PIPELINE_MAX_QUEUE, SESSION_BACKEND and SESSION_MAX_SESSIONS
+apply as they do in production.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from run import DEFAULT_CASSETTE, SCENARIOS, configure_environment, peak_rss_mb, percentile
+
+DEFAULT_MIX = "browse=2,followup=3,trade=2,abandon=1"
+
+FOLLOWUP_QUESTIONS = [
+    "Who controls the owner role?",
+    "Can the supply be inflated after launch?",
+    "How active is the repository?",
+    "What are the main risks?",
+]
+
+TOKEN_QUERIES = [query for query in SCENARIOS.values() if query.startswith("0x")]
+
+
+class FakeTradingAgent:
+    """Stands in for the CDP agent executor; a trade takes a fixed time"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def invoke(self, inputs):
+        time.sleep(self.latency)
+        return {"output": "Bought 100 tokens (simulated)."}
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("browse", "followup", "trade", "abandon"):
+            raise SystemExit(f"Unknown session flow: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class LoadTest:
+    def __init__(self, client, mix: dict, followups: int, think_time: float, seed: int):
+        self.client = client
+        self.mix = mix
+        self.followups = followups
+        self.think_time = think_time
+        self.random = random.Random(seed)
+        self.latencies = {}  # endpoint -> [ms]
+        self.errors = {}  # endpoint -> {status: count}
+        self.sessions_started = 0
+        self.flows = {name: 0 for name in mix}
+
+    async def call(self, endpoint: str, body: dict):
+        started = time.perf_counter()
+        try:
+            response = await self.client.post(endpoint, json=body)
+            status = response.status_code
+        except Exception as e:
+            status = type(e).__name__
+        self.latencies.setdefault(endpoint, []).append((time.perf_counter() - started) * 1000)
+        if status != 200:
+            errors = self.errors.setdefault(endpoint, {})
+            errors[str(status)] = errors.get(str(status), 0) + 1
+            return False
+        return True
+
+    async def think(self):
+        if self.think_time:
+            await asyncio.sleep(self.random.uniform(0, 2 * self.think_time))
+
+    async def session(self, user: int):
+        flow = self.random.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        self.flows[flow] += 1
+        self.sessions_started += 1
+        session_id = f"load-{user}-{self.sessions_started}"
+
+        queries = TOKEN_QUERIES if flow == "trade" else list(SCENARIOS.values())
+        if not await self.call("/api/analyze", {"query": self.random.choice(queries), "session_id": session_id}):
+            return
+        await self.think()
+
+        if flow == "followup":
+            for question in self.random.sample(FOLLOWUP_QUESTIONS, min(self.followups, len(FOLLOWUP_QUESTIONS))):
+                await self.call("/api/followup", {"question": question, "session_id": session_id})
+                await self.think()
+        if flow == "trade":
+            decision = self.random.choice(["yes", "no"])
+            await self.call("/api/trading-decision", {"decision": decision, "session_id": session_id})
+        elif flow in ("browse", "followup"):
+            await self.call("/api/reset", {"session_id": session_id})
+
+    async def user(self, user: int, deadline: float):
+        while time.monotonic() < deadline:
+            await self.session(user)
+            await self.think()
+
+    def report(self) -> dict:
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            failed = sum(self.errors.get(endpoint, {}).values())
+            endpoints[endpoint] = {
+                "requests": len(latencies),
+                "error_rate": round(failed / len(latencies), 4),
+                "errors": self.errors.get(endpoint, {}),
+                "p50_ms": round(percentile(latencies, 50), 1),
+                "p95_ms": round(percentile(latencies, 95), 1),
+                "p99_ms": round(percentile(latencies, 99), 1),
+            }
+        return {"endpoints": endpoints, "sessions_started": self.sessions_started, "flows": self.flows}
+
+
+async def take_sample(client, samples: list, started: float):
+    stats = (await client.get("/api/sessions/stats")).json()
+    samples.append({
+        "t": round(time.monotonic() - started, 1),
+        "sessions": stats.get("sessions"),
+        "bytes": stats.get("bytes"),
+        "rss_mb": round(peak_rss_mb(), 1),
+    })
+
+
+async def sample_sessions(client, interval: float, samples: list, started: float):
+    """Record the session store's size and process RSS every interval seconds"""
+    while True:
+        await take_sample(client, samples, started)
+        await asyncio.sleep(interval)
+
+
+def memory_growth(samples: list) -> dict:
+    first, last = samples[0], samples[-1]
+    minutes = max(last["t"] - first["t"], 1e-9) / 60
+    growth = {"sessions": last["sessions"], "bytes": last["bytes"], "peak_rss_mb": last["rss_mb"]}
+    if last["bytes"] is not None and first["bytes"] is not None:
+        growth["bytes_per_minute"] = round((last["bytes"] - first["bytes"]) / minutes)
+        growth["bytes_per_session"] = round(last["bytes"] / last["sessions"]) if last["sessions"] else 0
+    return growth
+
+
+async def run_load(args) -> dict:
+    import httpx
+    import server
+
+    samples = []
+    async with server.lifespan(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=args.timeout) as client:
+            load = LoadTest(client, parse_mix(args.mix), args.followups, args.think_time, args.seed)
+            started = time.monotonic()
+            sampler = asyncio.ensure_future(sample_sessions(client, args.sample_interval, samples, started))
+            await asyncio.gather(*(load.user(user, started + args.duration) for user in range(args.users)))
+            elapsed = time.monotonic() - started
+            sampler.cancel()
+            # Final sample once every session has finished
+            await take_sample(client, samples, started)
+
+    results = load.report()
+    total = sum(endpoint["requests"] for endpoint in results["endpoints"].values())
+    failed = sum(sum(endpoint["errors"].values()) for endpoint in results["endpoints"].values())
+    results.update({
+        "users": args.users,
+        "duration_s": round(elapsed, 1),
+        "requests": total,
+        "rps": round(total / elapsed, 2),
+        "error_rate": round(failed / total, 4) if total else 0.0,
+        "memory": memory_growth(samples),
+        "samples": samples,
+    })
+    return results
+
+
+def print_report(results: dict):
+    print(f"{results['users']} users, {results['duration_s']}s: {results['requests']} requests, "
+          f"{results['rps']} req/s, error rate {results['error_rate']:.2%}")
+    print(f"Sessions started {results['sessions_started']} " +
+          " ".join(f"{flow}={count}" for flow, count in results["flows"].items()))
+    print(f"  {'endpoint':<22} {'requests':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, stats in results["endpoints"].items():
+        print(f"  {endpoint:<22} {stats['requests']:>8} {stats['error_rate']:>7.2%} "
+              f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+        for status, count in stats["errors"].items():
+            print(f"      {status}: {count}")
+    print("Session store over time")
+    for sample in results["samples"]:
+        print(f"  t={sample['t']:>6}s  sessions {sample['sessions']:>5}  bytes {sample['bytes']:>10}  peak rss {sample['rss_mb']} MB")
+    memory = results["memory"]
+    if "bytes_per_minute" in memory:
+        print(f"Growth {memory['bytes_per_minute']} bytes/min, {memory['bytes_per_session']} bytes/session")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API with synthetic session workloads")
+    parser.add_argument("--users", type=int, default=8, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to keep starting sessions")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="flow weights, e.g. browse=2,followup=3,trade=2,abandon=1")
+    parser.add_argument("--followups", type=int, default=2, help="questions per followup session")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean seconds between a user's requests")
+    parser.add_argument("--sample-interval", type=float, default=5, help="seconds between session store samples")
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for recorded upstream latency")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="simulated seconds per LLM call")
+    parser.add_argument("--trade-latency", type=float, default=1.0, help="simulated seconds per trade")
+    parser.add_argument("--timeout", type=float, default=300, help="client timeout per request")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    configure_environment(record=False)
+    from agent import _get_shared_component
+    from cassette import Cassette
+    from fake_llm import FakeChatModel
+    from src.utils.llm import set_chat_model_factory
+
+    set_chat_model_factory(lambda **kwargs: FakeChatModel(base_latency=args.llm_latency, **kwargs))
+    # Seed the shared registry so trades never build the real CDP agent
+    _get_shared_component("trading_agent", lambda: FakeTradingAgent(args.trade_latency))
+
+    with Cassette(args.cassette, "replay", args.latency_scale) as cassette:
+        results = asyncio.run(run_load(args))
+    results["cassette_misses"] = sorted(set(cassette.misses))
+
+    print_report(results)
+    if results["cassette_misses"]:
+        print(f"Cassette misses: {len(results['cassette_misses'])}", file=sys.stderr)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
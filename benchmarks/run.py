@@ -0,0 +1,244 @@
+"""
+Offline benchmark for the research pipeline.
+
+Upstream APIs are replayed from a cassette (benchmarks/cassettes/) and every
+OpenAI model is replaced by the deterministic FakeChatModel, so results only
+move when the code does. Reports:
+
+  - end-to-end and per-node latency per scenario (cold caches unless --warm)
+  - throughput and latency at N concurrent sessions against the FastAPI app
+  - peak resident memory
+
+    python benchmarks/run.py
+    python benchmarks/run.py --iterations 10 --concurrency 1,8,32 --json results.json
+    python benchmarks/run.py --compare baseline.json     # exit 1 on a regression
+    python benchmarks/run.py --record                    # re-record the cassette from live APIs
+
+PIPELINE_WORKERS and the other runtime settings apply as they do in production.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+DEFAULT_CASSETTE = os.path.join(BENCHMARKS_DIR, "cassettes", "default.json")
+
+# name -> query sent to the bot
+SCENARIOS = {
+    "token": "0x4ed4e862860bed51a9570b96d89af5e1b0efefed",
+    "large-contract": "0x1f98431c8ad98523631ae4a59f267346ea31f984",
+    "project-name": "uniswap v3",
+}
+
+
+def configure_environment(record: bool):
+    """Settings that must be in place before the app modules are imported"""
+    os.environ["AUDIT_CACHE_PATH"] = ""
+    os.environ["RESPONSE_CACHE_PATH"] = ""
+    os.environ.setdefault("SESSION_BACKEND", "memory")
+    os.environ["JOB_WORKERS"] = "0"
+    os.environ["JOB_QUEUE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench-"), "jobs.db")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if not record:
+        # Replayed requests never leave the process, but the clients insist on credentials
+        for name in ("GITHUB_TOKEN", "TAVILY_API_KEY", "ETHERSCAN_API_KEY", "COVALENT_API_KEY", "OPENAI_API_KEY"):
+            os.environ.setdefault(name, "offline-benchmark")
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def clear_caches():
+    from agent import audit_cache
+    from src.utils.cache import response_cache
+
+    response_cache.clear()
+    audit_cache.clear()
+
+
+def bench_latency(iterations: int, warm: bool) -> dict:
+    """Run each scenario in-process and collect end-to-end and per-node times from the trace"""
+    from agent import ResearchBot
+    from src.utils.metrics import Trace
+
+    results = {}
+    for name, query in SCENARIOS.items():
+        totals, nodes, errors = [], {}, 0
+        for _ in range(iterations):
+            if not warm:
+                clear_caches()
+            trace = Trace()
+            bot = ResearchBot()
+            trace.run(bot.process_initial_query, query)
+            errors += len(bot.state.errors)
+            report = trace.to_dict()
+            totals.append(report["duration_ms"])
+            for span in report["spans"]:
+                if span["kind"] == "node":
+                    nodes.setdefault(span["name"], []).append(span["duration_ms"])
+        results[name] = {
+            "p50_ms": round(statistics.median(totals), 1),
+            "mean_ms": round(statistics.mean(totals), 1),
+            "max_ms": round(max(totals), 1),
+            "branch_errors": errors,
+            "nodes": {node: round(statistics.median(times), 1) for node, times in nodes.items()},
+        }
+    return results
+
+
+async def _drive(app, concurrency: int, rounds: int) -> dict:
+    import httpx
+
+    queries = list(SCENARIOS.values())
+    latencies, failures = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(client, index):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/analyze", json={"query": queries[index % len(queries)], "session_id": f"bench-{concurrency}-{index}"}
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                failures += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client, i) for i in range(concurrency * rounds)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": failures,
+        "rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "max_ms": round(max(latencies), 1),
+    }
+
+
+def bench_throughput(levels, rounds: int) -> dict:
+    """Concurrent /api/analyze sessions through the FastAPI app, cold caches per level"""
+    import server
+
+    async def run_levels():
+        results = {}
+        async with server.lifespan(server.app):
+            for concurrency in levels:
+                clear_caches()
+                server.bot_manager.store = server.create_session_store()
+                results[str(concurrency)] = await _drive(server.app, concurrency, rounds)
+        return results
+
+    return asyncio.run(run_levels())
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions of more than tolerance (a fraction) against a previous --json report"""
+    regressions = []
+    for name, current in results["latency"].items():
+        before = baseline.get("latency", {}).get(name)
+        if before and current["p50_ms"] > before["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {before['p50_ms']} -> {current['p50_ms']} ms")
+    for level, current in results["throughput"].items():
+        before = baseline.get("throughput", {}).get(level)
+        if before and current["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"concurrency {level}: {before['rps']} -> {current['rps']} req/s")
+    before_rss = baseline.get("peak_rss_mb")
+    if before_rss and results["peak_rss_mb"] > before_rss * (1 + tolerance):
+        regressions.append(f"peak RSS {before_rss} -> {results['peak_rss_mb']} MB")
+    return regressions
+
+
+def print_report(results: dict):
+    print("Latency per scenario (ms)")
+    for name, stats in results["latency"].items():
+        print(f"  {name:<16} p50 {stats['p50_ms']:8.1f}  mean {stats['mean_ms']:8.1f}  max {stats['max_ms']:8.1f}"
+              f"  branch errors {stats['branch_errors']}")
+        for node, p50 in stats["nodes"].items():
+            print(f"      {node:<20} {p50:8.1f}")
+    print("Throughput against /api/analyze")
+    for level, stats in results["throughput"].items():
+        print(f"  {level:>4} concurrent  {stats['rps']:7.2f} req/s  p50 {stats['p50_ms']:8.1f}  p95 {stats['p95_ms']:8.1f}"
+              f"  errors {stats['errors']}/{stats['requests']}")
+    print(f"Peak RSS {results['peak_rss_mb']} MB")
+    if results["cassette_misses"]:
+        print(f"Cassette misses ({len(results['cassette_misses'])}):")
+        for miss in results["cassette_misses"][:10]:
+            print(f"  {miss}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the research pipeline")
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE)
+    parser.add_argument("--record", action="store_true", help="call the live APIs and save them to the cassette")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="multiplier for recorded upstream latency (0 = CPU overhead only)")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="simulated seconds per LLM call")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--warm", action="store_true", help="keep caches between iterations")
+    parser.add_argument("--concurrency", default="1,4,8", help="comma-separated concurrent session counts")
+    parser.add_argument("--rounds", type=int, default=2, help="requests per concurrent session")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="previous --json results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression as a fraction")
+    args = parser.parse_args()
+
+    configure_environment(args.record)
+    from cassette import Cassette
+    from fake_llm import FakeChatModel
+    from src.utils.llm import set_chat_model_factory
+
+    set_chat_model_factory(lambda **kwargs: FakeChatModel(base_latency=args.llm_latency, **kwargs))
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+
+    with Cassette(args.cassette, "record" if args.record else "replay", args.latency_scale) as cassette:
+        results = {
+            "latency": bench_latency(args.iterations, args.warm),
+            "throughput": bench_throughput(levels, args.rounds),
+        }
+    results["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    results["cassette_misses"] = sorted(set(cassette.misses))
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nRegressions beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,75 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Union
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from contextlib import asynccontextmanager
+import asyncio
 import json
+import os
 
 # Import the ResearchBot and related components
-from agent import ResearchBot, AgentState  # Assuming your original code is in research_bot.py
+from agent import ResearchBot, analyze_batch, node_update_payload, warmup_shared_components, audit_cache, audit_flights, analysis_flights
+from src.utils.worker_pool import PipelineBusyError, create_pipeline_pool
+from src.utils.session_store import create_session_store
+from src.utils.cache import response_cache, inflight_fetches
+from src.utils.github_tokens import token_pool
+from src.utils.job_queue import create_job_queue
+from src.utils.llm import llm_stats
+from src.utils.contract_code import provider_health
+from src.utils.metrics import Trace, registry
+from src.utils.logger import get_logger, set_correlation_id, start_logging, stop_logging
+from worker import JobWorker
+
+logger = get_logger(__name__)
 
 # Create state handler for bot instances
 class BotStateManager:
-    def __init__(self):
-        self.bot_instances = {}
+    """
+    Keeps per-session AgentState in a bounded session store. ResearchBot
+    itself is cheap (graph and LLM clients are shared), so a bot is rebuilt
+    around the stored state on every request. The store does blocking I/O:
+    endpoints call it through asyncio.to_thread.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or create_session_store()
 
     def get_or_create_bot(self, session_id: str) -> ResearchBot:
-        if session_id not in self.bot_instances:
-            self.bot_instances[session_id] = ResearchBot()
-        return self.bot_instances[session_id]
+        bot = ResearchBot()
+        bot.state = self.store.load(session_id)
+        return bot
+
+    def save_bot(self, session_id: str, bot: ResearchBot):
+        if bot.state is not None:
+            self.store.save(session_id, bot.state)
+
+    def run(self, session_id: str, bot: ResearchBot, method, *args):
+        """Call one of the bot's methods and persist the resulting state"""
+        result = method(*args)
+        self.save_bot(session_id, bot)
+        return result
+
+    def stream(self, session_id: str, bot: ResearchBot, method, *args):
+        """Stream one of the bot's generator methods and persist the final state"""
+        yield from method(*args)
+        self.save_bot(session_id, bot)
 
     def clear_bot(self, session_id: str):
-        if session_id in self.bot_instances:
-            del self.bot_instances[session_id]
+        self.store.delete(session_id)
+
+# Session state manager, created at startup like the job queue
+bot_manager = None
 
-# Initialize state manager
-bot_manager = BotStateManager()
+# Worker pool that runs the blocking research pipeline off the event loop
+pipeline_pool = create_pipeline_pool()
+
+# Persistent queue for /api/jobs, drained by in-process workers and worker.py.
+# Opened at startup, so importing this module does not create the database.
+job_queue = None
+job_worker = None
 
 # Request models
 class QueryRequest(BaseModel):
@@ -35,18 +80,40 @@ class TradingDecisionRequest(BaseModel):
     decision: str
     session_id: str
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    max_concurrency: Optional[int] = None
+
 class FollowupRequest(BaseModel):
     question: str
     session_id: str
 
 # Response models
 class AnalysisResponse(BaseModel):
-    result: Dict
+    result: Union[Dict, str]
     has_trading_prompt: bool = False
     error: Optional[str] = None
+    trace: Optional[Dict[str, Any]] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global bot_manager, job_queue, job_worker
+    start_logging()
+    bot_manager = BotStateManager()
+    job_queue = create_job_queue()
+    job_worker = JobWorker(job_queue, bot_manager.store, workers=int(os.getenv("JOB_WORKERS", "2")))
+    # Build the shared graph and LLM clients before serving the first session
+    warmup_shared_components(
+        include_trading_agent=os.getenv("WARMUP_TRADING_AGENT", "false").lower() == "true"
+    )
+    job_worker.start()
+    yield
+    job_worker.stop(timeout=5)
+    pipeline_pool.shutdown()
+    stop_logging()
 
 # Create FastAPI app
-app = FastAPI(title="Research Bot API")
+app = FastAPI(title="Research Bot API", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -57,52 +124,165 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def busy_response(error: PipelineBusyError) -> HTTPException:
+    return HTTPException(
+        status_code=error.status_code,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
 @app.post("/api/analyze", response_model=AnalysisResponse)
 async def analyze_project(request: QueryRequest):
+    set_correlation_id(request.session_id)
     try:
-        bot = bot_manager.get_or_create_bot(request.session_id)
+        bot = await asyncio.to_thread(bot_manager.get_or_create_bot, request.session_id)
+        trace = Trace()
         try:
-            result = bot.process_initial_query(request.query)
+            result = await pipeline_pool.run(
+                "analyze", trace.run, bot_manager.run, request.session_id, bot, bot.process_initial_query, request.query
+            )
+        except PipelineBusyError as e:
+            raise busy_response(e)
         except Exception as e:
-            # Log the error for debugging
-            import traceback
-            traceback.print_exc()
+            logger.exception("Analysis failed")
             raise HTTPException(status_code=500, detail=str(e))
         # Check if result contains trading prompt
         has_trading_prompt = True
         
         return AnalysisResponse(
             result=result,
-            has_trading_prompt=has_trading_prompt
+            has_trading_prompt=has_trading_prompt,
+            trace=trace.to_dict()
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def stream_event(event: str, data) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+@app.post("/api/analyze/stream")
+async def analyze_project_stream(request: QueryRequest):
+    """
+    Same analysis as /api/analyze, streamed as server-sent events: one event
+    per research node (named after the node) as soon as it finishes, then a
+    'result' event with the AnalysisResponse or an 'error' event.
+    """
+    set_correlation_id(request.session_id)
+    bot = await asyncio.to_thread(bot_manager.get_or_create_bot, request.session_id)
+    trace = Trace()
+    try:
+        updates = pipeline_pool.stream(
+            "analyze-stream", trace.stream, bot_manager.stream, request.session_id, bot, bot.stream_initial_query, request.query
+        )
+    except PipelineBusyError as e:
+        raise busy_response(e)
+
+    async def events():
+        try:
+            async for node, update in updates:
+                yield stream_event(node, node_update_payload(update))
+            result = AnalysisResponse(result=bot.state.final_analysis, has_trading_prompt=True, trace=trace.to_dict())
+            yield stream_event("result", result)
+        except Exception as e:
+            logger.exception("Streamed analysis failed")
+            yield stream_event("error", {"detail": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# Largest batch accepted by /api/analyze/batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+
+@app.post("/api/analyze/batch")
+async def analyze_projects_batch(request: BatchQueryRequest):
+    """
+    Analyze many addresses/repos in one call. Results are streamed as NDJSON,
+    one {"query", "result"} or {"query", "error"} line per query as each
+    analysis completes. Batch results are not kept as sessions.
+    """
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="At least one query required")
+    if len(request.queries) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_ITEMS} queries per batch")
+
+    try:
+        results = pipeline_pool.stream("analyze-batch", analyze_batch, request.queries, request.max_concurrency)
+    except PipelineBusyError as e:
+        raise busy_response(e)
+
+    async def lines():
+        try:
+            async for query, result in results:
+                yield json.dumps(jsonable_encoder({"query": query, **result})) + "\n"
+        except Exception as e:
+            logger.exception("Batch analysis failed")
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(request: QueryRequest):
+    """
+    Queue an analysis and return its job id immediately. The job keeps
+    running if the client disconnects; poll /api/jobs/{job_id} for progress.
+    """
+    set_correlation_id(request.session_id)
+    job_id = await asyncio.to_thread(job_queue.submit, "analyze", {"query": request.query}, session_id=request.session_id)
+    logger.info("Queued job %s", job_id)
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Job status (queued, running, succeeded or failed), the research steps
+    finished so far and, once done, the result or error.
+    """
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
 @app.post("/api/trading-decision", response_model=AnalysisResponse)
 async def process_trading(request: TradingDecisionRequest):
+    set_correlation_id(request.session_id)
     try:
-        bot = bot_manager.get_or_create_bot(request.session_id)
+        bot = await asyncio.to_thread(bot_manager.get_or_create_bot, request.session_id)
         if not bot.state:
             raise HTTPException(status_code=400, detail="No active analysis session")
             
-        result = bot.process_trading_decision(request.decision)
+        trace = Trace()
+        result = await pipeline_pool.run("trading-decision", trace.run, bot.process_trading_decision, request.decision)
         
         # Clear bot state after trading decision
-        bot_manager.clear_bot(request.session_id)
+        await asyncio.to_thread(bot_manager.clear_bot, request.session_id)
         
-        return AnalysisResponse(result=result)
+        return AnalysisResponse(result=result, trace=trace.to_dict())
+    except PipelineBusyError as e:
+        raise busy_response(e)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/followup", response_model=AnalysisResponse)
 async def process_followup(request: FollowupRequest):
+    set_correlation_id(request.session_id)
     try:
-        bot = bot_manager.get_or_create_bot(request.session_id)
+        bot = await asyncio.to_thread(bot_manager.get_or_create_bot, request.session_id)
         if not bot.state:
             raise HTTPException(status_code=400, detail="No active analysis session")
             
-        result = bot.process_followup(request.question)
-        return AnalysisResponse(result=result)
+        trace = Trace()
+        result = await pipeline_pool.run(
+            "followup", trace.run, bot_manager.run, request.session_id, bot, bot.process_followup, request.question
+        )
+        return AnalysisResponse(result=result, trace=trace.to_dict())
+    except PipelineBusyError as e:
+        raise busy_response(e)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -113,14 +293,54 @@ async def reset_session(request: Dict[str, str]):
         if not session_id:
             raise HTTPException(status_code=400, detail="Session ID required")
             
-        bot_manager.clear_bot(session_id)
+        await asyncio.to_thread(bot_manager.clear_bot, session_id)
         return {"status": "success", "message": "Session reset successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/sessions/stats")
+async def session_stats():
+    return await asyncio.to_thread(bot_manager.store.stats)
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    return {
+        "responses": response_cache.stats(),
+        "contract_audits": audit_cache.stats(),
+        "in_flight": {group.name: group.stats() for group in (inflight_fetches, audit_flights, analysis_flights)},
+    }
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: node, upstream and LLM timings, tokens, cost, cache and queue state"""
+    pipeline = pipeline_pool.stats()
+    registry.set_gauge("pipeline_pending", pipeline["pending"])
+    for endpoint, stats in pipeline["endpoints"].items():
+        registry.set_gauge("pipeline_queued", stats["queued"], endpoint=endpoint)
+        registry.set_gauge("pipeline_running", stats["running"], endpoint=endpoint)
+    # SQLite query, kept off the event loop
+    jobs = await asyncio.to_thread(job_queue.stats)
+    for status, count in jobs["jobs"].items():
+        registry.set_gauge("jobs", count, status=status)
+    sessions = await asyncio.to_thread(bot_manager.store.stats)
+    registry.set_gauge("sessions", sessions["sessions"])
+    registry.set_gauge("session_bytes", sessions["bytes"])
+    registry.set_gauge("response_cache_entries", response_cache.stats()["entries"])
+    for model, stats in llm_stats().items():
+        registry.set_gauge("llm_in_flight", stats["in_flight"], model=model)
+        registry.set_gauge("llm_waiting", stats["waiting"], model=model)
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "pipeline": pipeline_pool.stats(),
+        "jobs": await asyncio.to_thread(job_queue.stats),
+        "github_rate_limit": token_pool.stats(),
+        "llm": llm_stats(),
+        "contract_source_providers": provider_health.stats(),
+    }
 
 if __name__ == "__main__":
     uvicorn.run("server:app", host="0.0.0.0", port=8000, reload=True)  # Changed from main:app to server:app
\ No newline at end of file
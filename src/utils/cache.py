@@ -0,0 +1,218 @@
+import functools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+from src.utils.metrics import registry, add_total
+from src.utils.singleflight import SingleFlight
+
+# Load environment variables
+load_dotenv()
+
+# Default time-to-live per upstream source, in seconds. None never expires.
+# Verified contract source cannot change once deployed; prices go stale fast.
+DEFAULT_TTLS = {
+    "github_repo": 600,
+    "github_user": 1800,
+    "github_user_repos": 1800,
+    "github_repos_page": 1800,
+    "contract_source": 30 * 24 * 3600,
+    "coingecko": 60,
+    "coingecko_price": 60,
+}
+
+MISS = object()
+
+
+@dataclass
+class CacheEntry:
+    value: object
+    expires_at: float  # None for entries that never expire
+    etag: str = None
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires_at is None or time.time() < self.expires_at
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache of upstream responses keyed by (source, key).
+
+    Each source has its own TTL. Expired entries are kept until evicted so
+    callers holding an ETag can revalidate them with a conditional request.
+    When path is set, entries are written through to SQLite and survive
+    restarts. Cached values are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttls: dict = None, path: str = None, max_disk_entries: int = None):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries or max_entries * 8
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._disk_writes = 0
+        self._stats = {}
+
+    @classmethod
+    def from_env(cls):
+        """Build the cache from RESPONSE_CACHE_* and CACHE_TTL_<SOURCE> environment variables"""
+        ttls = dict(DEFAULT_TTLS)
+        for source in ttls:
+            value = os.getenv(f"CACHE_TTL_{source.upper()}")
+            if value:
+                ttls[source] = float(value)
+        return cls(
+            max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048")),
+            ttls=ttls,
+            path=os.getenv("RESPONSE_CACHE_PATH") or None,
+        )
+
+    def _db(self):
+        # Opened on first use so importing the module has no side effects
+        if self._conn is None and self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "source TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, etag TEXT, expires_at REAL, "
+                "PRIMARY KEY (source, key))"
+            )
+        return self._conn
+
+    def _count(self, source: str, name: str):
+        stats = self._stats.setdefault(source, {"hits": 0, "misses": 0, "revalidated": 0, "stores": 0, "evictions": 0})
+        stats[name] += 1
+
+    def _remember(self, cache_key, entry: CacheEntry):
+        self._entries[cache_key] = entry
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._count(evicted[0], "evictions")
+
+    def lookup(self, source: str, key: str) -> CacheEntry:
+        """Return the entry for (source, key) even if stale, or None. Does not count hits."""
+        cache_key = (source, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                return entry
+
+            db = self._db()
+            if db is None:
+                return None
+            row = db.execute(
+                "SELECT value, etag, expires_at FROM entries WHERE source = ? AND key = ?", (source, key)
+            ).fetchone()
+            if row is None:
+                return None
+            entry = CacheEntry(pickle.loads(row[0]), row[2], row[1])
+            self._remember(cache_key, entry)
+            return entry
+
+    def get(self, source: str, key: str):
+        """Return the fresh cached value for (source, key), or MISS"""
+        entry = self.lookup(source, key)
+        hit = entry is not None and entry.fresh
+        registry.inc("cache_requests_total", source=source, result="hit" if hit else "miss")
+        add_total("cache_hits" if hit else "cache_misses", 1)
+        with self._lock:
+            if hit:
+                self._count(source, "hits")
+                return entry.value
+            self._count(source, "misses")
+            return MISS
+
+    def set(self, source: str, key: str, value, etag: str = None, ttl: float = None):
+        """Store value under (source, key) using the source's TTL unless ttl is given"""
+        ttl = self.ttls.get(source) if ttl is None else ttl
+        entry = CacheEntry(value, None if ttl is None else time.time() + ttl, etag)
+        with self._lock:
+            self._remember((source, key), entry)
+            self._count(source, "stores")
+            db = self._db()
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO entries (source, key, value, etag, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (source, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), etag, entry.expires_at),
+                )
+                self._disk_writes += 1
+                if self._disk_writes % 256 == 0:
+                    # Keep the file bounded, dropping the entries closest to expiry first
+                    db.execute(
+                        "DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries "
+                        "ORDER BY COALESCE(expires_at, 1e18) DESC LIMIT -1 OFFSET ?)",
+                        (self.max_disk_entries,),
+                    )
+
+    def revalidated(self, source: str, key: str, entry: CacheEntry):
+        """Record a 304 Not Modified: the stale entry is fresh again for another TTL"""
+        self.set(source, key, entry.value, etag=entry.etag)
+        registry.inc("cache_requests_total", source=source, result="revalidated")
+        with self._lock:
+            self._count(source, "revalidated")
+
+    def clear(self):
+        """Drop every entry, in memory and on disk, and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._stats = {}
+            db = self._db()
+            if db is not None:
+                db.execute("DELETE FROM entries")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "persistent": bool(self.path),
+                "sources": {source: dict(stats) for source, stats in self._stats.items()},
+            }
+
+
+# Process-wide cache for upstream API responses
+response_cache = ResponseCache.from_env()
+
+# Concurrent misses for the same (source, key) share one upstream fetch
+inflight_fetches = SingleFlight("fetch")
+
+
+def cached(source: str, key=None, cache_if=None, cache: ResponseCache = None):
+    """
+    Decorator caching a fetcher's return value under the given source.
+    key(*args, **kwargs) builds the cache key; cache_if(result) decides
+    whether a result is worth storing (e.g. only successful fetches).
+    Concurrent misses for the same key make a single call to the fetcher.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            target = cache or response_cache
+            cache_key = key(*args, **kwargs) if key else repr((args, sorted(kwargs.items())))
+            value = target.get(source, cache_key)
+            if value is not MISS:
+                return value
+
+            def fetch():
+                value = fn(*args, **kwargs)
+                if cache_if is None or cache_if(value):
+                    target.set(source, cache_key, value)
+                return value
+
+            value, _ = inflight_fetches.do((source, cache_key), fetch)
+            return value
+        return wrapper
+    return decorator
@@ -1,76 +1,250 @@
 from dotenv import load_dotenv
 import os
-import requests
 import json
 import re
+import threading
+import time
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from src.utils import http_client
+from src.utils.cache import cached
+from src.utils.metrics import registry
+from src.utils.logger import get_logger
 
 # Load environment variables
 load_dotenv()
 
-def fetch_contract_source_code(account_address: str):
+logger = get_logger(__name__)
+
+# Hedged fetch: BaseScan first, Covalent too if BaseScan has not answered
+# within this many seconds; the first to return source wins
+CONTRACT_SOURCE_HEDGE = os.getenv("CONTRACT_SOURCE_HEDGE", "true").lower() == "true"
+CONTRACT_SOURCE_HEDGE_DELAY = float(os.getenv("CONTRACT_SOURCE_HEDGE_DELAY", "1.5"))
+# A provider that failed this many times in a row is skipped for the cooldown
+PROVIDER_MAX_FAILURES = int(os.getenv("CONTRACT_SOURCE_MAX_FAILURES", "3"))
+PROVIDER_COOLDOWN = float(os.getenv("CONTRACT_SOURCE_COOLDOWN", "60"))
+
+# Threads running provider fetches; a cancelled loser keeps its thread until
+# its current attempt times out
+_source_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="contract-source")
+
+
+class SourceNotFound(Exception):
+    """The provider answered, but has no verified source for the contract"""
+
+
+class ProviderHealth:
+    """
+    Recent outcomes per source provider. After PROVIDER_MAX_FAILURES
+    failures in a row a provider is skipped until PROVIDER_COOLDOWN has
+    passed; then one call is let through, and its outcome decides.
+    """
+
+    def __init__(self, max_failures: int = PROVIDER_MAX_FAILURES, cooldown: float = PROVIDER_COOLDOWN):
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self._failures = {}
+        self._retry_at = {}
+        self._lock = threading.Lock()
+
+    def available(self, provider: str) -> bool:
+        with self._lock:
+            retry_at = self._retry_at.get(provider)
+            if retry_at is None:
+                return True
+            if time.monotonic() < retry_at:
+                return False
+            # Trial call; another failure closes the provider again right away
+            self._retry_at[provider] = time.monotonic() + self.cooldown
+            return True
+
+    def success(self, provider: str):
+        with self._lock:
+            self._failures[provider] = 0
+            self._retry_at.pop(provider, None)
+
+    def failure(self, provider: str):
+        with self._lock:
+            failures = self._failures[provider] = self._failures.get(provider, 0) + 1
+            if failures >= self.max_failures:
+                if provider not in self._retry_at:
+                    logger.warning("Skipping contract source provider %s for %gs after %d failures",
+                                   provider, self.cooldown, failures)
+                self._retry_at[provider] = time.monotonic() + self.cooldown
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                provider: {
+                    "consecutive_failures": failures,
+                    "skipped_for": max(0, round(self._retry_at[provider] - now)) if provider in self._retry_at else 0,
+                }
+                for provider, failures in self._failures.items()
+            }
+
+
+provider_health = ProviderHealth()
+
+
+def fetch_basescan_source(account_address: str, cancel: threading.Event = None) -> list:
+    """Main contract source from the BaseScan API"""
+    api_key = os.environ.get("ETHERSCAN_API_KEY")
+    if not api_key:
+        raise Exception("ETHERSCAN_API_KEY not set in environment")
+    url = f"https://api.basescan.org/api?module=contract&action=getsourcecode&address={account_address}&apikey={api_key}"
+    response = http_client.get(url, cancel=cancel)
+    response.raise_for_status()
+
+    data = response.json()
+    if data.get("status") != "1":
+        raise Exception(f"API error! message: {data.get('message')}")
+
+    # Typically the first and only item in "result"
+    result = data.get("result", [{}])[0]
+    raw_source = result.get("SourceCode", "")
+    contract_name = result.get("ContractName", "")
+    logger.debug("BaseScan returned contract %s", contract_name)
+
+    # Process the raw_source (e.g., JSON encoded with multiple files)
+    main_contract_code = extract_main_contract(raw_source, contract_name)
+    if not main_contract_code:
+        raise SourceNotFound("No verified source code from BaseScan")
+    return main_contract_code
+
+
+def fetch_covalent_source(account_address: str, cancel: threading.Event = None) -> list:
+    """Main contract source from Covalent's contract metadata"""
+    covalent_api_key = os.environ.get("COVALENT_API_KEY")
+    if not covalent_api_key:
+        raise Exception("COVALENT_API_KEY not set in environment")
+    # Assuming the Base chain id is 8453. Adjust if needed.
+    chain_id = "8453"
+    covalent_url = f"https://api.covalenthq.com/v1/{chain_id}/address/{account_address}/contract_metadata/?key={covalent_api_key}"
+    response = http_client.get(covalent_url, cancel=cancel)
+    response.raise_for_status()
+
+    data = response.json()
+    items = data.get("data", {}).get("items", [])
+    if not items:
+        raise SourceNotFound("No contract metadata found from Covalent")
+    # Use the first item from the returned list
+    contract_metadata = items[0].get("contract_metadata", {})
+    source_code = contract_metadata.get("source_code")
+    if not source_code:
+        raise SourceNotFound("No source code found in Covalent contract metadata")
+
+    # Process the source code. If the Covalent API returns JSON-encoded source code,
+    # the extract_main_contract function can process it.
+    main_contract_code = extract_main_contract(source_code, "")
+    if not main_contract_code:
+        raise SourceNotFound("No main contract in Covalent source code")
+    return main_contract_code
+
+
+# Providers in order of preference
+SOURCE_PROVIDERS = (("basescan", fetch_basescan_source), ("covalent", fetch_covalent_source))
+
+
+def _fetch_from(provider: str, fetch, account_address: str, cancel: threading.Event) -> list:
+    """Run one provider's fetch, recording its outcome in provider_health and the metrics"""
+    try:
+        source = fetch(account_address, cancel)
+    except http_client.RequestCancelled:
+        registry.inc("contract_source_requests_total", provider=provider, result="cancelled")
+        raise
+    except SourceNotFound:
+        # A healthy answer, just not a useful one
+        provider_health.success(provider)
+        registry.inc("contract_source_requests_total", provider=provider, result="not_found")
+        raise
+    except Exception:
+        provider_health.failure(provider)
+        registry.inc("contract_source_requests_total", provider=provider, result="error")
+        raise
+    provider_health.success(provider)
+    registry.inc("contract_source_requests_total", provider=provider, result="ok")
+    return source
+
+
+def _fetch_hedged(account_address: str, providers) -> dict:
     """
-    Fetch contract source code from the BaseScan API.
-    If that fails, attempt to fetch the contract code using Covalent’s API.
-    Then iterate over each file (key in 'sources'), skipping OpenZeppelin/library imports,
-    and return only the main contract's Solidity code.
+    Start the first provider, and the next one whenever the running ones
+    have all failed or CONTRACT_SOURCE_HEDGE_DELAY passes without an answer.
+    The first source returned wins and the others are cancelled.
     """
-    print("I am inside fetch_contract_source_code")
+    cancel = threading.Event()
+    remaining = list(providers)
+    running = {}
+    errors = []
+
+    def start():
+        provider, fetch = remaining.pop(0)
+        future = _source_executor.submit(
+            contextvars.copy_context().run, _fetch_from, provider, fetch, account_address, cancel
+        )
+        running[future] = provider
 
+    start()
     try:
-        # Attempt using BaseScan API
-        api_key = os.environ.get("ETHERSCAN_API_KEY")
-        if not api_key:
-            raise Exception("ETHERSCAN_API_KEY not set in environment")
-        url = f"https://api.basescan.org/api?module=contract&action=getsourcecode&address={account_address}&apikey={api_key}"
-        response = requests.get(url)
-        response.raise_for_status()
-
-        data = response.json()
-        if data.get("status") != "1":
-            raise Exception(f"API error! message: {data.get('message')}")
-
-        # Typically the first and only item in "result"
-        result = data.get("result", [{}])[0]
-        raw_source = result.get("SourceCode", "")
-        contract_name = result.get("ContractName", "")
-        print("contract_name:", contract_name)
-
-        # Process the raw_source (e.g., JSON encoded with multiple files)
-        main_contract_code = extract_main_contract(raw_source, contract_name)
-        return {"success": True, "data": main_contract_code}
-
-    except Exception as error:
-        print("Failed to fetch contract source code using BaseScan API:", error)
-        print("Attempting to fetch contract source code using Covalent API...")
+        while running:
+            done, _ = wait(
+                running,
+                timeout=CONTRACT_SOURCE_HEDGE_DELAY if remaining else None,
+                return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                provider = running.pop(future)
+                try:
+                    source = future.result()
+                except Exception as error:
+                    logger.warning("%s source fetch failed for %s: %s", provider, account_address, error)
+                    errors.append(f"{provider}: {error}")
+                    continue
+                if provider != providers[0][0]:
+                    registry.inc("contract_source_hedge_wins_total", provider=provider)
+                return {"success": True, "data": source, "provider": provider}
+            if remaining and (not done or not running):
+                if not done:
+                    logger.debug("No contract source after %gs, also asking %s", CONTRACT_SOURCE_HEDGE_DELAY, remaining[0][0])
+                start()
+    finally:
+        # Losers stop before their next attempt or backoff
+        cancel.set()
+    return {"success": False, "error": "; ".join(errors)}
 
+
+def _fetch_sequential(account_address: str, providers) -> dict:
+    errors = []
+    for provider, fetch in providers:
         try:
-            covalent_api_key = os.environ.get("COVALENT_API_KEY")
-            if not covalent_api_key:
-                raise Exception("COVALENT_API_KEY not set in environment")
-            # Assuming the Base chain id is 8453. Adjust if needed.
-            chain_id = "8453"
-            covalent_url = f"https://api.covalenthq.com/v1/{chain_id}/address/{account_address}/contract_metadata/?key={covalent_api_key}"
-            response = requests.get(covalent_url)
-            response.raise_for_status()
-
-            data = response.json()
-            items = data.get("data", {}).get("items", [])
-            if not items:
-                raise Exception("No contract metadata found from Covalent")
-            # Use the first item from the returned list
-            contract_metadata = items[0].get("contract_metadata", {})
-            source_code = contract_metadata.get("source_code")
-            if not source_code:
-                raise Exception("No source code found in Covalent contract metadata")
-            
-            # Process the source code. If the Covalent API returns JSON-encoded source code,
-            # the extract_main_contract function can process it.
-            main_contract_code = extract_main_contract(source_code, "")
-            return {"success": True, "data": main_contract_code}
-
-        except Exception as covalent_error:
-            print("Failed to fetch contract source code from Covalent API:", covalent_error)
-            return {"success": False, "error": str(covalent_error)}
+            return {"success": True, "data": _fetch_from(provider, fetch, account_address, None), "provider": provider}
+        except Exception as error:
+            logger.warning("%s source fetch failed for %s: %s", provider, account_address, error)
+            errors.append(f"{provider}: {error}")
+    return {"success": False, "error": "; ".join(errors)}
+
+
+# Verified source never changes, so successful fetches are cached for a long time
+@cached("contract_source", key=lambda account_address: account_address.lower(), cache_if=lambda result: result["success"])
+def fetch_contract_source_code(account_address: str):
+    """
+    Fetch the main contract's Solidity code (OpenZeppelin/library files
+    skipped) from BaseScan or Covalent.
+    Hedged by default: Covalent is asked too when BaseScan is slow or fails,
+    and the first source returned wins. With CONTRACT_SOURCE_HEDGE=false the
+    providers are tried one after the other. Providers that keep failing are
+    skipped for a while (see ProviderHealth).
+    """
+    logger.debug("Fetching contract source for %s", account_address)
+
+    providers = [p for p in SOURCE_PROVIDERS if provider_health.available(p[0])]
+    if not providers:
+        # Every provider is cooling down; trying is better than failing outright
+        providers = list(SOURCE_PROVIDERS)
+    if CONTRACT_SOURCE_HEDGE and len(providers) > 1:
+        return _fetch_hedged(account_address, providers)
+    return _fetch_sequential(account_address, providers)
 
 def extract_main_contract(raw_source: str, contract_name: str) -> list:
     """
@@ -97,9 +271,52 @@ def extract_main_contract(raw_source: str, contract_name: str) -> list:
             contract_contents.append(value.get("content", ""))
         return contract_contents
     except Exception as e:
-        print("Error in extract_main_contract:", e)
+        logger.warning("Could not parse contract sources: %s", e)
         return []
 
+# Whole lines that carry no audit signal: license headers, pragmas and imports
+BOILERPLATE_LINES = re.compile(r"^[ \t]*(// SPDX-License-Identifier:.*|pragma\s[^;]*;|import\s[^;]*;)[ \t]*$", re.MULTILINE)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for source code (about 4 characters per token)"""
+    return (len(text) + 3) // 4
+
+def split_solidity_source(contract_files, max_tokens: int = 6000) -> list:
+    """
+    Split contract files into chunks of at most ~max_tokens for analysis.
+    1. Drop boilerplate lines (license, pragma, imports).
+    2. Split each file at Solidity boundaries (contract/interface/library,
+       then function/modifier/event) using the Solidity-aware text splitter.
+    3. Pack consecutive small pieces back together up to max_tokens so tiny
+       files don't each cost a separate LLM call.
+    """
+    from langchain.text_splitter import Language, RecursiveCharacterTextSplitter
+
+    if isinstance(contract_files, str):
+        contract_files = [contract_files]
+
+    splitter = RecursiveCharacterTextSplitter.from_language(
+        language=Language.SOL,
+        chunk_size=max_tokens * 4,
+        chunk_overlap=0
+    )
+
+    chunks = []
+    current = ""
+    for source in contract_files:
+        source = BOILERPLATE_LINES.sub("", source).strip()
+        if not source:
+            continue
+        for piece in splitter.split_text(source):
+            if current and estimate_tokens(current) + estimate_tokens(piece) > max_tokens:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
 # # Example usage:
 # if __name__ == "__main__":
 #     # Replace with a valid contract address on Base.
@@ -1,22 +1,102 @@
+import contextvars
 import os
-import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse
-from langchain_openai import ChatOpenAI  # new recommended import
+from src.utils import http_client, scoring
+from src.utils.cache import MISS, inflight_fetches, response_cache
+from src.utils.github_tokens import HIGH, LOW, token_pool
+from src.utils.llm import get_chat_model
+from src.utils.logger import get_logger, log_payload
 
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
-# Ensure your credentials are set
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-if not GITHUB_TOKEN:
-    raise ValueError("Please set the GITHUB_TOKEN environment variable with your GitHub personal access token.")
-
-# Set headers for GitHub API requests
-HEADERS = {
-    "Authorization": f"Bearer {GITHUB_TOKEN}",
-    "Accept": "application/vnd.github+json"
+
+logger = get_logger(__name__)
+
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+# Owners with up to one page of repositories are summarized with a single GraphQL query
+GITHUB_GRAPHQL = os.getenv("GITHUB_GRAPHQL", "true").lower() == "true"
+# Larger owners are paged through the REST API, this many pages at a time
+GITHUB_PAGE_CONCURRENCY = int(os.getenv("GITHUB_PAGE_CONCURRENCY", "4"))
+GITHUB_MAX_REPO_PAGES = int(os.getenv("GITHUB_MAX_REPO_PAGES", "50"))
+REPOS_PER_PAGE = 100
+
+# Only the two fields the aggregates need; REST returns ~100 fields per repository
+OWNER_REPOS_QUERY = """
+query($login: String!) {
+  repositoryOwner(login: $login) {
+    repositories(first: 100, privacy: PUBLIC, ownerAffiliations: OWNER) {
+      totalCount
+      nodes { stargazerCount forkCount }
+    }
+  }
 }
+"""
+
+def github_request(method: str, url: str, priority: str = HIGH, headers: dict = None, **kwargs):
+    """
+    Send a GitHub API request with a token from the shared pool (see
+    github_tokens). A response refused by a rate limit is retried on another
+    token while one has budget. Low-priority calls raise RateLimitExhausted
+    instead of spending the last of the budget.
+    """
+    resource = "graphql" if url == GITHUB_GRAPHQL_URL else "core"
+    for _ in range(max(1, len(token_pool.tokens))):
+        token = token_pool.acquire(resource, priority)
+        response = None
+        try:
+            response = http_client.request(method, url, headers={
+                "Authorization": f"Bearer {token.value}",
+                "Accept": "application/vnd.github+json",
+                **(headers or {})
+            }, **kwargs)
+        finally:
+            token_pool.release(token, resource, response)
+        if not token_pool.is_rate_limited(response):
+            break
+        logger.warning("GitHub %s rate limit reached on %s", resource, token.label)
+    return response
+
+def fetch_github_json(
+    url: str, source: str, key: str, error_message: str, transform, paginated: bool = False, priority: str = HIGH
+):
+    """
+    GET a GitHub API resource through the response cache and return transform(json).
+    Stale entries are revalidated with If-None-Match, so unchanged resources
+    cost a 304 (which GitHub does not count against the rate limit).
+    Concurrent misses for the same resource share one request.
+    For paginated resources the value is (transform(json), has_next_page).
+    """
+    value = response_cache.get(source, key)
+    if value is not MISS:
+        return value
+    value, _ = inflight_fetches.do(
+        (source, key), revalidate_github_json, url, source, key, error_message, transform, paginated, priority
+    )
+    return value
+
+def revalidate_github_json(
+    url: str, source: str, key: str, error_message: str, transform, paginated: bool = False, priority: str = HIGH
+):
+    """Fetch a resource that is missing from the cache or stale, and store it"""
+    entry = response_cache.lookup(source, key)
+    headers = {}
+    if entry is not None and entry.etag:
+        headers["If-None-Match"] = entry.etag
+    r = github_request("GET", url, priority, headers=headers)
+    if r.status_code == 304 and entry is not None:
+        response_cache.revalidated(source, key, entry)
+        return entry.value
+    if r.status_code != 200:
+        raise Exception(f"{error_message}: {r.text}")
+
+    value = transform(r.json())
+    if paginated:
+        value = (value, "next" in r.links)
+    response_cache.set(source, key, value, etag=r.headers.get("ETag"))
+    return value
 
 def parse_github_url(url: str) -> dict:
     """
@@ -28,88 +108,174 @@ def parse_github_url(url: str) -> dict:
     """
     parsed = urlparse(url)
     path_parts = parsed.path.strip("/").split("/")
-    print('I am inside parse_github_url')
+    logger.debug("Parsing GitHub URL %s", url)
     if len(path_parts) == 1:
-        print('I am inside parse_github_url',path_parts[0])
-
         return {"type": "user", "username": path_parts[0]}
     elif len(path_parts) >= 2:
-        print('I am inside parse_github_url',path_parts[0], path_parts[1])
-
         return {"type": "repo", "username": path_parts[0], "repo": path_parts[1]}
     else:
         raise ValueError("Invalid GitHub URL format.")
 
+def summarize_repos(repos, stars: str = "stargazers_count", forks: str = "forks_count") -> dict:
+    """Star, fork and repository totals of a list of repositories"""
+    return {
+        "total_stars": sum(repo.get(stars) or 0 for repo in repos),
+        "total_forks": sum(repo.get(forks) or 0 for repo in repos),
+        "repos_count": len(repos)
+    }
+
+def add_repo_summary(totals: dict, summary: dict):
+    for name in ("total_stars", "total_forks", "repos_count"):
+        totals[name] += summary[name]
+
+def fetch_repos_summary_graphql(username: str):
+    """
+    Repository totals of an owner in one GraphQL round trip, fetching only
+    stars and forks. Returns None if the owner has more than one page of repositories.
+    """
+    r = github_request(
+        "POST", GITHUB_GRAPHQL_URL, LOW, json={"query": OWNER_REPOS_QUERY, "variables": {"login": username}}
+    )
+    if r.status_code != 200:
+        raise Exception(f"GitHub GraphQL error: {r.text}")
+    body = r.json()
+    if body.get("errors"):
+        raise Exception(f"GitHub GraphQL error: {body['errors']}")
+    owner = (body.get("data") or {}).get("repositoryOwner")
+    if owner is None:
+        raise Exception(f"GitHub owner not found: {username}")
+
+    repositories = owner["repositories"]
+    if repositories["totalCount"] > len(repositories["nodes"]):
+        return None
+    return summarize_repos(repositories["nodes"], stars="stargazerCount", forks="forkCount")
+
+def fetch_repos_page(username: str, page: int):
+    """Summary of one page of /users/{username}/repos and whether a next page exists"""
+    url = f"https://api.github.com/users/{username}/repos?per_page={REPOS_PER_PAGE}&page={page}"
+    return fetch_github_json(
+        url, "github_repos_page", f"{username.lower()}:{page}", "Error fetching repositories",
+        summarize_repos, paginated=True, priority=LOW
+    )
+
+def fetch_repos_summary_rest(username: str, public_repos: int) -> dict:
+    """
+    Repository totals over every page of the REST repository list. The page
+    count comes from public_repos, so all pages are requested concurrently;
+    the Link header of the last one catches repositories added since.
+    Pages are folded into the totals as they arrive and cached with their
+    own ETags, so refreshing a large owner only downloads the pages that changed.
+    """
+    pages = max(1, min(-(-public_repos // REPOS_PER_PAGE), GITHUB_MAX_REPO_PAGES))
+    totals = {"total_stars": 0, "total_forks": 0, "repos_count": 0}
+
+    with ThreadPoolExecutor(max_workers=min(GITHUB_PAGE_CONCURRENCY, pages), thread_name_prefix="github-pages") as pool:
+        futures = [
+            pool.submit(contextvars.copy_context().run, fetch_repos_page, username, page)
+            for page in range(1, pages + 1)
+        ]
+        for future in as_completed(futures):
+            add_repo_summary(totals, future.result()[0])
+        has_next = futures[-1].result()[1]
+
+    page = pages
+    while has_next and page < GITHUB_MAX_REPO_PAGES:
+        page += 1
+        summary, has_next = fetch_repos_page(username, page)
+        add_repo_summary(totals, summary)
+    return totals
+
+def fetch_repos_summary(username: str, public_repos: int) -> dict:
+    """Cached star/fork/repository totals of an owner, via GraphQL when one query covers them"""
+    key = username.lower()
+    value = response_cache.get("github_user_repos", key)
+    if value is not MISS:
+        return value
+
+    def aggregate():
+        summary = None
+        if GITHUB_GRAPHQL and public_repos <= REPOS_PER_PAGE:
+            try:
+                summary = fetch_repos_summary_graphql(username)
+            except Exception as e:
+                logger.warning("GitHub GraphQL repository query failed for %s, using REST: %s", username, e)
+        if summary is None:
+            summary = fetch_repos_summary_rest(username, public_repos)
+        response_cache.set("github_user_repos", key, summary)
+        return summary
+
+    value, _ = inflight_fetches.do(("github_user_repos", key), aggregate)
+    return value
+
 def fetch_user_data(username: str) -> dict:
     """
     Fetches user details and repository metrics:
       - GET /users/{username} for overall user details.
-      - GET /users/{username}/repos for repo details (up to 100 repos).
-    Aggregates total stars and forks.
+      - Star and fork totals over all of the owner's public repositories.
+    These calls are low priority: they raise RateLimitExhausted rather than
+    spend the GitHub budget reserved for repository lookups.
     """
-    print('I am inside fetch_user_data')
+    logger.debug("Fetching GitHub user %s", username)
     user_url = f"https://api.github.com/users/{username}"
-    r = requests.get(user_url, headers=HEADERS)
-    if r.status_code != 200:
-        raise Exception(f"Error fetching user data: {r.text}")
-    user_data = r.json()
+    user_data = fetch_github_json(
+        user_url, "github_user", username.lower(), "Error fetching user data",
+        lambda data: {"followers": data.get("followers", 0), "public_repos": data.get("public_repos", 0)},
+        priority=LOW
+    )
     
-    repos_url = f"https://api.github.com/users/{username}/repos?per_page=100"
-    r_repos = requests.get(repos_url, headers=HEADERS)
-    if r_repos.status_code != 200:
-        raise Exception(f"Error fetching repositories: {r_repos.text}")
-    repos_data = r_repos.json()
+    # Only the aggregates are cached, not the full repository list
+    repos_summary = fetch_repos_summary(username, user_data.get("public_repos", 0))
     
-    total_stars = sum(repo.get("stargazers_count", 0) for repo in repos_data)
-    total_forks = sum(repo.get("forks_count", 0) for repo in repos_data)
-    num_repos = len(repos_data)
-    print('I am inside fetch_user_data',{
-        "followers": user_data.get("followers", 0),
-        "public_repos": user_data.get("public_repos", 0),
-        "total_stars": total_stars,
-        "total_forks": total_forks,
-        "repos_count": num_repos
-    })
-
+    total_stars = repos_summary["total_stars"]
+    total_forks = repos_summary["total_forks"]
+    num_repos = repos_summary["repos_count"]
     
-    return {
+    user_metrics = {
         "followers": user_data.get("followers", 0),
         "public_repos": user_data.get("public_repos", 0),
         "total_stars": total_stars,
         "total_forks": total_forks,
         "repos_count": num_repos
     }
+    log_payload(logger, "GitHub user metrics", user_metrics)
+    return user_metrics
 
 def fetch_repo_data(username: str, repo: str) -> dict:
     """
     Fetches repository details from GET /repos/{username}/{repo}.
     """
-    print('I am inside fetch_repo_data')
+    logger.debug("Fetching GitHub repo %s/%s", username, repo)
 
     url = f"https://api.github.com/repos/{username}/{repo}"
-    r = requests.get(url, headers=HEADERS)
-    if r.status_code != 200:
-        raise Exception(f"Error fetching repository data: {r.text}")
-    repo_data = r.json()
-    print('I am inside fetch_repo_data',{
-        "stars": repo_data.get("stargazers_count", 0),
-        "forks": repo_data.get("forks_count", 0),
-        "watchers": repo_data.get("watchers_count", 0),
-        "open_issues": repo_data.get("open_issues_count", 0)
-    })
+    metrics = fetch_github_json(
+        url, "github_repo", f"{username}/{repo}".lower(), "Error fetching repository data",
+        lambda repo_data: {
+            "stars": repo_data.get("stargazers_count", 0),
+            "forks": repo_data.get("forks_count", 0),
+            "watchers": repo_data.get("watchers_count", 0),
+            "open_issues": repo_data.get("open_issues_count", 0)
+        }
+    )
+    log_payload(logger, "GitHub repo metrics", metrics)
 
-    return {
-        "stars": repo_data.get("stargazers_count", 0),
-        "forks": repo_data.get("forks_count", 0),
-        "watchers": repo_data.get("watchers_count", 0),
-        "open_issues": repo_data.get("open_issues_count", 0)
-    }
+    return dict(metrics)
+
+def local_rating(score) -> str:
+    """Rating text of a src.utils.scoring Score, in the form the LLM ratings take"""
+    if score.error is not None:
+        return f"Rating: 0/10. {score.error}."
+    return f"Rating: {score.rating:.1f}/10. {score.comment}"
 
 def rate_user_activity(metrics: dict) -> str:
     """
-    Uses the ChatOpenAI model to produce a rating (1-10) and explanation for a GitHub user.
+    Produces a rating (1-10) and explanation for a GitHub user. Computed
+    locally from percentiles of the metrics, unless SCORING_MODE sends it to
+    the ChatOpenAI model ("llm", or "hybrid" when the signals disagree).
     """
-    print('I am inside rate_user_activity')
+    logger.debug("Rating GitHub user activity")
+    score = scoring.score_user(metrics)
+    if not scoring.escalate("github_user", score.ambiguous):
+        return local_rating(score)
 
     template = (
         "You are a GitHub rating assistant. Given the following metrics for a GitHub user:\n\n"
@@ -121,17 +287,21 @@ def rate_user_activity(metrics: dict) -> str:
         "along with a brief explanation."
     )
     prompt_text = template.format(**metrics)
-    llm = ChatOpenAI(temperature=0, model="gpt-3.5-turbo")
-    response = llm(prompt_text)
-    print('I am inside rate_user_activity',response)
+    llm = get_chat_model("gpt-3.5-turbo")
+    response = llm.invoke(prompt_text).content
+    log_payload(logger, "GitHub user rating", response)
 
     return response
 
 def rate_repo_activity(metrics: dict) -> str:
     """
-    Uses the ChatOpenAI model to produce a rating (1-10) and explanation for a GitHub repository.
+    Produces a rating (1-10) and explanation for a GitHub repository, locally
+    or with the ChatOpenAI model as for rate_user_activity.
     """
-    print('I am inside rate_repo_activity')
+    logger.debug("Rating GitHub repo activity")
+    score = scoring.score_repo(metrics)
+    if not scoring.escalate("github_repo", score.ambiguous):
+        return local_rating(score)
     template = (
         "You are a GitHub rating assistant. Given the following metrics for a GitHub repository:\n\n"
         "- Stars: {stars}\n"
@@ -142,9 +312,9 @@ def rate_repo_activity(metrics: dict) -> str:
         "along with a brief explanation."
     )
     prompt_text = template.format(**metrics)
-    llm = ChatOpenAI(temperature=0, model="gpt-3.5-turbo")
-    response = llm(prompt_text)
-    print('I am inside rate_repo_activity',response)
+    llm = get_chat_model("gpt-3.5-turbo")
+    response = llm.invoke(prompt_text).content
+    log_payload(logger, "GitHub repo rating", response)
 
     return response
 
@@ -0,0 +1,166 @@
+"""
+GitHub API rate-limit budget shared by every session in the process.
+
+Each token's remaining requests per resource ("core" for REST, "graphql")
+are read from the X-RateLimit-* headers of every response, and decremented
+locally for requests still in flight. Calls take the token with the most
+budget left (ties go to the least recently used one, so equal tokens are
+used round-robin). Low-priority calls are refused with RateLimitExhausted
+once the best token is down to its reserve, keeping the rest of the budget
+for the data an analysis cannot do without; high-priority calls wait for a
+reset of up to GITHUB_RATE_LIMIT_MAX_WAIT seconds when every token is spent.
+
+GITHUB_TOKENS is a comma-separated pool; GITHUB_TOKEN alone is a pool of one.
+"""
+
+import itertools
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from src.utils import http_client
+from src.utils.metrics import registry
+
+# Load environment variables
+load_dotenv()
+
+HIGH = "high"
+LOW = "low"
+
+# Budget GitHub gives an authenticated token per hour, assumed until headers say otherwise
+DEFAULT_LIMIT = 5000
+# Share of a token's limit that low-priority calls may not spend
+LOW_PRIORITY_RESERVE = float(os.getenv("GITHUB_LOW_PRIORITY_RESERVE", "0.2"))
+MAX_WAIT = float(os.getenv("GITHUB_RATE_LIMIT_MAX_WAIT", "30"))
+
+
+class RateLimitExhausted(Exception):
+    """No token has budget left for the call"""
+
+
+class TokenBudget:
+    """Rate-limit state of one token for one resource"""
+
+    def __init__(self):
+        self.limit = DEFAULT_LIMIT
+        self.remaining = DEFAULT_LIMIT
+        self.reset_at = 0.0
+        self.in_flight = 0
+
+    def available(self, now: float) -> int:
+        if self.reset_at and now >= self.reset_at:
+            return self.limit - self.in_flight
+        return self.remaining - self.in_flight
+
+
+class GitHubToken:
+    def __init__(self, index: int, value: str):
+        self.label = f"token-{index}"  # used in metrics instead of the secret
+        self.value = value
+        self.budgets = {}
+        self.last_used = 0
+
+    def budget(self, resource: str) -> TokenBudget:
+        if resource not in self.budgets:
+            self.budgets[resource] = TokenBudget()
+        return self.budgets[resource]
+
+
+class GitHubTokenPool:
+    def __init__(self, tokens, low_priority_reserve: float = LOW_PRIORITY_RESERVE, max_wait: float = MAX_WAIT):
+        self.tokens = [GitHubToken(i, token) for i, token in enumerate(tokens, 1)]
+        self.low_priority_reserve = low_priority_reserve
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._sequence = itertools.count(1)
+
+    @classmethod
+    def from_env(cls):
+        tokens = os.getenv("GITHUB_TOKENS") or os.getenv("GITHUB_TOKEN") or ""
+        return cls([token.strip() for token in tokens.split(",") if token.strip()])
+
+    def _pick(self, resource: str, priority: str, now: float):
+        best = max(
+            self.tokens,
+            key=lambda token: (token.budget(resource).available(now), -token.last_used),
+        )
+        budget = best.budget(resource)
+        floor = budget.limit * self.low_priority_reserve if priority == LOW else 0
+        return best if budget.available(now) > floor else None
+
+    def acquire(self, resource: str = "core", priority: str = HIGH) -> GitHubToken:
+        """Reserve one request on the best token; pair with release()"""
+        if not self.tokens:
+            raise ValueError("Please set the GITHUB_TOKEN environment variable with your GitHub personal access token.")
+        deadline = time.monotonic() + self.max_wait
+        with self._lock:
+            while True:
+                now = time.time()
+                token = self._pick(resource, priority, now)
+                if token is not None:
+                    budget = token.budget(resource)
+                    if budget.reset_at and now >= budget.reset_at:
+                        budget.remaining, budget.reset_at = budget.limit, 0.0
+                    budget.in_flight += 1
+                    token.last_used = next(self._sequence)
+                    return token
+
+                if priority == LOW:
+                    registry.inc("github_rate_limit_degraded_total", resource=resource)
+                    raise RateLimitExhausted(f"GitHub {resource} budget reserved for high-priority calls")
+                resets = [t.budget(resource).reset_at for t in self.tokens if t.budget(resource).reset_at]
+                wait = min(min(resets, default=now + self.max_wait) - now, deadline - time.monotonic())
+                if wait <= 0:
+                    registry.inc("github_rate_limit_exhausted_total", resource=resource)
+                    raise RateLimitExhausted(f"All GitHub tokens are out of {resource} budget")
+                # Woken early by release() when a response brings news of a reset
+                self._released.wait(min(wait, 1.0))
+
+    def release(self, token: GitHubToken, resource: str, response=None):
+        """Return the reservation and record the budget reported by the response, if any"""
+        with self._lock:
+            budget = token.budget(resource)
+            budget.in_flight -= 1
+            headers = response.headers if response is not None else {}
+            if "X-RateLimit-Remaining" in headers:
+                resource = headers.get("X-RateLimit-Resource", resource)
+                budget = token.budget(resource)
+                budget.remaining = int(headers["X-RateLimit-Remaining"])
+                budget.limit = int(headers.get("X-RateLimit-Limit", budget.limit))
+                budget.reset_at = float(headers.get("X-RateLimit-Reset", 0))
+                registry.set_gauge("github_rate_limit_remaining", budget.remaining, token=token.label, resource=resource)
+            elif response is not None and response.status_code in (403, 429) and "Retry-After" in headers:
+                # Secondary (abuse) limit: rest this token for the requested time,
+                # or for the longest retry backoff if the header cannot be read
+                retry_after = http_client.parse_retry_after(headers["Retry-After"])
+                budget.remaining = 0
+                budget.reset_at = time.time() + (http_client.BACKOFF_MAX if retry_after is None else retry_after)
+            self._released.notify_all()
+
+    @staticmethod
+    def is_rate_limited(response) -> bool:
+        """Whether a response was refused because of a (primary or secondary) rate limit"""
+        if response.status_code not in (403, 429):
+            return False
+        return response.headers.get("X-RateLimit-Remaining") == "0" or "Retry-After" in response.headers
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            return {
+                token.label: {
+                    resource: {
+                        "remaining": budget.available(now),
+                        "limit": budget.limit,
+                        "reset_in": max(0, round(budget.reset_at - now)) if budget.reset_at else None,
+                    }
+                    for resource, budget in token.budgets.items()
+                }
+                for token in self.tokens
+            }
+
+
+# Process-wide pool shared by every session
+token_pool = GitHubTokenPool.from_env()
@@ -0,0 +1,172 @@
+"""
+Shared HTTP layer for every upstream fetcher in src/utils.
+
+  - One pooled requests.Session per host, so repeated calls reuse TLS connections.
+  - Connect/read timeouts on every request (HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT).
+  - Retries on connection errors, 429 and 5xx with jittered exponential backoff,
+    honoring Retry-After when the server sends it.
+  - At most HTTP_MAX_PER_HOST requests in flight per host.
+  - Every call is timed as an "http" span with its status, bytes and retries.
+
+A request can be given a cancel event, which stops it before its next
+attempt or during a backoff wait.
+"""
+
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from src.utils.metrics import registry, add_total, span
+
+# Load environment variables
+load_dotenv()
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+# Longest Retry-After waited out; a server asking for more gets its error returned instead
+RETRY_AFTER_MAX = float(os.getenv("HTTP_RETRY_AFTER_MAX", "120"))
+MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "8"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RequestCancelled(Exception):
+    """A request whose cancel event was set before it finished"""
+
+# host -> (session, semaphore bounding its requests in flight)
+_sessions = {}
+_lock = threading.Lock()
+
+
+def _host(url: str) -> str:
+    return urlparse(url).netloc
+
+
+def _session(host: str):
+    """The pooled session of a host and the semaphore of its requests in flight"""
+    entry = _sessions.get(host)
+    if entry is not None:
+        return entry
+
+    with _lock:
+        entry = _sessions.get(host)
+        if entry is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_PER_HOST)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            entry = _sessions[host] = (session, threading.BoundedSemaphore(MAX_PER_HOST))
+        return entry
+
+
+def parse_retry_after(value) -> float:
+    """Parse a Retry-After header (seconds or HTTP date) into seconds, or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def _should_retry(status_code: int, headers) -> bool:
+    # GitHub signals secondary rate limits with 403 plus Retry-After
+    return status_code in RETRY_STATUSES or (status_code == 403 and "Retry-After" in headers)
+
+
+def _retry_delay(attempt: int, headers=None):
+    """
+    Retry-After if the server sent one, else full-jitter exponential backoff.
+    None when Retry-After is over RETRY_AFTER_MAX: retrying any earlier would
+    only fail again.
+    """
+    if headers is not None:
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        if retry_after is not None:
+            return retry_after if retry_after <= RETRY_AFTER_MAX else None
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _record_response(host: str, attributes: dict, status_code, size: int, attempt: int):
+    attributes.update(status=status_code, bytes=size, retries=attempt)
+    registry.inc("upstream_requests_total", host=host, status=status_code)
+    registry.inc("upstream_response_bytes_total", size, host=host)
+    if attempt:
+        registry.inc("upstream_retries_total", attempt, host=host)
+    add_total("upstream_requests", 1)
+    add_total("upstream_bytes", size)
+
+
+def _backoff(delay: float, cancel: threading.Event = None):
+    if cancel is None:
+        time.sleep(delay)
+    elif cancel.wait(delay):
+        raise RequestCancelled("Request cancelled during backoff")
+
+
+def request(method: str, url: str, *, timeout=None, retries: int = None,
+            cancel: threading.Event = None, **kwargs) -> requests.Response:
+    """
+    Send a request through the pooled session for the URL's host.
+    Returns the final response; retryable statuses are returned once retries run out.
+    Raises RequestCancelled once cancel is set (an attempt already sent still
+    runs to its timeout, but its response is dropped).
+    """
+    host = _host(url)
+    session, semaphore = _session(host)
+    timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    retries = MAX_RETRIES if retries is None else retries
+
+    with span("http", host, method=method) as attributes:
+        attempt = 0
+        while True:
+            if cancel is not None and cancel.is_set():
+                _record_response(host, attributes, "cancelled", 0, attempt)
+                raise RequestCancelled(f"Request to {host} cancelled")
+            try:
+                with semaphore:
+                    response = session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= retries:
+                    _record_response(host, attributes, "error", 0, attempt)
+                    raise
+                _backoff(_retry_delay(attempt), cancel)
+                attempt += 1
+                continue
+
+            if cancel is not None and cancel.is_set():
+                response.close()
+                _record_response(host, attributes, "cancelled", 0, attempt)
+                raise RequestCancelled(f"Request to {host} cancelled")
+            delay = _retry_delay(attempt, response.headers) if attempt < retries else None
+            if delay is not None and _should_retry(response.status_code, response.headers):
+                response.close()
+                _backoff(delay, cancel)
+                attempt += 1
+                continue
+            size = 0 if kwargs.get("stream") else len(response.content)
+            _record_response(host, attributes, response.status_code, size, attempt)
+            return response
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
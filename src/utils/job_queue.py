@@ -0,0 +1,198 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def _dumps(value) -> str:
+    # Node updates may hold LangChain messages; anything not JSON-native is stringified
+    return json.dumps(value, default=str)
+
+
+class JobQueue:
+    """
+    Persistent job queue in a SQLite file, shared by every process that opens
+    the same path (the API server and any number of worker.py processes).
+
+    A claimed job holds a lease that is renewed whenever the worker reports
+    progress. If the worker dies, the lease runs out and the job is handed to
+    another worker, up to max_attempts times. Finished jobs are kept for
+    retention_seconds so clients can still poll the result.
+    """
+
+    def __init__(self, path: str = "jobs.db", retention_seconds: int = 86400,
+                 lease_seconds: int = 300, max_attempts: int = 3):
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, session_id TEXT, payload TEXT NOT NULL, "
+            "status TEXT NOT NULL, progress TEXT NOT NULL DEFAULT '[]', result TEXT, error TEXT, "
+            "attempts INTEGER NOT NULL DEFAULT 0, worker_id TEXT, lease_expires_at REAL, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def submit(self, kind: str, payload: dict, session_id: str = None) -> str:
+        """Queue a job and return its id"""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, session_id, payload, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, session_id, _dumps(payload), QUEUED, time.time()),
+            )
+        return job_id
+
+    def claim(self, worker_id: str) -> dict:
+        """
+        Take the oldest runnable job for worker_id, or return None. Running jobs
+        whose lease has expired count as runnable again.
+        """
+        def claim_next(conn):
+            now = time.time()
+            # Jobs whose worker keeps dying are given up on instead of retried forever
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, worker_id = NULL, lease_expires_at = NULL "
+                "WHERE status = ? AND lease_expires_at < ? AND attempts >= ?",
+                (FAILED, "Worker stopped before the job finished", now, RUNNING, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? OR (status = ? AND lease_expires_at < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (QUEUED, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker_id = ?, lease_expires_at = ?, attempts = attempts + 1, "
+                "started_at = ?, progress = '[]' WHERE id = ?",
+                (RUNNING, worker_id, now + self.lease_seconds, now, row[0]),
+            )
+            return row[0]
+
+        job_id = self._transaction(claim_next)
+        return self.get(job_id) if job_id else None
+
+    def add_progress(self, job_id: str, worker_id: str, step: str, update) -> bool:
+        """
+        Append a partial result and renew the lease. Returns False if the job
+        is no longer held by worker_id (its lease expired and it was reclaimed).
+        """
+        def append(conn):
+            row = conn.execute(
+                "SELECT progress FROM jobs WHERE id = ? AND worker_id = ? AND status = ?",
+                (job_id, worker_id, RUNNING),
+            ).fetchone()
+            if row is None:
+                return False
+            progress = json.loads(row[0])
+            progress.append({"step": step, "update": update, "at": time.time()})
+            conn.execute(
+                "UPDATE jobs SET progress = ?, lease_expires_at = ? WHERE id = ?",
+                (_dumps(progress), time.time() + self.lease_seconds, job_id),
+            )
+            return True
+
+        return self._transaction(append)
+
+    def _finish(self, job_id: str, worker_id: str, status: str, result=None, error: str = None) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_expires_at = NULL "
+                "WHERE id = ? AND worker_id = ? AND status = ?",
+                (status, None if result is None else _dumps(result), error, time.time(), job_id, worker_id, RUNNING),
+            )
+            return cursor.rowcount > 0
+
+    def complete(self, job_id: str, worker_id: str, result) -> bool:
+        return self._finish(job_id, worker_id, SUCCEEDED, result=result)
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        return self._finish(job_id, worker_id, FAILED, error=error)
+
+    def get(self, job_id: str) -> dict:
+        """Return the job as a dict, or None if it does not exist or has been purged"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, session_id, payload, status, progress, result, error, attempts, "
+                "created_at, started_at, finished_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "kind": row[1],
+            "session_id": row[2],
+            "payload": json.loads(row[3]),
+            "status": row[4],
+            "progress": json.loads(row[5]),
+            "result": None if row[6] is None else json.loads(row[6]),
+            "error": row[7],
+            "attempts": row[8],
+            "created_at": row[9],
+            "started_at": row[10],
+            "finished_at": row[11],
+        }
+
+    def purge(self) -> int:
+        """Delete finished jobs older than the retention period"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (SUCCEEDED, FAILED, time.time() - self.retention_seconds),
+            )
+            return cursor.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return {
+            "path": self.path,
+            "retention_seconds": self.retention_seconds,
+            "lease_seconds": self.lease_seconds,
+            "jobs": counts,
+        }
+
+
+def create_job_queue() -> JobQueue:
+    """Build the job queue from JOB_* environment variables"""
+    return JobQueue(
+        path=os.getenv("JOB_QUEUE_PATH", "jobs.db"),
+        retention_seconds=int(os.getenv("JOB_RETENTION_SECONDS", "86400")),
+        lease_seconds=int(os.getenv("JOB_LEASE_SECONDS", "300")),
+        max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+    )
@@ -0,0 +1,233 @@
+import asyncio
+import collections
+import json
+import os
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+from dotenv import load_dotenv
+from src.utils.metrics import registry, add_total, record_span
+
+# Load environment variables
+load_dotenv()
+
+# USD per million (prompt, completion) tokens, used for cost estimates.
+# Override or extend with LLM_PRICES='{"model": [prompt, completion]}'.
+LLM_PRICES = {
+    "gpt-4": (30.0, 60.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-3.5-turbo": (0.5, 1.5),
+}
+LLM_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.getenv("LLM_PRICES", "{}")).items()})
+
+# Requests in flight per model before further calls wait for a slot.
+# Override per model with LLM_CONCURRENCY='{"model": limit}'.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_CONCURRENCY = {model: int(limit) for model, limit in json.loads(os.getenv("LLM_CONCURRENCY", "{}")).items()}
+
+# Chat model clients are stateless between calls, so one instance per
+# (model, temperature) is shared by every session and every thread.
+_clients = {}
+_clients_lock = threading.Lock()
+
+# One limiter per model, shared by its clients at every temperature
+_limiters = {}
+
+# Builds chat models from ChatOpenAI keyword arguments; None means ChatOpenAI
+_model_factory = None
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost of a call, or 0 for models without a known price"""
+    prompt_price, completion_price = LLM_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class ModelLimiter:
+    """
+    Concurrency limit and in-flight count of one model's requests, sync and
+    async alike. Threads wait on a condition; coroutines wait on a future of
+    their own loop, resolved from whichever thread releases a slot.
+    """
+
+    def __init__(self, model: str, limit: int):
+        self.model = model
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._async_waiters = collections.deque()  # (loop, future) of waiting coroutines, oldest first
+        self.in_flight = 0
+        self.waiting = 0
+
+    def _take(self) -> bool:
+        # Called with the lock held
+        if self.in_flight < self.limit:
+            self.in_flight += 1
+            return True
+        return False
+
+    def _wake_async(self):
+        # Called with the lock held: hand the freed slot's wakeup to the oldest coroutine still waiting
+        while self._async_waiters:
+            loop, waiter = self._async_waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(_set_waiter, waiter)
+                return
+            except RuntimeError:  # its loop is closed
+                continue
+
+    def acquire(self):
+        with self._lock:
+            if self._take():
+                return
+            self.waiting += 1
+            try:
+                self._released.wait_for(self._take)
+            finally:
+                self.waiting -= 1
+
+    async def aacquire(self):
+        with self._lock:
+            if self._take():
+                return
+            self.waiting += 1
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                waiter = loop.create_future()
+                with self._lock:
+                    if self._take():
+                        return
+                    self._async_waiters.append((loop, waiter))
+                try:
+                    await waiter
+                except asyncio.CancelledError:
+                    with self._lock:
+                        try:
+                            self._async_waiters.remove((loop, waiter))
+                        except ValueError:
+                            # Already woken for a freed slot: pass the wakeup on
+                            self._wake_async()
+                    raise
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            # Either kind of waiter may take the slot; the other goes back to waiting
+            self._released.notify()
+            self._wake_async()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"limit": self.limit, "in_flight": self.in_flight, "waiting": self.waiting}
+
+
+def _set_waiter(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class LLMUsageHandler(BaseCallbackHandler):
+    """Records latency, token usage and estimated cost of every call to one model"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        with self._lock:
+            self._started[run_id] = time.perf_counter()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        with self._lock:
+            self._started[run_id] = time.perf_counter()
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        if started is not None:
+            record_span("llm", self.model, started, time.perf_counter() - started, error=str(error))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            started = self._started.pop(run_id, None)
+
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        cost = estimate_cost(self.model, prompt_tokens, completion_tokens)
+
+        registry.inc("llm_tokens_total", prompt_tokens, model=self.model, type="prompt")
+        registry.inc("llm_tokens_total", completion_tokens, model=self.model, type="completion")
+        registry.inc("llm_cost_usd_total", cost, model=self.model)
+        add_total("llm_prompt_tokens", prompt_tokens)
+        add_total("llm_completion_tokens", completion_tokens)
+        add_total("llm_cost_usd", cost)
+        if started is not None:
+            record_span(
+                "llm", self.model, started, time.perf_counter() - started,
+                prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, cost_usd=round(cost, 6)
+            )
+
+
+def set_chat_model_factory(factory):
+    """
+    Build chat models with factory(**kwargs) instead of ChatOpenAI, e.g. a fake
+    model for offline benchmarks. None restores ChatOpenAI. Clients created
+    before the call are dropped.
+    """
+    global _model_factory
+    with _clients_lock:
+        _model_factory = factory
+        _clients.clear()
+
+
+def _limiter(model: str) -> ModelLimiter:
+    """The model's limiter; call with _clients_lock held"""
+    if model not in _limiters:
+        _limiters[model] = ModelLimiter(model, LLM_CONCURRENCY.get(model, LLM_MAX_CONCURRENCY))
+    return _limiters[model]
+
+
+def llm_stats() -> dict:
+    """Concurrency limit, requests in flight and callers waiting, per model"""
+    with _clients_lock:
+        limiters = list(_limiters.values())
+    return {limiter.model: limiter.stats() for limiter in limiters}
+
+
+def get_chat_model(model: str, temperature: float = 0):
+    """
+    Returns the process-wide ChatOpenAI client for the given configuration,
+    creating it on first use. Pass temperature=None to keep the model default.
+    ChatOpenAI clients send their requests, invoke() and ainvoke() alike,
+    over one pooled HTTP transport, at most LLM_MAX_CONCURRENCY (or the
+    model's LLM_CONCURRENCY entry) at a time per model.
+    """
+    key = (model, temperature)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            factory = _model_factory
+            kwargs = {"model": model, "callbacks": [LLMUsageHandler(model)]}
+            if factory is None:
+                from langchain_openai import ChatOpenAI as factory
+                from src.utils.llm_http import http_clients
+
+                kwargs.update(http_clients(_limiter(model)))
+
+            if temperature is not None:
+                kwargs["temperature"] = temperature
+            client = factory(**kwargs)
+            _clients[key] = client
+        return client
@@ -0,0 +1,127 @@
+"""
+Pooled HTTP transport for the OpenAI chat model clients.
+
+Every ChatOpenAI client gets its own httpx clients (sync and async), all
+wrapping the same two transports, so connections to the API are kept alive
+and reused across models, sessions and threads. The wrapper holds one slot
+of the model's ModelLimiter for each request, from sending it until its body
+has been read, which is what bounds a model's concurrency.
+
+Kept apart from src.utils.llm so httpx is only imported with langchain_openai.
+"""
+
+import os
+import threading
+
+import httpx
+
+# Keep-alive connections to the OpenAI API, shared by every model
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def _shared_transport(kind: str):
+    with _transports_lock:
+        if kind not in _transports:
+            limits = httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS)
+            # The async pool belongs to the event loop that first uses it (the server's)
+            transport_class = httpx.AsyncHTTPTransport if kind == "async" else httpx.HTTPTransport
+            _transports[kind] = transport_class(limits=limits)
+        return _transports[kind]
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+def _release_once(limiter):
+    released = threading.Event()
+
+    def release():
+        if not released.is_set():
+            released.set()
+            limiter.release()
+    return release
+
+
+class LimitedTransport(httpx.BaseTransport):
+    def __init__(self, transport: httpx.BaseTransport, limiter):
+        self._transport = transport
+        self._limiter = limiter
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self._limiter.acquire()
+        release = _release_once(self._limiter)
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            release()
+            raise
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, release),
+            extensions=response.extensions,
+        )
+
+
+class AsyncLimitedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiter):
+        self._transport = transport
+        self._limiter = limiter
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self._limiter.aacquire()
+        release = _release_once(self._limiter)
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_AsyncReleasingStream(response.stream, release),
+            extensions=response.extensions,
+        )
+
+
+def http_clients(limiter) -> dict:
+    """http_client and http_async_client arguments of a ChatOpenAI client for one model"""
+    # The OpenAI SDK's default, with a short connect timeout
+    timeout = httpx.Timeout(600.0, connect=5.0)
+    return {
+        "http_client": httpx.Client(transport=LimitedTransport(_shared_transport("sync"), limiter), timeout=timeout),
+        "http_async_client": httpx.AsyncClient(
+            transport=AsyncLimitedTransport(_shared_transport("async"), limiter), timeout=timeout
+        ),
+    }
@@ -0,0 +1,198 @@
+"""
+Structured logging for the server, workers and fetchers.
+
+  - Records are written to stdout. Long-running processes (the server's
+    lifespan, worker.py) call start_logging() so request threads only
+    enqueue them and a background QueueListener formats and writes them,
+    and stop_logging() on shutdown; until then the logging thread writes.
+  - Every record carries the correlation id of the request that produced it
+    (the session id or job id), taken from a contextvar that follows the
+    request into worker and branch threads.
+  - LOG_FORMAT=json (default) emits one JSON object per line, LOG_FORMAT=text
+    a readable line for local development. LOG_LEVEL sets the level.
+  - log_payload() logs large payloads at DEBUG for only a sample of calls.
+
+Use %-style arguments (logger.info("fetched %s", url)) so messages are only
+formatted when the level is enabled.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Share of log_payload() calls that actually log, and how much of the payload
+PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))
+
+ROOT_LOGGER = "cryptosentinel"
+
+_correlation_id = contextvars.ContextVar("correlation_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed in extra= and is logged as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "correlation_id"}
+
+_configure_lock = threading.Lock()
+# Handler writing to stdout from the logging thread, used until start_logging()
+_direct_handler = None
+# Queue handler and listener thread, while started
+_queue_handler = None
+_listener = None
+
+
+def set_correlation_id(value: str):
+    """Tag all log records of the current request (and threads it starts) with value"""
+    return _correlation_id.set(value)
+
+
+def get_correlation_id() -> str:
+    return _correlation_id.get()
+
+
+class CorrelationFilter(logging.Filter):
+    # Runs in the thread that logs the record (before it is queued, if it is),
+    # so it sees the request's contextvars
+    def filter(self, record):
+        record.correlation_id = _correlation_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.correlation_id:
+            entry["correlation_id"] = record.correlation_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = f"{time.strftime('%H:%M:%S', time.localtime(record.created))} {record.levelname:<7} {record.name}"
+        if record.correlation_id:
+            line += f" [{record.correlation_id}]"
+        line += f" {record.getMessage()}"
+        fields = {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRIBUTES}
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class _RenderedExceptionFilter(logging.Filter):
+    # Renders the traceback into exc_text, which is all the formatters read
+    def filter(self, record):
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # The exception object may not survive the hop to the listener thread;
+        # its traceback was rendered by the filter, message formatting is left to the listener
+        record.exc_info = None
+        return record
+
+
+def _stdout_handler() -> logging.Handler:
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+    return output
+
+
+def configure_logging():
+    """Write the package's records to stdout from the logging thread; safe to call repeatedly"""
+    global _direct_handler
+    with _configure_lock:
+        if _direct_handler is not None:
+            return
+        _direct_handler = _stdout_handler()
+        _direct_handler.addFilter(CorrelationFilter())
+        _direct_handler.addFilter(_RenderedExceptionFilter())
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(_direct_handler)
+        root.propagate = False
+
+
+def start_logging():
+    """Hand records to a QueueListener thread from now on; safe to call repeatedly"""
+    global _queue_handler, _listener
+    configure_logging()
+    with _configure_lock:
+        if _listener is not None:
+            return
+        log_queue = queue.SimpleQueue()
+        _queue_handler = _QueueHandler(log_queue)
+        _queue_handler.addFilter(CorrelationFilter())
+        _queue_handler.addFilter(_RenderedExceptionFilter())
+        _listener = logging.handlers.QueueListener(log_queue, _stdout_handler())
+        _listener.start()
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.addHandler(_queue_handler)
+        root.removeHandler(_direct_handler)
+
+
+def stop_logging():
+    """Write out the queued records, stop the listener thread and write directly again"""
+    global _queue_handler, _listener
+    with _configure_lock:
+        if _listener is None:
+            return
+        root = logging.getLogger(ROOT_LOGGER)
+        root.addHandler(_direct_handler)
+        root.removeHandler(_queue_handler)
+        _listener.stop()
+        _queue_handler = _listener = None
+
+
+# Records still queued at exit are written out
+atexit.register(stop_logging)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for a module, e.g. get_logger(__name__)"""
+    configure_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def log_payload(logger: logging.Logger, message: str, payload, sample_rate: float = None):
+    """
+    Log a (possibly large) payload at DEBUG for a sample of calls, truncated
+    to PAYLOAD_MAX_CHARS. Nothing is serialized unless the call is sampled.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if random.random() >= (PAYLOAD_SAMPLE_RATE if sample_rate is None else sample_rate):
+        return
+    text = json.dumps(payload, default=str)
+    if len(text) > PAYLOAD_MAX_CHARS:
+        text = text[:PAYLOAD_MAX_CHARS] + f"... ({len(text)} chars)"
+    logger.debug("%s: %s", message, text)
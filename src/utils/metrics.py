@@ -0,0 +1,224 @@
+"""
+Process-wide metrics and per-request traces.
+
+  - registry collects counters, gauges and histograms and renders them in the
+    Prometheus text format for /api/metrics.
+  - A Trace collects the spans (graph nodes, upstream HTTP calls, LLM calls)
+    of one request. It is carried in a contextvar, so code on threads started
+    with contextvars.copy_context() reports into the same trace.
+"""
+
+import contextvars
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Upper bounds in seconds; the usual Prometheus latency buckets stretched for LLM calls
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Histogram observed for each span kind, and the label its name goes under
+SPAN_METRICS = {
+    "node": ("research_node_duration_seconds", "node"),
+    "http": ("upstream_request_duration_seconds", "host"),
+    "llm": ("llm_request_duration_seconds", "model"),
+}
+
+HELP = {
+    "research_node_duration_seconds": "Wall time of research/trading graph nodes",
+    "research_node_errors_total": "Graph nodes that raised",
+    "research_branch_timeouts_total": "Research branches that timed out, waiting for a thread (queue) or running (run)",
+    "upstream_request_duration_seconds": "Wall time of upstream HTTP requests, including retries",
+    "upstream_requests_total": "Upstream HTTP requests by final status",
+    "upstream_response_bytes_total": "Bytes received from upstream APIs",
+    "upstream_retries_total": "Upstream HTTP attempts that were retried",
+    "cache_requests_total": "Response cache lookups by result",
+    "github_rate_limit_remaining": "Requests left in the current GitHub rate-limit window, per token and resource",
+    "github_rate_limit_degraded_total": "Low-priority GitHub calls skipped to keep budget in reserve",
+    "github_rate_limit_exhausted_total": "GitHub calls refused because every token was out of budget",
+    "contract_source_requests_total": "Contract source fetches by provider and outcome",
+    "contract_source_hedge_wins_total": "Contract sources returned by a hedged (non-primary) provider",
+    "singleflight_coalesced_total": "Calls that waited for an identical call already in flight",
+    "scoring_decisions_total": "Ratings computed locally or sent to the LLM, by kind",
+    "llm_request_duration_seconds": "Wall time of LLM calls",
+    "llm_tokens_total": "LLM tokens used",
+    "llm_cost_usd_total": "Estimated LLM spend in USD",
+    "llm_in_flight": "OpenAI requests in flight, per model",
+    "llm_waiting": "LLM calls waiting for a concurrency slot, per model",
+}
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe store of labelled counters, gauges and histograms"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}    # name -> {label key: value}
+        self._gauges = {}
+        self._histograms = {}  # name -> {label key: [bucket counts..., sum, count]}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, series in sorted(metrics.items()):
+                    if name in HELP:
+                        lines.append(f"# HELP {name} {HELP[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in sorted(series.items()):
+                        lines.append(f"{name}{_format_labels(key)} {value:g}")
+
+            for name, series in sorted(self._histograms.items()):
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, state in sorted(series.items()):
+                    # Counts are already cumulative: observe() bumps every bucket a value fits in
+                    for bound, count in zip(self.buckets, state):
+                        lines.append(f"{name}_bucket{_format_labels(key, (('le', f'{bound:g}'),))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {state[-1]}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {state[-2]:g}")
+                    lines.append(f"{name}_count{_format_labels(key)} {state[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry exported on /api/metrics
+registry = MetricsRegistry()
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """
+    Spans and running totals (tokens, cost, bytes, cache hits) for one request.
+    Use run()/stream() to execute the request with this trace as the current one.
+    """
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.started = time.perf_counter()
+        self.finished = None
+        self.spans = []
+        self.totals = {}
+        self._lock = threading.Lock()
+
+    def run(self, fn, *args, **kwargs):
+        token = _current_trace.set(self)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_trace.reset(token)
+            self.finished = time.perf_counter()
+
+    def stream(self, fn, *args, **kwargs):
+        """Like run() for a generator function; items are passed through"""
+        _current_trace.set(self)
+        try:
+            yield from fn(*args, **kwargs)
+        finally:
+            self.finished = time.perf_counter()
+
+    def add_span(self, span: dict):
+        with self._lock:
+            self.spans.append(span)
+
+    def add_total(self, name: str, value: float):
+        with self._lock:
+            self.totals[name] = self.totals.get(name, 0) + value
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            end = self.finished or time.perf_counter()
+            return {
+                "trace_id": self.trace_id,
+                "duration_ms": round((end - self.started) * 1000, 1),
+                "totals": dict(self.totals),
+                "spans": sorted(self.spans, key=lambda span: span["start_ms"]),
+            }
+
+
+def current_trace() -> Trace:
+    return _current_trace.get()
+
+
+def add_total(name: str, value: float):
+    """Add to a running total of the current trace, if there is one"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_total(name, value)
+
+
+def record_span(kind: str, name: str, started: float, duration: float, **attributes):
+    """
+    Record a finished span: observe its duration metric and attach it to the
+    current trace. started is a time.perf_counter() value.
+    """
+    metric = SPAN_METRICS.get(kind)
+    if metric is not None:
+        registry.observe(metric[0], duration, **{metric[1]: name})
+
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span({
+            "kind": kind,
+            "name": name,
+            "start_ms": round((started - trace.started) * 1000, 1),
+            "duration_ms": round(duration * 1000, 1),
+            **attributes,
+        })
+
+
+@contextmanager
+def span(kind: str, name: str, **attributes):
+    """
+    Time the enclosed block as a span. The yielded dict can be filled with
+    more attributes (status, bytes, ...) before the block ends.
+    """
+    started = time.perf_counter()
+    try:
+        yield attributes
+    except Exception as e:
+        attributes.setdefault("error", str(e))
+        raise
+    finally:
+        record_span(kind, name, started, time.perf_counter() - started, **attributes)
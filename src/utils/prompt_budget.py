@@ -0,0 +1,184 @@
+"""
+Prompt assembly under per-section token budgets.
+
+Each section of a prompt is rendered compactly (JSON without empty fields
+for data, the text itself for prose), counted, and shrunk deterministically
+when it is over its budget:
+
+  - data: the largest list or string inside is halved, repeatedly, so short
+    fields survive and long tails (tickers, rating texts) go first
+  - text: lines are kept by priority (headings, then findings that mention
+    a severity, then the rest) in their original order, the condensed
+    version marked as such
+
+Anything still over budget is cut at the token limit. The same input always
+gives the same prompt, so the prompt size, and with it LLM latency and cost,
+is bounded by the budgets.
+
+Tokens are counted with tiktoken when it is available (it comes with
+langchain-openai), otherwise estimated at 4 characters per token.
+"""
+
+import dataclasses
+import json
+import re
+import threading
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+# Lines of prose kept first when condensing: headings and numbered/bold items,
+# then anything that names a severity or a finding
+HEADING_LINE = re.compile(r"^\s*(#+\s|\d+[.)]\s|\*\*|[A-Z][A-Za-z /&-]{2,40}:\s*$)")
+FINDING_LINE = re.compile(r"critical|high|medium|severity|vulnerab|reentran|overflow|owner|admin|risk", re.IGNORECASE)
+
+TRUNCATION_MARK = " …[truncated]"
+
+
+def _encoding(model: str):
+    """tiktoken encoding for the model, or None to fall back to estimates"""
+    with _encodings_lock:
+        if model in _encodings:
+            return _encodings[model]
+
+    # Loading may download the encoding file, so it happens outside the lock;
+    # threads racing on a new model load it more than once, harmlessly
+    try:
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Not installed, or the encoding file cannot be downloaded
+        encoding = None
+    with _encodings_lock:
+        return _encodings.setdefault(model, encoding)
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, budget: int, model: str = "gpt-4o") -> str:
+    """The longest prefix of text that fits in budget tokens, marked as truncated"""
+    if count_tokens(text, model) <= budget:
+        return text
+    budget = max(0, budget - count_tokens(TRUNCATION_MARK, model))
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[:budget * 4] + TRUNCATION_MARK
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:budget]) + TRUNCATION_MARK
+
+
+def _plain(value):
+    """JSON-ready copy of value without None or empty fields"""
+    if hasattr(value, "to_dict"):
+        value = value.to_dict()
+    elif dataclasses.is_dataclass(value) and not isinstance(value, type):
+        value = dataclasses.asdict(value)
+    if isinstance(value, dict):
+        items = ((str(k), _plain(v)) for k, v in value.items())
+        return {k: v for k, v in items if v not in (None, "", [], {})}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, float):
+        return float(f"{value:.6g}")
+    if isinstance(value, (str, int, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def _dumps(data) -> str:
+    return data if isinstance(data, str) else json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def _largest_leaf(data, parent=None, key=None):
+    """(parent, key, size) of the largest list or string in data"""
+    best = (parent, key, len(_dumps(data))) if isinstance(data, (list, str)) and parent is not None else (None, None, 0)
+    children = data.items() if isinstance(data, dict) else enumerate(data) if isinstance(data, list) else ()
+    for child_key, child in children:
+        candidate = _largest_leaf(child, data, child_key)
+        if candidate[2] > best[2]:
+            best = candidate
+    return best
+
+
+def compact_data(value, budget: int, model: str = "gpt-4o") -> str:
+    """Compact JSON of value, its largest lists and strings halved until it fits"""
+    data = _plain(value)
+    if isinstance(data, str):
+        return condense_text(data, budget, model)
+    text = _dumps(data)
+    while count_tokens(text, model) > budget:
+        parent, key, size = _largest_leaf(data)
+        if parent is None or size <= 40:
+            break
+        leaf = parent[key]
+        if isinstance(leaf, list):
+            kept = len(leaf) // 2
+            # A marker only pays off when it replaces more than one item
+            parent[key] = leaf[:kept] + [f"+{len(leaf) - kept} more"] if len(leaf) - kept > 1 else leaf[:kept]
+        else:
+            parent[key] = leaf[:len(leaf) // 2].rstrip() + "…"
+        shrunk = _dumps(data)
+        if len(shrunk) >= len(text):
+            # Halving no longer helps; leave the rest to truncation
+            break
+        text = shrunk
+    return truncate_tokens(text, budget, model)
+
+
+def condense_text(text: str, budget: int, model: str = "gpt-4o") -> str:
+    """text, or its most important lines in original order when it is over budget"""
+    original = count_tokens(text, model)
+    if original <= budget:
+        return text
+
+    note = f"[condensed from ~{original} tokens]"
+    available = budget - count_tokens(note, model) - 1
+    lines = [line for line in text.splitlines() if line.strip()]
+
+    def priority(index):
+        line = lines[index]
+        return (0 if HEADING_LINE.search(line) else 1 if FINDING_LINE.search(line) else 2, index)
+
+    kept, used = set(), 0
+    for index in sorted(range(len(lines)), key=priority):
+        cost = count_tokens(lines[index], model) + 1
+        if used + cost <= available:
+            kept.add(index)
+            used += cost
+    condensed = "\n".join(lines[i] for i in sorted(kept))
+    return truncate_tokens(f"{condensed}\n{note}" if condensed else note, budget, model)
+
+
+def render_section(value, budget: int = None, model: str = "gpt-4o") -> str:
+    """A prompt section for value: prose stays prose, anything else becomes compact JSON"""
+    if budget is None:
+        return value if isinstance(value, str) else _dumps(_plain(value))
+    if isinstance(value, str):
+        return condense_text(value, budget, model)
+    return compact_data(value, budget, model)
+
+
+def build_prompt(template: str, sections: dict, budgets: dict, model: str = "gpt-4o"):
+    """
+    Fill template's {name} fields with the rendered sections, each within
+    budgets[name] tokens (no limit when absent). Returns (prompt, usage), where
+    usage has per-section original and final token counts and the prompt total.
+    """
+    rendered, usage = {}, {}
+    for name, value in sections.items():
+        full = render_section(value, model=model)
+        original = count_tokens(full, model)
+        budget = budgets.get(name)
+        text = full if budget is None or original <= budget else render_section(value, budget, model)
+        rendered[name] = text
+        usage[name] = {"tokens": count_tokens(text, model), "original_tokens": original, "budget": budget}
+    prompt = template.format(**rendered)
+    return prompt, {"sections": usage, "prompt_tokens": count_tokens(prompt, model)}
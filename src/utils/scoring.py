@@ -0,0 +1,324 @@
+"""
+Deterministic scoring of the analysis metrics.
+
+Each signal (stars, forks, market cap, ...) is placed on a percentile of a
+reference distribution, interpolated on a log scale, and the percentiles are
+combined with fixed weights into a 0-10 rating. The same data always gives
+the same rating, with no model call and no latency.
+
+SCORING_MODE decides what the LLM is still used for:
+
+  - local: nothing; ratings, comments and the recommendation are computed here
+  - hybrid (default): ratings are computed here and a small model
+    (SCORING_NARRATIVE_MODEL) only writes the comments and recommendation.
+    Sections whose signals disagree (percentiles more than
+    SCORING_AMBIGUITY_SPREAD apart), or an overall score on the edge of a
+    recommendation, escalate to the full GPT assessment
+  - llm: every rating comes from the model, as before
+
+The reference points are rough quantiles of what this tool sees (public
+repositories and tokens of crypto projects); SCORING_REFERENCE, a JSON object
+of {"signal": [[value, percentile], ...]}, replaces them per signal.
+"""
+
+import json
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+from src.utils.metrics import registry
+
+# Load environment variables
+load_dotenv()
+
+LOCAL = "local"
+HYBRID = "hybrid"
+LLM = "llm"
+
+SCORING_MODE = os.getenv("SCORING_MODE", HYBRID).lower()
+NARRATIVE_MODEL = os.getenv("SCORING_NARRATIVE_MODEL", "gpt-4o-mini")
+# Percentile points between a section's strongest and weakest signal beyond which it is ambiguous
+AMBIGUITY_SPREAD = float(os.getenv("SCORING_AMBIGUITY_SPREAD", "60"))
+# Distance of the overall score from a recommendation threshold within which it is ambiguous
+AMBIGUITY_MARGIN = float(os.getenv("SCORING_AMBIGUITY_MARGIN", "0.25"))
+
+# (value, percentile) points per signal, increasing in both
+REFERENCE = {
+    "stars": ((0, 0), (5, 15), (50, 40), (300, 60), (1500, 80), (8000, 95), (40000, 100)),
+    "forks": ((0, 0), (2, 15), (20, 40), (100, 60), (500, 80), (3000, 95), (15000, 100)),
+    "watchers": ((0, 0), (5, 15), (50, 40), (300, 60), (1500, 80), (8000, 95), (40000, 100)),
+    "open_issues": ((0, 5), (3, 25), (15, 50), (60, 75), (250, 90), (1500, 100)),
+    "followers": ((0, 0), (10, 20), (100, 45), (1000, 70), (10000, 90), (100000, 100)),
+    "total_stars": ((0, 0), (20, 15), (300, 40), (3000, 65), (20000, 85), (100000, 97), (500000, 100)),
+    "total_forks": ((0, 0), (10, 15), (150, 40), (1000, 65), (8000, 85), (40000, 97), (200000, 100)),
+    "public_repos": ((0, 0), (5, 20), (20, 45), (80, 70), (300, 90), (1500, 100)),
+    "market_cap_usd": ((0, 0), (1e5, 10), (1e6, 25), (1e7, 45), (1e8, 65), (1e9, 85), (1e10, 97), (1e12, 100)),
+    "total_volume_usd": ((0, 0), (1e4, 10), (1e5, 25), (1e6, 45), (1e7, 65), (1e8, 85), (1e9, 97), (1e11, 100)),
+    # 24h volume over market cap, in percent: thin markets score low, churn above ~50% stops helping
+    "turnover": ((0, 0), (0.5, 20), (2, 45), (8, 70), (25, 90), (100, 100)),
+    "price_change_percentage_7d": ((-60, 0), (-25, 15), (-5, 40), (0, 50), (10, 70), (40, 90), (150, 100)),
+    "price_change_percentage_24h": ((-30, 0), (-10, 20), (-2, 42), (0, 50), (3, 62), (15, 85), (60, 100)),
+    "sentiment_votes_up_percentage": ((0, 0), (40, 20), (60, 45), (75, 65), (90, 85), (100, 100)),
+    "watchlist_portfolio_users": ((0, 0), (100, 20), (1000, 40), (10000, 65), (100000, 85), (1000000, 100)),
+}
+REFERENCE.update({
+    name: tuple(tuple(point) for point in points)
+    for name, points in json.loads(os.getenv("SCORING_REFERENCE", "{}")).items()
+})
+
+WEIGHTS = {
+    "repo": {"stars": 0.4, "forks": 0.3, "watchers": 0.15, "open_issues": 0.15},
+    "user": {"followers": 0.35, "total_stars": 0.35, "total_forks": 0.2, "public_repos": 0.1},
+    "token": {"market_cap_usd": 0.35, "total_volume_usd": 0.25, "turnover": 0.15, "price_change_percentage_7d": 0.25},
+    "social": {"sentiment_votes_up_percentage": 0.5, "watchlist_portfolio_users": 0.3, "price_change_percentage_24h": 0.2},
+}
+
+LABELS = {
+    "stars": "stars", "forks": "forks", "watchers": "watchers", "open_issues": "open issues",
+    "followers": "followers", "total_stars": "owner stars", "total_forks": "owner forks",
+    "public_repos": "public repos", "market_cap_usd": "market cap", "total_volume_usd": "24h volume",
+    "turnover": "volume/market cap %", "price_change_percentage_7d": "7d price change %",
+    "price_change_percentage_24h": "24h price change %", "sentiment_votes_up_percentage": "positive votes %",
+    "watchlist_portfolio_users": "watchlists",
+}
+
+# Weight of each section in the overall score
+SECTION_WEIGHTS = {"code_activity": 0.25, "smart_contract_risk": 0.3, "token_performance": 0.3, "social_sentiment": 0.15}
+
+# Overall 0-10 score thresholds, highest first
+RECOMMENDATIONS = (
+    (7.0, "Buy: strong fundamentals across the available data."),
+    (5.0, "Hold or accumulate cautiously: solid in places, with weaknesses to watch."),
+    (3.0, "Speculative: only a small position, if any."),
+    (0.0, "Avoid: the data does not support an investment."),
+)
+
+# Severity tags the audit prompts ask for on every finding ("SEVERITY: HIGH"),
+# and the rating points each finding costs; "SEVERITY: NONE" marks a clean audit
+SEVERITY_PENALTIES = {"critical": 3.0, "high": 1.5, "medium": 0.5}
+# Highest contract rating with any critical finding; the recommendation is then Avoid whatever the overall score
+CRITICAL_RATING_CAP = 2.0
+SEVERITY_TAG = re.compile(r"^[\W_]*SEVERITY:\s*\**\s*(CRITICAL|HIGH|MEDIUM|LOW|INFO|NONE)\b", re.IGNORECASE | re.MULTILINE)
+
+NOT_ENOUGH_DATA = "Not enough data"
+
+
+@dataclass
+class Score:
+    rating: float  # 0-10 scale
+    comment: str
+    signals: Dict[str, float] = field(default_factory=dict)  # percentile per signal
+    ambiguous: bool = False
+    error: Optional[str] = None
+
+    def metrics(self) -> dict:
+        """The score as an AnalysisMetrics dict"""
+        return {"rating": self.rating, "comment": self.comment, "error": self.error}
+
+
+def _symlog(value: float) -> float:
+    return math.copysign(math.log1p(abs(value)), value)
+
+
+def percentile(signal: str, value: float) -> float:
+    """Percentile (0-100) of value in the reference distribution of signal"""
+    points = REFERENCE[signal]
+    if value <= points[0][0]:
+        return float(points[0][1])
+    for (x0, p0), (x1, p1) in zip(points, points[1:]):
+        if value <= x1:
+            position = (_symlog(value) - _symlog(x0)) / (_symlog(x1) - _symlog(x0))
+            return p0 + position * (p1 - p0)
+    return float(points[-1][1])
+
+
+def _ordinal(n: int) -> str:
+    suffix = "th" if 10 <= n % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
+
+
+def _format(value: float) -> str:
+    if abs(value) >= 1e9:
+        return f"{value / 1e9:.1f}B"
+    if abs(value) >= 1e6:
+        return f"{value / 1e6:.1f}M"
+    if abs(value) >= 1e4:
+        return f"{value / 1e3:.0f}K"
+    return f"{value:,.0f}" if float(value).is_integer() or abs(value) >= 100 else f"{value:.1f}"
+
+
+def _weighted(kind: str, values: dict, subject: str) -> Score:
+    """Score of the signals of one kind present in values"""
+    weights = WEIGHTS[kind]
+    present = {name: float(values[name]) for name in weights if isinstance(values.get(name), (int, float))}
+    if not present:
+        return Score(0.0, "", error=NOT_ENOUGH_DATA)
+
+    signals = {name: percentile(name, value) for name, value in present.items()}
+    coverage = sum(weights[name] for name in signals)
+    rating = sum(weights[name] * p for name, p in signals.items()) / coverage / 10
+    spread = max(signals.values()) - min(signals.values())
+
+    ranked = sorted(signals, key=lambda name: (-signals[name], name))
+    parts = [f"{LABELS[ranked[0]]} {_format(present[ranked[0]])} ({_ordinal(round(signals[ranked[0]]))} percentile)"]
+    if len(ranked) > 1:
+        parts.append(f"weakest is {LABELS[ranked[-1]]} {_format(present[ranked[-1]])} "
+                     f"({_ordinal(round(signals[ranked[-1]]))})")
+    comment = f"{subject} rated {rating:.1f}/10 from {len(signals)} signals: strongest is " + "; ".join(parts) + "."
+    if coverage < 0.5:
+        comment += " Partial data."
+
+    return Score(
+        rating=round(rating, 1),
+        comment=comment,
+        signals={name: round(p, 1) for name, p in signals.items()},
+        ambiguous=spread > AMBIGUITY_SPREAD or coverage < 0.5,
+    )
+
+
+def score_repo(metrics: dict) -> Score:
+    """Popularity and activity of a repository from fetch_repo_data metrics"""
+    score = _weighted("repo", metrics, "Repository")
+    if score.error is None:
+        # A repository that exists is at least a 1, as on the LLM's 1-10 scale
+        score.rating = max(1.0, score.rating)
+    return score
+
+
+def score_user(metrics: dict) -> Score:
+    """GitHub presence of an owner from fetch_user_data metrics"""
+    score = _weighted("user", metrics, "Developer")
+    if score.error is None:
+        score.rating = max(1.0, score.rating)
+    return score
+
+
+def score_code_activity(github_data: dict) -> Score:
+    """Repository (70%) and developer (30%) scores of an analyze_github_repo result"""
+    if not isinstance(github_data, dict) or "error" in github_data or not github_data.get("repository"):
+        return Score(0.0, "", error=NOT_ENOUGH_DATA)
+    repo = score_repo(github_data["repository"])
+    developer = github_data.get("developer") or {}
+    if "unavailable" in developer:
+        return repo
+    user = score_user(developer)
+    if user.error is not None:
+        return repo
+    return Score(
+        rating=round(0.7 * repo.rating + 0.3 * user.rating, 1),
+        comment=f"{repo.comment} {user.comment}",
+        signals={**repo.signals, **user.signals},
+        ambiguous=repo.ambiguous or user.ambiguous or abs(repo.rating - user.rating) * 10 > AMBIGUITY_SPREAD,
+    )
+
+
+def score_contract(analysis) -> Score:
+    """
+    Safety (10 = no findings) of a contract from the SEVERITY tags of its
+    audit report. A report without tags is ambiguous: it has to be read.
+    Any critical finding caps the rating at CRITICAL_RATING_CAP.
+    """
+    if not isinstance(analysis, str) or not analysis.strip() or analysis.strip() == NOT_ENOUGH_DATA:
+        return Score(0.0, "", error=NOT_ENOUGH_DATA)
+
+    tags = [tag.lower() for tag in SEVERITY_TAG.findall(analysis)]
+    if not tags:
+        return Score(5.0, "Audit gives no severity tags.", ambiguous=True)
+
+    counts = {severity: tags.count(severity) for severity in ("critical", "high", "medium", "low", "info")}
+    if not any(counts.values()):
+        return Score(10.0, "Audit reports no findings.", signals={f"{severity}_findings": 0.0 for severity in counts})
+
+    penalty = sum(counts[severity] * points for severity, points in SEVERITY_PENALTIES.items())
+    rating = max(0.0, 10.0 - penalty)
+    if counts["critical"]:
+        rating = min(rating, CRITICAL_RATING_CAP)
+    found = ", ".join(f"{count} {severity}" for severity, count in counts.items() if count)
+    return Score(
+        rating=round(rating, 1),
+        comment=f"Audit findings by severity: {found}.",
+        signals={f"{severity}_findings": float(count) for severity, count in counts.items()},
+    )
+
+
+def _token_values(token_metrics) -> dict:
+    """Signal values of a TokenSnapshot or token details dict"""
+    if token_metrics is None or not hasattr(token_metrics, "get") or token_metrics.get("error"):
+        return {}
+    values = {name: token_metrics.get(name) for name in LABELS}
+    market_cap, volume = values.get("market_cap_usd"), values.get("total_volume_usd")
+    if market_cap and volume is not None:
+        values["turnover"] = volume / market_cap * 100
+    return values
+
+
+def score_token(token_metrics) -> Score:
+    return _weighted("token", _token_values(token_metrics), "Token")
+
+
+def score_social(token_metrics) -> Score:
+    return _weighted("social", _token_values(token_metrics), "Community")
+
+
+def recommendation(overall: float) -> str:
+    return next(text for threshold, text in RECOMMENDATIONS if overall >= threshold)
+
+
+def score_investment(github_data, contract_analysis, token_metrics) -> dict:
+    """
+    Local InvestmentAnalysis-shaped result for the collected data, plus a
+    "scoring" entry listing the ambiguous sections.
+    """
+    sections = {
+        "code_activity": score_code_activity(github_data),
+        "smart_contract_risk": score_contract(contract_analysis),
+        "token_performance": score_token(token_metrics),
+        "social_sentiment": score_social(token_metrics),
+    }
+    rated = {name: score for name, score in sections.items() if score.error is None}
+    weight = sum(SECTION_WEIGHTS[name] for name in rated)
+    overall = sum(SECTION_WEIGHTS[name] * score.rating for name, score in rated.items()) / weight if weight else 0.0
+    overall = round(overall, 1)
+
+    ambiguous = [name for name, score in rated.items() if score.ambiguous]
+    if weight and any(abs(overall - threshold) < AMBIGUITY_MARGIN for threshold, _ in RECOMMENDATIONS if threshold):
+        ambiguous.append("overall")
+
+    # Reward from activity and market; risk from the contract (unknown counts as middling)
+    reward = sum(sections[name].rating for name in ("code_activity", "token_performance", "social_sentiment")) / 30
+    safety = sections["smart_contract_risk"].rating / 10 if "smart_contract_risk" in rated else 0.5
+    risk_reward = 5 * reward * (0.5 + 0.5 * safety)
+    confidence = max(0.0, 100 * weight - 10 * len(ambiguous))
+
+    if not rated:
+        final = f"{NOT_ENOUGH_DATA} for a recommendation."
+    else:
+        strongest = max(rated, key=lambda name: rated[name].rating)
+        weakest = min(rated, key=lambda name: rated[name].rating)
+        critical = int(sections["smart_contract_risk"].signals.get("critical_findings", 0))
+        verdict = (f"Avoid: the contract audit reports {critical} critical finding{'s' if critical > 1 else ''}."
+                   if critical else recommendation(overall))
+        final = (f"{verdict} Overall {overall:.1f}/10; strongest: "
+                 f"{strongest.replace('_', ' ')} ({rated[strongest].rating:.1f}), weakest: "
+                 f"{weakest.replace('_', ' ')} ({rated[weakest].rating:.1f}).")
+        missing = [name.replace("_", " ") for name in sections if name not in rated]
+        if missing:
+            final += f" No data for {', '.join(missing)}."
+
+    return {
+        **{name: score.metrics() for name, score in sections.items()},
+        "risk_reward_ratio": round(risk_reward, 1),
+        "confidence_score": round(confidence),
+        "final_recommendation": final,
+        "scoring": {"overall": overall, "ambiguous": ambiguous},
+    }
+
+
+def escalate(kind: str, ambiguous) -> bool:
+    """Whether a rating of this kind goes to the LLM under SCORING_MODE; counted either way"""
+    use_llm = SCORING_MODE == LLM or (SCORING_MODE == HYBRID and bool(ambiguous))
+    registry.inc("scoring_decisions_total", kind=kind, path="llm" if use_llm else "local")
+    return use_llm
@@ -0,0 +1,286 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+class SessionStore(ABC):
+    """
+    Base class for session backends. Sessions are stored as pickled AgentState
+    blobs so the stored size is the memory a session costs, and so backends
+    shared between uvicorn workers never hold live objects.
+
+    Subclasses implement _get, _set, _delete and stats. Sessions idle for
+    longer than ttl_seconds expire; once max_sessions is reached the least
+    recently used session is evicted.
+    """
+
+    backend = "base"
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: int = 3600):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+
+    def load(self, session_id: str):
+        """Return the stored AgentState for session_id, or None"""
+        blob = self._get(session_id)
+        if blob is None:
+            return None
+        return pickle.loads(blob)
+
+    def save(self, session_id: str, state) -> int:
+        """Store state for session_id and return its size in bytes"""
+        blob = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        self._set(session_id, blob)
+        return len(blob)
+
+    def delete(self, session_id: str):
+        self._delete(session_id)
+
+    @abstractmethod
+    def _get(self, session_id: str):
+        """The blob stored for session_id, or None if it is missing or expired"""
+
+    @abstractmethod
+    def _set(self, session_id: str, blob: bytes):
+        """Store blob, then drop expired sessions and the least recently used beyond max_sessions"""
+
+    @abstractmethod
+    def _delete(self, session_id: str):
+        """Remove session_id if it is stored"""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Backend, number and total bytes of the live sessions, and the limits"""
+
+
+class InMemorySessionStore(SessionStore):
+    """Per-process LRU store; sessions are not shared between workers"""
+
+    backend = "memory"
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: int = 3600):
+        super().__init__(max_sessions, ttl_seconds)
+        self._sessions = OrderedDict()  # session_id -> (blob, last_access)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remove(self, session_id: str):
+        blob, _ = self._sessions.pop(session_id)
+        self._bytes -= len(blob)
+
+    def _purge_expired(self, now: float):
+        # Entries are kept in access order, so expired ones are at the front
+        while self._sessions:
+            session_id, (_, last_access) = next(iter(self._sessions.items()))
+            if now - last_access <= self.ttl_seconds:
+                break
+            self._remove(session_id)
+            self.expirations += 1
+
+    def _get(self, session_id: str):
+        now = time.time()
+        with self._lock:
+            self._purge_expired(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            self._sessions[session_id] = (entry[0], now)
+            self._sessions.move_to_end(session_id)
+            return entry[0]
+
+    def _set(self, session_id: str, blob: bytes):
+        now = time.time()
+        with self._lock:
+            if session_id in self._sessions:
+                self._remove(session_id)
+            self._sessions[session_id] = (blob, now)
+            self._bytes += len(blob)
+            self._purge_expired(now)
+            while len(self._sessions) > self.max_sessions:
+                self._remove(next(iter(self._sessions)))
+                self.evictions += 1
+
+    def _delete(self, session_id: str):
+        with self._lock:
+            if session_id in self._sessions:
+                self._remove(session_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """File-backed store that several workers on one host can share"""
+
+    backend = "sqlite"
+
+    def __init__(self, path: str = "sessions.db", max_sessions: int = 1000, ttl_seconds: int = 3600):
+        super().__init__(max_sessions, ttl_seconds)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+
+    def _get(self, session_id: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, last_access FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                return None
+            self._conn.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (now, session_id))
+            return row[0]
+
+    def _set(self, session_id: str, blob: bytes):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sessions (session_id, data, size, last_access) VALUES (?, ?, ?, ?)",
+                    (session_id, blob, len(blob), now),
+                )
+                self._conn.execute("DELETE FROM sessions WHERE last_access < ?", (now - self.ttl_seconds,))
+                self._conn.execute(
+                    "DELETE FROM sessions WHERE session_id IN ("
+                    "SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_sessions,),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions WHERE last_access >= ?",
+                (time.time() - self.ttl_seconds,),
+            ).fetchone()
+        return {
+            "backend": self.backend,
+            "sessions": count,
+            "bytes": total,
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Store for any server speaking the Redis protocol. Idle TTL uses key
+    expiry; LRU order and sizes are kept in a sorted set and a hash.
+    """
+
+    backend = "redis"
+
+    def __init__(self, url: str = "redis://localhost:6379/0", max_sessions: int = 1000,
+                 ttl_seconds: int = 3600, prefix: str = "cryptosentinel:session:"):
+        super().__init__(max_sessions, ttl_seconds)
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SESSION_BACKEND=redis requires the 'redis' package (pip install redis)")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._lru_key = f"{prefix}__lru__"
+        self._sizes_key = f"{prefix}__sizes__"
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    def _forget(self, session_ids):
+        if not session_ids:
+            return
+        pipe = self.client.pipeline()
+        pipe.delete(*[self._key(s) for s in session_ids])
+        pipe.zrem(self._lru_key, *session_ids)
+        pipe.hdel(self._sizes_key, *session_ids)
+        pipe.execute()
+
+    def _get(self, session_id: str):
+        pipe = self.client.pipeline()
+        pipe.get(self._key(session_id))
+        pipe.expire(self._key(session_id), self.ttl_seconds)
+        blob, _ = pipe.execute()
+        if blob is None:
+            return None
+        self.client.zadd(self._lru_key, {session_id: time.time()})
+        return blob
+
+    def _set(self, session_id: str, blob: bytes):
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.set(self._key(session_id), blob, ex=self.ttl_seconds)
+        pipe.zadd(self._lru_key, {session_id: now})
+        pipe.hset(self._sizes_key, session_id, len(blob))
+        pipe.execute()
+
+        # Drop bookkeeping for sessions Redis has already expired, then trim to size
+        expired = self.client.zrangebyscore(self._lru_key, 0, now - self.ttl_seconds)
+        self._forget([s.decode() for s in expired])
+        overflow = self.client.zcard(self._lru_key) - self.max_sessions
+        if overflow > 0:
+            oldest = self.client.zrange(self._lru_key, 0, overflow - 1)
+            self._forget([s.decode() for s in oldest])
+
+    def _delete(self, session_id: str):
+        self._forget([session_id])
+
+    def stats(self) -> dict:
+        sizes = self.client.hvals(self._sizes_key)
+        return {
+            "backend": self.backend,
+            "sessions": self.client.zcard(self._lru_key),
+            "bytes": sum(int(size) for size in sizes),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+def create_session_store() -> SessionStore:
+    """Build the session store selected by the SESSION_* environment variables"""
+    backend = os.getenv("SESSION_BACKEND", "memory").lower()
+    max_sessions = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+    ttl_seconds = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+
+    if backend == "memory":
+        return InMemorySessionStore(max_sessions, ttl_seconds)
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_SQLITE_PATH", "sessions.db"), max_sessions, ttl_seconds)
+    if backend == "redis":
+        return RedisSessionStore(os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0"), max_sessions, ttl_seconds)
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
@@ -0,0 +1,74 @@
+"""
+In-flight deduplication ("single flight") of identical work.
+
+When several threads ask for the same key at once, the first runs the
+function and the others block until it finishes and share its result, or
+its exception. Nothing is kept after the call returns; remembering finished
+results is the response cache's job.
+"""
+
+import threading
+
+from src.utils.metrics import registry, add_total
+
+
+class _Call:
+    __slots__ = ("done", "value", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """A named group of coalesced calls, e.g. one for upstream fetches"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs), or wait for the call already in flight for key.
+        Returns (value, shared); shared is True for every caller (the one that
+        ran fn included) when the value went to more than one of them, in which
+        case callers must not mutate it.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            registry.inc("singleflight_coalesced_total", group=self.name)
+            add_total(f"coalesced_{self.name}", 1)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Later callers start a new flight; waiters already holding the call are released
+            with self._lock:
+                del self._calls[key]
+                shared = call.waiters > 0
+            call.done.set()
+        return call.value, shared
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": len(self._calls), "coalesced": self.coalesced}
@@ -1,5 +1,143 @@
-import requests
+import json
+import os
+from dataclasses import asdict, dataclass, replace
+from typing import Optional, Tuple
+from src.utils import http_client
+from src.utils.cache import MISS, cached, response_cache
+from src.utils.logger import get_logger, log_payload
 
+logger = get_logger(__name__)
+
+# Contract addresses per /simple/token_price request (lower this on plans that allow fewer)
+PRICE_BATCH_SIZE = int(os.getenv("COINGECKO_PRICE_BATCH_SIZE", "30"))
+
+# Lean mode asks CoinGecko for market data only and keeps a compact TokenSnapshot;
+# COINGECKO_LEAN=false restores the full details dict
+COINGECKO_LEAN = os.getenv("COINGECKO_LEAN", "true").lower() == "true"
+# Tickers kept per token, highest USD volume first; 0 leaves them out of the request
+TOP_TICKERS = int(os.getenv("COINGECKO_TOP_TICKERS", "5"))
+
+
+@dataclass
+class TickerSnapshot:
+    __slots__ = ("market", "last_price_usd", "volume_usd", "bid_ask_spread_percentage", "trust_score")
+    market: str
+    last_price_usd: Optional[float]
+    volume_usd: Optional[float]
+    bid_ask_spread_percentage: Optional[float]
+    trust_score: Optional[str]
+
+
+@dataclass
+class TokenSnapshot:
+    """
+    Market data of one token, as held in AgentState.token_data in lean mode.
+    Slotted, so a session carries a few hundred bytes instead of the full
+    CoinGecko payload; str() is the compact JSON the prompts use.
+    """
+
+    __slots__ = (
+        "id", "symbol", "name", "contract_address", "market_cap_rank",
+        "current_price_usd", "market_cap_usd", "total_volume_usd", "fully_diluted_valuation_usd",
+        "total_supply", "max_supply", "circulating_supply", "high_24h_usd", "low_24h_usd",
+        "price_change_percentage_24h", "price_change_percentage_7d", "price_change_percentage_30d",
+        "ath_usd", "ath_change_percentage_usd", "atl_usd", "atl_change_percentage_usd",
+        "sentiment_votes_up_percentage", "watchlist_portfolio_users", "last_updated", "top_tickers",
+    )
+    id: Optional[str]
+    symbol: Optional[str]
+    name: Optional[str]
+    contract_address: Optional[str]
+    market_cap_rank: Optional[int]
+    current_price_usd: Optional[float]
+    market_cap_usd: Optional[float]
+    total_volume_usd: Optional[float]
+    fully_diluted_valuation_usd: Optional[float]
+    total_supply: Optional[float]
+    max_supply: Optional[float]
+    circulating_supply: Optional[float]
+    high_24h_usd: Optional[float]
+    low_24h_usd: Optional[float]
+    price_change_percentage_24h: Optional[float]
+    price_change_percentage_7d: Optional[float]
+    price_change_percentage_30d: Optional[float]
+    ath_usd: Optional[float]
+    ath_change_percentage_usd: Optional[float]
+    atl_usd: Optional[float]
+    atl_change_percentage_usd: Optional[float]
+    sentiment_votes_up_percentage: Optional[float]
+    watchlist_portfolio_users: Optional[int]
+    last_updated: Optional[str]
+    top_tickers: Tuple[TickerSnapshot, ...]
+
+    @classmethod
+    def from_coingecko(cls, token_data: dict, top_tickers: int = TOP_TICKERS) -> "TokenSnapshot":
+        md = token_data.get("market_data") or {}
+
+        def usd(name):
+            return (md.get(name) or {}).get("usd")
+
+        tickers = sorted(
+            token_data.get("tickers") or [],
+            key=lambda ticker: (ticker.get("converted_volume") or {}).get("usd") or 0,
+            reverse=True
+        )[:top_tickers]
+        return cls(
+            id=token_data.get("id"),
+            symbol=token_data.get("symbol"),
+            name=token_data.get("name"),
+            contract_address=token_data.get("contract_address"),
+            market_cap_rank=token_data.get("market_cap_rank"),
+            current_price_usd=usd("current_price"),
+            market_cap_usd=usd("market_cap"),
+            total_volume_usd=usd("total_volume"),
+            fully_diluted_valuation_usd=usd("fully_diluted_valuation"),
+            total_supply=md.get("total_supply"),
+            max_supply=md.get("max_supply"),
+            circulating_supply=md.get("circulating_supply"),
+            high_24h_usd=usd("high_24h"),
+            low_24h_usd=usd("low_24h"),
+            price_change_percentage_24h=md.get("price_change_percentage_24h"),
+            price_change_percentage_7d=md.get("price_change_percentage_7d"),
+            price_change_percentage_30d=md.get("price_change_percentage_30d"),
+            ath_usd=usd("ath"),
+            ath_change_percentage_usd=usd("ath_change_percentage"),
+            atl_usd=usd("atl"),
+            atl_change_percentage_usd=usd("atl_change_percentage"),
+            sentiment_votes_up_percentage=token_data.get("sentiment_votes_up_percentage"),
+            watchlist_portfolio_users=token_data.get("watchlist_portfolio_users"),
+            last_updated=token_data.get("last_updated"),
+            top_tickers=tuple(
+                TickerSnapshot(
+                    market=(ticker.get("market") or {}).get("name"),
+                    last_price_usd=(ticker.get("converted_last") or {}).get("usd"),
+                    volume_usd=(ticker.get("converted_volume") or {}).get("usd"),
+                    bid_ask_spread_percentage=ticker.get("bid_ask_spread_percentage"),
+                    trust_score=ticker.get("trust_score"),
+                )
+                for ticker in tickers
+            ),
+        )
+
+    def get(self, name: str, default=None):
+        """dict-style access, so code written for the full details dict keeps working"""
+        value = getattr(self, name, None)
+        return default if value is None else value
+
+    def to_dict(self) -> dict:
+        """Plain dict without empty fields"""
+        data = {name: value for name, value in asdict(self).items() if value is not None}
+        data["top_tickers"] = [
+            {name: value for name, value in ticker.items() if value is not None} for ticker in data["top_tickers"]
+        ]
+        if not data["top_tickers"]:
+            del data["top_tickers"]
+        return data
+
+    def __str__(self) -> str:
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+
+@cached("coingecko", key=lambda token_address, platform="base": f"{platform}:{token_address.lower()}")
 def get_details(token_address, platform="base"):
     """
     Given a token contract address, this function returns a dictionary of selected details
@@ -24,11 +162,15 @@ def get_details(token_address, platform="base"):
     
     Returns:
       dict: A dictionary containing the selected token details.
+      In lean mode (COINGECKO_LEAN, the default) a TokenSnapshot instead; see get_token_snapshot.
     """
-    print('I am inside get_details')
+    if COINGECKO_LEAN:
+        return get_token_snapshot(token_address, platform)
+
+    logger.debug("Fetching CoinGecko details for %s on %s", token_address, platform)
 
     cg_url = f"https://api.coingecko.com/api/v3/coins/{platform}/contract/{token_address}"
-    cg_response = requests.get(cg_url)
+    cg_response = http_client.get(cg_url)
     if cg_response.status_code != 200:
         raise Exception(f"CoinGecko API error: {cg_response.status_code} - {cg_response.text}")
     
@@ -87,11 +229,101 @@ def get_details(token_address, platform="base"):
         }
         trading_details.append(td)
     details["trading_details"] = trading_details
-    print('I am inside get_details',details["trading_details"])
-
+    log_payload(logger, "CoinGecko trading details", details["trading_details"])
     
     return details
 
+def get_token_snapshot(token_address, platform="base") -> TokenSnapshot:
+    """
+    Market data of a token without description, links, localization,
+    community or developer data, keeping only the TOP_TICKERS busiest tickers.
+    """
+    logger.debug("Fetching CoinGecko snapshot for %s on %s", token_address, platform)
+
+    cg_response = http_client.get(
+        f"https://api.coingecko.com/api/v3/coins/{platform}/contract/{token_address}",
+        params={
+            "localization": "false",
+            "tickers": "true" if TOP_TICKERS > 0 else "false",
+            "market_data": "true",
+            "community_data": "false",
+            "developer_data": "false",
+            "sparkline": "false"
+        }
+    )
+    if cg_response.status_code != 200:
+        raise Exception(f"CoinGecko API error: {cg_response.status_code} - {cg_response.text}")
+
+    snapshot = TokenSnapshot.from_coingecko(cg_response.json())
+    log_payload(logger, "CoinGecko snapshot", snapshot.to_dict())
+    return snapshot
+
+def get_token_prices(token_addresses, platform="base"):
+    """
+    Fetch current USD price, market cap, 24h volume and 24h change for many tokens
+    with CoinGecko's multi-contract /simple/token_price endpoint, PRICE_BATCH_SIZE
+    addresses per request.
+    
+    Returns:
+      dict: lowercased contract address -> price details, for the tokens CoinGecko knows.
+    """
+    logger.debug("Fetching CoinGecko prices for %d tokens on %s", len(token_addresses), platform)
+
+    prices = {}
+    missing = []
+    for address in dict.fromkeys(a.lower() for a in token_addresses):
+        cached_price = response_cache.get("coingecko_price", f"{platform}:{address}")
+        if cached_price is MISS:
+            missing.append(address)
+        else:
+            prices[address] = cached_price
+
+    for start in range(0, len(missing), PRICE_BATCH_SIZE):
+        batch = missing[start:start + PRICE_BATCH_SIZE]
+        cg_response = http_client.get(
+            f"https://api.coingecko.com/api/v3/simple/token_price/{platform}",
+            params={
+                "contract_addresses": ",".join(batch),
+                "vs_currencies": "usd",
+                "include_market_cap": "true",
+                "include_24hr_vol": "true",
+                "include_24hr_change": "true",
+                "include_last_updated_at": "true"
+            }
+        )
+        if cg_response.status_code != 200:
+            raise Exception(f"CoinGecko API error: {cg_response.status_code} - {cg_response.text}")
+
+        for address, data in cg_response.json().items():
+            price = {
+                "contract_address": address.lower(),
+                "current_price_usd": data.get("usd"),
+                "market_cap_usd": data.get("usd_market_cap"),
+                "total_volume_usd": data.get("usd_24h_vol"),
+                "price_change_percentage_24h": data.get("usd_24h_change"),
+                "last_updated_at": data.get("last_updated_at")
+            }
+            response_cache.set("coingecko_price", f"{platform}:{address.lower()}", price)
+            prices[address.lower()] = price
+
+    return prices
+
+def with_price(token_data, price):
+    """
+    token_data (a TokenSnapshot or details dict) with the fields it lacks
+    taken from a get_token_prices entry; the fields it has are kept, so a
+    token rates the same whether or not its price was prefetched.
+    """
+    if isinstance(token_data, TokenSnapshot):
+        missing = {
+            name: value for name, value in price.items()
+            if name in TokenSnapshot.__slots__ and value is not None and getattr(token_data, name) is None
+        }
+        return replace(token_data, **missing) if missing else token_data
+    return {**{name: value for name, value in price.items() if value is not None}, **{
+        name: value for name, value in token_data.items() if value is not None
+    }}
+
 # Example usage:
 # if __name__ == "__main__":
 #     # Replace with your token contract address (for example, the "aixbt" token on Base)
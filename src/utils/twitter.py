@@ -19,31 +19,51 @@ Required packages:
 import re
 import json
 import os
+import threading
 from datetime import datetime
 
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-
-# Use Tweepy Client for Twitter API v2 (free endpoints)
-import tweepy
-
-# LangChain imports
-from langchain.agents import initialize_agent, Tool
-from langchain.llms import OpenAI
 from dotenv import load_dotenv
+from src.utils.logger import get_logger
 
 # Load environment variables
 load_dotenv()
 
+logger = get_logger(__name__)
+
 # ====================
 # Twitter API v2 Setup (Free API)
 # ====================
 # Replace with your Twitter Bearer Token or set as environment variable TWITTER_BEARER_TOKEN
 BEARER_TOKEN = os.environ.get("TWITTER_BEARER_TOKEN", "YOUR_TWITTER_BEARER_TOKEN")
-if BEARER_TOKEN == "YOUR_TWITTER_BEARER_TOKEN":
-    print("Please set your TWITTER_BEARER_TOKEN as an environment variable or update the code.")
 
-# Initialize Tweepy Client (using only free endpoints)
-client = tweepy.Client(bearer_token=BEARER_TOKEN, wait_on_rate_limit=True)
+# The Tweepy client, sentiment analyzer and agent are built on first use
+_client = None
+_analyzer = None
+_agent = None
+_lock = threading.Lock()
+
+def get_client():
+    """Return the shared Tweepy client (using only free endpoints)"""
+    global _client
+    with _lock:
+        if _client is None:
+            # Use Tweepy Client for Twitter API v2 (free endpoints)
+            import tweepy
+
+            if BEARER_TOKEN == "YOUR_TWITTER_BEARER_TOKEN":
+                logger.warning("Please set your TWITTER_BEARER_TOKEN as an environment variable or update the code.")
+            _client = tweepy.Client(bearer_token=BEARER_TOKEN, wait_on_rate_limit=True)
+        return _client
+
+def get_sentiment_analyzer():
+    """Return the shared VADER analyzer (loading its lexicon is not free)"""
+    global _analyzer
+    with _lock:
+        if _analyzer is None:
+            from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+            _analyzer = SentimentIntensityAnalyzer()
+        return _analyzer
 
 # ====================
 # Helper Functions
@@ -61,7 +81,7 @@ def extract_twitter_data(url: str) -> dict:
             # URL example: https://x.com/username/status/tweet_id
             username = parts[3]
             tweet_id = parts[5]
-            response = client.get_tweet(tweet_id, tweet_fields=["public_metrics", "created_at", "text"], expansions=["author_id"])
+            response = get_client().get_tweet(tweet_id, tweet_fields=["public_metrics", "created_at", "text"], expansions=["author_id"])
             if response.errors:
                 return {"error": f"{response.errors}"}
             tweet = response.data
@@ -77,7 +97,7 @@ def extract_twitter_data(url: str) -> dict:
             username = parts[3]
             # Use recent search to fetch the latest tweet from the user
             query = f"from:{username}"
-            search_response = client.search_recent_tweets(query=query, tweet_fields=["public_metrics", "created_at", "text"], expansions=["author_id"], max_results=10)
+            search_response = get_client().search_recent_tweets(query=query, tweet_fields=["public_metrics", "created_at", "text"], expansions=["author_id"], max_results=10)
             if not search_response.data:
                 return {"error": "No tweets found for this profile."}
             tweet = search_response.data[0]
@@ -119,7 +139,7 @@ def analyze_sentiment(tweet_data: dict) -> dict:
     if "error" in tweet_data:
         return tweet_data
 
-    analyzer = SentimentIntensityAnalyzer()
+    analyzer = get_sentiment_analyzer()
     cleaned_text = clean_tweet(tweet_data["text"])
     scores = analyzer.polarity_scores(cleaned_text)
     compound = scores["compound"]
@@ -152,47 +172,55 @@ def twitter_data_extractor(url: str) -> str:
     data = extract_twitter_data(url)
     return json.dumps(data)
 
-twitter_tool = Tool(
-    name="TwitterDataExtractor",
-    func=twitter_data_extractor,
-    description=(
-        "Accepts a Twitter URL (tweet or profile) and returns a JSON string containing the tweet's text, "
-        "engagement metrics (retweets, likes), creation time, and user follower count (if available)."
-    )
-)
-
 def sentiment_analyzer_tool(tweet_json: str) -> str:
     tweet_data = json.loads(tweet_json)
     result = analyze_sentiment(tweet_data)
     return json.dumps(result, indent=2)
 
-sentiment_tool = Tool(
-    name="SentimentAnalyzer",
-    func=sentiment_analyzer_tool,
-    description=(
-        "Accepts a JSON string (tweet data) and returns a JSON string with the cleaned text, "
-        "VADER sentiment scores, overall sentiment (Bullish/Bearish/Neutral), and a weighted score."
-    )
-)
-
 # ====================
 # Initialize the LangChain Agent
 # ====================
 
-# Ensure OPENAI_API_KEY is set in your environment.
-llm = OpenAI(temperature=0)
-agent = initialize_agent(
-    tools=[twitter_tool, sentiment_tool],
-    llm=llm,
-    agent="zero-shot-react-description",
-    verbose=True
-)
+def get_agent():
+    """Return the shared Twitter sentiment agent, building it on first use"""
+    global _agent
+    with _lock:
+        if _agent is None:
+            from langchain.agents import initialize_agent, Tool
+            from langchain.llms import OpenAI
+
+            twitter_tool = Tool(
+                name="TwitterDataExtractor",
+                func=twitter_data_extractor,
+                description=(
+                    "Accepts a Twitter URL (tweet or profile) and returns a JSON string containing the tweet's text, "
+                    "engagement metrics (retweets, likes), creation time, and user follower count (if available)."
+                )
+            )
+            sentiment_tool = Tool(
+                name="SentimentAnalyzer",
+                func=sentiment_analyzer_tool,
+                description=(
+                    "Accepts a JSON string (tweet data) and returns a JSON string with the cleaned text, "
+                    "VADER sentiment scores, overall sentiment (Bullish/Bearish/Neutral), and a weighted score."
+                )
+            )
+
+            # Ensure OPENAI_API_KEY is set in your environment.
+            llm = OpenAI(temperature=0)
+            _agent = initialize_agent(
+                tools=[twitter_tool, sentiment_tool],
+                llm=llm,
+                agent="zero-shot-react-description",
+                verbose=True
+            )
+        return _agent
 
 # ====================
 # Main Execution Block
 # ====================
 # if __name__ == "__main__":
 #     twitter_url = input("Enter a Twitter URL: ").strip()
-#     result = agent.run(twitter_url)
+#     result = get_agent().run(twitter_url)
 #     print("\nFinal Result:")
 #     print(result)
@@ -0,0 +1,162 @@
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+class PipelineBusyError(Exception):
+    """
+    Raised when a pipeline call is rejected because the queue is full.
+    status_code is 503 when the global queue is full and 429 when only the
+    endpoint's own queue limit was hit.
+    """
+
+    def __init__(self, message: str, status_code: int = 503, retry_after: int = 5):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class PipelinePool:
+    """
+    Runs the blocking research pipeline on a fixed set of worker threads so the
+    event loop stays free for health checks and light endpoints.
+
+    At most max_workers calls run at once and at most max_queue more may wait;
+    anything beyond that is rejected immediately instead of piling up.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 16, max_queue_per_endpoint: int = None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_queue_per_endpoint = max_queue_per_endpoint
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._endpoints = {}
+
+    def _endpoint_stats(self, endpoint: str) -> dict:
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = {"queued": 0, "running": 0, "completed": 0, "failed": 0, "rejected": 0}
+            self._endpoints[endpoint] = stats
+        return stats
+
+    def _admit(self, endpoint: str):
+        with self._lock:
+            stats = self._endpoint_stats(endpoint)
+            if self._pending >= self.max_workers + self.max_queue:
+                stats["rejected"] += 1
+                raise PipelineBusyError("Server is busy, please retry shortly", status_code=503)
+            if self.max_queue_per_endpoint and stats["queued"] >= self.max_queue_per_endpoint:
+                stats["rejected"] += 1
+                raise PipelineBusyError(f"Too many queued '{endpoint}' requests, please retry shortly", status_code=429)
+            self._pending += 1
+            stats["queued"] += 1
+
+    def _start(self, endpoint: str):
+        with self._lock:
+            stats = self._endpoint_stats(endpoint)
+            stats["queued"] -= 1
+            stats["running"] += 1
+
+    def _finish(self, endpoint: str, failed: bool):
+        with self._lock:
+            stats = self._endpoint_stats(endpoint)
+            stats["running"] -= 1
+            stats["failed" if failed else "completed"] += 1
+            self._pending -= 1
+
+    def _discard(self, endpoint: str):
+        # The caller went away before a worker picked the call up
+        with self._lock:
+            self._endpoint_stats(endpoint)["queued"] -= 1
+            self._pending -= 1
+
+    def submit(self, endpoint: str, fn, *args, **kwargs):
+        """Queue fn on the pool and return its concurrent Future"""
+        self._admit(endpoint)
+
+        def task():
+            self._start(endpoint)
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self._finish(endpoint, failed)
+
+        ctx = contextvars.copy_context()
+        future = self.executor.submit(ctx.run, task)
+        future.add_done_callback(lambda f: f.cancelled() and self._discard(endpoint))
+        return future
+
+    async def run(self, endpoint: str, fn, *args, **kwargs):
+        """Run fn on the pool and await its result from the event loop"""
+        return await asyncio.wrap_future(self.submit(endpoint, fn, *args, **kwargs))
+
+    def stream(self, endpoint: str, fn, *args, **kwargs):
+        """
+        Run the generator function fn on the pool and return an async iterator
+        over the items it yields. Admission happens immediately, so a full queue
+        raises PipelineBusyError before any response has been started.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        def publish(item, error=None, finished=False):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, (item, error, finished))
+            except RuntimeError:
+                pass  # the event loop is gone; nobody is listening any more
+
+        def produce():
+            try:
+                for item in fn(*args, **kwargs):
+                    publish(item)
+            except Exception as e:
+                publish(None, e, True)
+                raise
+            publish(None, None, True)
+
+        self.submit(endpoint, produce)
+        return self._drain(queue)
+
+    @staticmethod
+    async def _drain(queue: asyncio.Queue):
+        while True:
+            item, error, finished = await queue.get()
+            if error is not None:
+                raise error
+            if finished:
+                return
+            yield item
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                "endpoints": {name: dict(stats) for name, stats in self._endpoints.items()},
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_pipeline_pool() -> PipelinePool:
+    """Build the pipeline pool from PIPELINE_* environment variables"""
+    per_endpoint = os.getenv("PIPELINE_MAX_QUEUE_PER_ENDPOINT")
+    return PipelinePool(
+        max_workers=int(os.getenv("PIPELINE_WORKERS", "4")),
+        max_queue=int(os.getenv("PIPELINE_MAX_QUEUE", "16")),
+        max_queue_per_endpoint=int(per_endpoint) if per_endpoint else None,
+    )
@@ -0,0 +1,50 @@
+import agent
+from src.utils import scoring
+from src.utils.trading_data import TokenSnapshot
+
+ADDRESS = "0x4F9Fd6Be4a90f2620860d680c0D4d5Fb53d1A825"
+
+SNAPSHOT = TokenSnapshot.from_coingecko({
+    "id": "aixbt",
+    "symbol": "aixbt",
+    "contract_address": ADDRESS.lower(),
+    "market_data": {
+        "current_price": {"usd": 0.21},
+        "market_cap": {"usd": 180_000_000},
+        "total_volume": {"usd": 40_000_000},
+        "price_change_percentage_24h": 3.5,
+        "price_change_percentage_7d": 12.0,
+    },
+    "sentiment_votes_up_percentage": 78.0,
+    "watchlist_portfolio_users": 25_000,
+})
+
+PRICE = {
+    "contract_address": ADDRESS.lower(),
+    "current_price_usd": 0.21,
+    "market_cap_usd": 180_000_000,
+    "total_volume_usd": 40_000_000,
+    "price_change_percentage_24h": 3.5,
+    "last_updated_at": 1700000000,
+}
+
+
+def test_batch_and_single_item_score_alike(monkeypatch):
+    monkeypatch.setattr(agent, "get_details", lambda address: SNAPSHOT)
+
+    single = agent.token_details(ADDRESS)
+    batched = agent.token_details(ADDRESS, {ADDRESS.lower(): PRICE})
+
+    for score in (scoring.score_token, scoring.score_social):
+        assert score(batched) == score(single)
+    assert not scoring.score_social(batched).ambiguous
+
+
+def test_prefetched_price_fills_gaps(monkeypatch):
+    thin = TokenSnapshot.from_coingecko({"id": "aixbt", "market_data": {"price_change_percentage_7d": 12.0}})
+    monkeypatch.setattr(agent, "get_details", lambda address: thin)
+
+    token_data = agent.token_details(ADDRESS, {ADDRESS.lower(): PRICE})
+
+    assert token_data.market_cap_usd == PRICE["market_cap_usd"]
+    assert token_data.price_change_percentage_7d == 12.0
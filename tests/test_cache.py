@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.utils import cache, github
+from src.utils.cache import MISS, ResponseCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+def test_entries_expire_after_their_source_ttl(clock):
+    responses = ResponseCache(ttls={"prices": 60, "source": None})
+    responses.set("prices", "0xabc", 1.5)
+    responses.set("source", "0xabc", "contract")
+
+    clock.now += 59
+    assert responses.get("prices", "0xabc") == 1.5
+    clock.now += 2
+    assert responses.get("prices", "0xabc") is MISS
+    # Stale entries stay available for revalidation
+    assert responses.lookup("prices", "0xabc").value == 1.5
+    assert responses.get("source", "0xabc") == "contract"
+
+
+def test_least_recently_used_entry_is_evicted():
+    responses = ResponseCache(max_entries=2, ttls={})
+    responses.set("repo", "a", 1)
+    responses.set("repo", "b", 2)
+    responses.get("repo", "a")
+    responses.set("repo", "c", 3)
+
+    assert responses.get("repo", "b") is MISS
+    assert responses.get("repo", "a") == 1 and responses.get("repo", "c") == 3
+    assert responses.stats()["sources"]["repo"]["evictions"] == 1
+
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    ResponseCache(ttls={}, path=path).set("repo", "a", {"stars": 10}, etag='"v1"')
+
+    entry = ResponseCache(ttls={}, path=path).lookup("repo", "a")
+    assert entry.value == {"stars": 10} and entry.etag == '"v1"'
+
+
+def response(status_code, body=None, etag=None):
+    return SimpleNamespace(
+        status_code=status_code, headers={"ETag": etag} if etag else {}, links={},
+        json=lambda: body, text=str(body)
+    )
+
+
+def test_stale_entry_is_revalidated_with_its_etag(monkeypatch, clock):
+    responses = ResponseCache(ttls={"github_repo": 600})
+    monkeypatch.setattr(github, "response_cache", responses)
+    requests = []
+    replies = iter([response(200, {"stars": 10}, etag='"v1"'), response(304)])
+
+    def github_request(method, url, priority, headers=None):
+        requests.append(headers)
+        return next(replies)
+
+    monkeypatch.setattr(github, "github_request", github_request)
+
+    def fetch():
+        return github.fetch_github_json("https://api.github.com/repos/a/b", "github_repo", "a/b", "error", dict)
+
+    assert fetch() == {"stars": 10}
+    assert fetch() == {"stars": 10} and len(requests) == 1
+    clock.now += 601
+    assert fetch() == {"stars": 10}
+    assert requests == [{}, {"If-None-Match": '"v1"'}]
+    # The 304 made the entry fresh for another TTL
+    assert responses.get("github_repo", "a/b") == {"stars": 10}
+    assert responses.stats()["sources"]["github_repo"]["revalidated"] == 1
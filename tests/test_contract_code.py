@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from src.utils import contract_code
+from src.utils.contract_code import ProviderHealth, SourceNotFound, _fetch_hedged
+
+HEDGE_DELAY = 0.1
+
+
+@pytest.fixture(autouse=True)
+def hedging(monkeypatch):
+    monkeypatch.setattr(contract_code, "CONTRACT_SOURCE_HEDGE_DELAY", HEDGE_DELAY)
+    monkeypatch.setattr(contract_code, "provider_health", ProviderHealth(max_failures=1, cooldown=60))
+
+
+class Provider:
+    """Fake source provider answering after delay, or failing with error"""
+
+    def __init__(self, name, delay=0.0, source=None, error=None):
+        self.name = name
+        self.delay = delay
+        self.source = source if source is not None else [f"contract from {name}"]
+        self.error = error
+        self.started = None
+        self.cancelled = False
+
+    def __call__(self, address, cancel: threading.Event):
+        self.started = time.monotonic()
+        if cancel.wait(self.delay):
+            self.cancelled = True
+            raise contract_code.http_client.RequestCancelled("cancelled")
+        if self.error:
+            raise self.error
+        return self.source
+
+
+def fetch(*providers):
+    started = time.monotonic()
+    result = _fetch_hedged("0xabc", [(provider.name, provider) for provider in providers])
+    return result, time.monotonic() - started
+
+
+def test_fast_primary_is_not_hedged():
+    primary, backup = Provider("basescan"), Provider("covalent")
+
+    result, _ = fetch(primary, backup)
+
+    assert result == {"success": True, "data": ["contract from basescan"], "provider": "basescan"}
+    assert backup.started is None
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    primary, backup = Provider("basescan", delay=2), Provider("covalent")
+
+    result, elapsed = fetch(primary, backup)
+
+    assert result["provider"] == "covalent"
+    assert HEDGE_DELAY <= elapsed < 1
+    assert backup.started - primary.started >= HEDGE_DELAY
+    for _ in range(100):
+        if primary.cancelled:
+            break
+        time.sleep(0.01)
+    assert primary.cancelled
+
+
+def test_failed_primary_starts_the_backup_without_waiting():
+    primary = Provider("basescan", error=RuntimeError("502 Bad Gateway"))
+    backup = Provider("covalent")
+
+    result, elapsed = fetch(primary, backup)
+
+    assert result["provider"] == "covalent"
+    assert elapsed < HEDGE_DELAY
+    assert not contract_code.provider_health.available("basescan")
+
+
+def test_all_providers_failing_reports_every_error():
+    primary = Provider("basescan", error=SourceNotFound("not verified"))
+    backup = Provider("covalent", error=RuntimeError("timeout"))
+
+    result, _ = fetch(primary, backup)
+
+    assert result == {"success": False, "error": "basescan: not verified; covalent: timeout"}
+    # Not finding the source is a healthy answer
+    assert contract_code.provider_health.available("basescan")
+    assert not contract_code.provider_health.available("covalent")
@@ -0,0 +1,60 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.utils.github_tokens import HIGH, LOW, GitHubTokenPool, RateLimitExhausted
+
+
+def response(status_code=200, **headers):
+    return SimpleNamespace(status_code=status_code, headers=headers)
+
+
+def call(pool, resource="core", priority=HIGH, reply=None):
+    token = pool.acquire(resource, priority)
+    pool.release(token, resource, reply or response())
+    return token.label
+
+
+def test_equal_tokens_are_used_round_robin():
+    pool = GitHubTokenPool(["a", "b", "c"])
+
+    assert [call(pool) for _ in range(6)] == ["token-1", "token-2", "token-3"] * 2
+
+
+def test_token_with_most_budget_is_preferred():
+    pool = GitHubTokenPool(["a", "b"])
+    reset = str(time.time() + 3600)
+    call(pool, reply=response(**{"X-RateLimit-Remaining": "100", "X-RateLimit-Limit": "5000", "X-RateLimit-Reset": reset}))
+
+    assert [call(pool) for _ in range(3)] == ["token-2"] * 3
+
+
+def test_low_priority_calls_leave_the_reserve():
+    pool = GitHubTokenPool(["a"], low_priority_reserve=0.2)
+    reset = str(time.time() + 3600)
+    call(pool, reply=response(**{"X-RateLimit-Remaining": "900", "X-RateLimit-Limit": "5000", "X-RateLimit-Reset": reset}))
+
+    with pytest.raises(RateLimitExhausted):
+        pool.acquire("core", LOW)
+    assert call(pool, priority=HIGH) == "token-1"
+
+
+def test_secondary_rate_limit_rests_the_token():
+    pool = GitHubTokenPool(["a", "b"], max_wait=0)
+    call(pool, reply=response(403, **{"Retry-After": "60"}))
+    call(pool, reply=response(429, **{"Retry-After": "Wed, 21 Oct 2099 07:28:00 GMT"}))
+
+    with pytest.raises(RateLimitExhausted):
+        pool.acquire("core", HIGH)
+    stats = pool.stats()
+    assert 0 < stats["token-1"]["core"]["reset_in"] <= 60
+    assert stats["token-2"]["core"]["reset_in"] > 60
+
+
+def test_unreadable_retry_after_falls_back_to_the_backoff():
+    pool = GitHubTokenPool(["a"])
+
+    call(pool, reply=response(429, **{"Retry-After": "soon"}))
+    assert pool.stats()["token-1"]["core"]["reset_in"] > 0
+    assert pool.tokens[0].budget("core").in_flight == 0
@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+import requests
+
+from src.utils import http_client
+
+URL = "https://api.example.com/data"
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = b"{}"
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Replies (responses or exceptions) served in order, and the backoff delays waited"""
+    replies = []
+    delays = []
+
+    class Session:
+        calls = 0
+
+        def request(self, method, url, timeout=None, **kwargs):
+            Session.calls += 1
+            reply = replies.pop(0)
+            if isinstance(reply, Exception):
+                raise reply
+            return reply
+
+    monkeypatch.setitem(http_client._sessions, "api.example.com", (Session(), threading.BoundedSemaphore(1)))
+    monkeypatch.setattr(http_client, "_backoff", lambda delay, cancel=None: delays.append(delay))
+    return replies, delays, Session
+
+
+def test_retryable_status_is_retried(upstream):
+    replies, delays, session = upstream
+    replies += [FakeResponse(503), FakeResponse(502), FakeResponse(200)]
+
+    assert http_client.get(URL).status_code == 200
+    assert session.calls == 3 and len(delays) == 2
+    assert all(0 <= delay <= http_client.BACKOFF_MAX for delay in delays)
+
+
+def test_retry_after_is_honored(upstream):
+    replies, delays, session = upstream
+    replies += [FakeResponse(429, {"Retry-After": "7"}), FakeResponse(200)]
+
+    assert http_client.get(URL).status_code == 200
+    assert delays == [7.0]
+
+
+def test_retry_after_over_the_limit_returns_the_error(upstream, monkeypatch):
+    replies, delays, session = upstream
+    monkeypatch.setattr(http_client, "RETRY_AFTER_MAX", 120)
+    replies += [FakeResponse(429, {"Retry-After": "300"}), FakeResponse(200)]
+
+    assert http_client.get(URL).status_code == 429
+    assert session.calls == 1 and delays == []
+
+
+def test_last_response_is_returned_when_retries_run_out(upstream):
+    replies, delays, session = upstream
+    replies += [FakeResponse(503)] * 3
+
+    assert http_client.get(URL, retries=2).status_code == 503
+    assert session.calls == 3
+
+
+def test_connection_errors_are_retried_then_raised(upstream):
+    replies, delays, session = upstream
+    replies += [requests.ConnectionError("reset")] * 2
+
+    with pytest.raises(requests.ConnectionError):
+        http_client.get(URL, retries=1)
+    assert session.calls == 2
+
+
+def test_cancelled_request_is_not_sent(upstream):
+    replies, delays, session = upstream
+    cancel = threading.Event()
+    cancel.set()
+
+    with pytest.raises(http_client.RequestCancelled):
+        http_client.get(URL, cancel=cancel)
+    assert session.calls == 0
+
+
+def test_parse_retry_after():
+    assert http_client.parse_retry_after("12") == 12.0
+    assert http_client.parse_retry_after("Wed, 21 Oct 2099 07:28:00 GMT") > 0
+    assert http_client.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert http_client.parse_retry_after("soon") is None
+    assert http_client.parse_retry_after(None) is None
@@ -0,0 +1,90 @@
+import worker
+from src.utils.job_queue import FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue
+
+
+def make_queue(tmp_path, **kwargs):
+    return JobQueue(str(tmp_path / "jobs.db"), **kwargs)
+
+
+def test_job_runs_once_and_keeps_its_result(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.submit("analyze", {"query": "0xabc"}, session_id="s1")
+    assert queue.get(job_id)["status"] == QUEUED
+
+    job = queue.claim("w1")
+    assert job["id"] == job_id and job["status"] == RUNNING and job["attempts"] == 1
+    assert queue.claim("w2") is None
+
+    assert queue.add_progress(job_id, "w1", "token_analysis", {"price": 1})
+    assert queue.complete(job_id, "w1", {"result": "done"})
+    job = queue.get(job_id)
+    assert job["status"] == SUCCEEDED and job["result"] == {"result": "done"}
+    assert [entry["step"] for entry in job["progress"]] == ["token_analysis"]
+
+
+def test_expired_lease_is_requeued(tmp_path):
+    # A negative lease is already expired when it is granted
+    queue = make_queue(tmp_path, lease_seconds=-1, max_attempts=3)
+    job_id = queue.submit("analyze", {"query": "0xabc"})
+    queue.claim("w1")
+
+    job = queue.claim("w2")
+    assert job["id"] == job_id and job["attempts"] == 2
+    # The first worker lost the job and can no longer report on it
+    assert not queue.add_progress(job_id, "w1", "token_analysis", {})
+    assert not queue.complete(job_id, "w1", {"result": "late"})
+
+
+def test_job_fails_after_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=-1, max_attempts=2)
+    job_id = queue.submit("analyze", {"query": "0xabc"})
+    queue.claim("w1")
+    queue.claim("w2")
+
+    assert queue.claim("w3") is None
+    job = queue.get(job_id)
+    assert job["status"] == FAILED and job["attempts"] == 2
+
+
+def test_finished_jobs_are_purged_after_retention(tmp_path):
+    queue = make_queue(tmp_path, retention_seconds=-1)
+    finished = queue.submit("analyze", {"query": "0xabc"})
+    queue.claim("w1")
+    queue.complete(finished, "w1", {"result": "done"})
+    queued = queue.submit("analyze", {"query": "0xdef"})
+
+    assert queue.purge() == 1
+    assert queue.get(finished) is None
+    assert queue.get(queued)["status"] == QUEUED
+
+
+def test_worker_records_failures(tmp_path, monkeypatch):
+    queue = make_queue(tmp_path)
+    job_id = queue.submit("analyze", {"query": "0xabc"})
+    job_worker = worker.JobWorker(queue)
+
+    def analyze(job, worker_id):
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setattr(job_worker, "_analyze", analyze)
+    job_worker.run_job(queue.claim("w1"), "w1")
+
+    job = queue.get(job_id)
+    assert job["status"] == FAILED and job["error"] == "upstream down"
+
+
+def test_worker_drops_a_job_whose_lease_was_lost(tmp_path, monkeypatch):
+    queue = make_queue(tmp_path, lease_seconds=-1)
+    job_id = queue.submit("analyze", {"query": "0xabc"})
+    job_worker = worker.JobWorker(queue)
+    job = queue.claim("w1")
+    queue.claim("w2")
+
+    def analyze(job, worker_id):
+        raise worker.LeaseLost()
+
+    monkeypatch.setattr(job_worker, "_analyze", analyze)
+    job_worker.run_job(job, "w1")
+
+    job = queue.get(job_id)
+    assert job["status"] == RUNNING and job["attempts"] == 2
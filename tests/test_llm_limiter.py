@@ -0,0 +1,50 @@
+import asyncio
+import threading
+
+from src.utils.llm import ModelLimiter
+
+
+def test_async_waiter_gets_a_slot_released_by_a_thread():
+    limiter = ModelLimiter("gpt-4o", 1)
+    limiter.acquire()
+
+    async def main():
+        acquiring = asyncio.ensure_future(limiter.aacquire())
+        await asyncio.sleep(0.05)
+        assert not acquiring.done() and limiter.stats()["waiting"] == 1
+        threading.Timer(0.05, limiter.release).start()
+        await asyncio.wait_for(acquiring, 2)
+
+    asyncio.run(main())
+    assert limiter.stats() == {"limit": 1, "in_flight": 1, "waiting": 0}
+
+
+def test_thread_waiter_gets_a_slot_released_by_a_coroutine():
+    limiter = ModelLimiter("gpt-4o", 1)
+    asyncio.run(limiter.aacquire())
+    acquired = threading.Event()
+    waiter = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    waiter.start()
+
+    assert not acquired.wait(0.05)
+    limiter.release()
+    assert acquired.wait(2)
+    waiter.join()
+
+
+def test_cancelled_waiter_passes_its_slot_on():
+    limiter = ModelLimiter("gpt-4o", 1)
+    limiter.acquire()
+
+    async def main():
+        first = asyncio.ensure_future(limiter.aacquire())
+        second = asyncio.ensure_future(limiter.aacquire())
+        await asyncio.sleep(0.01)
+        # The release wakes the first waiter, which is cancelled before it runs
+        limiter.release()
+        first.cancel()
+        await asyncio.wait_for(second, 2)
+        assert first.cancelled()
+
+    asyncio.run(main())
+    assert limiter.stats() == {"limit": 1, "in_flight": 1, "waiting": 0}
@@ -0,0 +1,26 @@
+import threading
+
+from src.utils.prompt_budget import compact_data, count_tokens
+
+
+def _compact_with_deadline(value, budget, seconds=5):
+    result = []
+    worker = threading.Thread(target=lambda: result.append(compact_data(value, budget)), daemon=True)
+    worker.start()
+    worker.join(seconds)
+    assert result, "compact_data did not return"
+    return result[0]
+
+
+def test_two_element_list_does_not_loop():
+    text = _compact_with_deadline({"a": ["x" * 3000, "y"]}, 50)
+    assert count_tokens(text) <= 50
+
+
+def test_many_large_lists_fit_budget():
+    details = {
+        "links": {"homepage": ["https://example.org/" + "p" * 200] * 2},
+        "tickers": [{"market": f"m{i}", "volume_usd": i * 1.5, "url": "u" * 80} for i in range(100)],
+    }
+    text = _compact_with_deadline(details, 500)
+    assert count_tokens(text) <= 500
@@ -0,0 +1,37 @@
+from src.utils.scoring import CRITICAL_RATING_CAP, score_contract, score_investment
+
+
+def test_untagged_audit_is_ambiguous():
+    score = score_contract(
+        "No critical or high severity issues were found. low risk overall, one medium concern. Gas usage is high."
+    )
+    assert score.ambiguous
+    assert score.rating == 5.0
+
+
+def test_severity_tags_are_counted():
+    score = score_contract("- **SEVERITY: HIGH** reentrancy in withdraw()\nSEVERITY: MEDIUM owner can mint\n")
+    assert not score.ambiguous
+    assert score.signals["high_findings"] == 1 and score.signals["medium_findings"] == 1
+    assert score.rating == 8.0
+
+
+def test_clean_audit():
+    assert score_contract("SEVERITY: NONE").rating == 10.0
+
+
+def test_critical_finding_forces_avoid():
+    github_data = {
+        "repository": {"stars": 12000, "forks": 3000, "watchers": 12000, "open_issues": 40},
+        "developer": {"followers": 5000, "total_stars": 60000, "total_forks": 15000, "public_repos": 120},
+    }
+    token_metrics = {
+        "market_cap_usd": 2e9, "total_volume_usd": 3e8, "price_change_percentage_7d": 25.0,
+        "price_change_percentage_24h": 4.0, "sentiment_votes_up_percentage": 90.0, "watchlist_portfolio_users": 200000,
+    }
+    audit = "SEVERITY: CRITICAL owner can drain all funds through emergencyWithdraw()"
+
+    assert score_contract(audit).rating <= CRITICAL_RATING_CAP
+    result = score_investment(github_data, audit, token_metrics)
+    assert result["smart_contract_risk"]["rating"] <= CRITICAL_RATING_CAP
+    assert result["final_recommendation"].startswith("Avoid")
@@ -0,0 +1,79 @@
+import pytest
+
+from src.utils import session_store
+from src.utils.session_store import InMemorySessionStore, SessionStore, SQLiteSessionStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(max_sessions=1000, ttl_seconds=3600):
+        if request.param == "memory":
+            return InMemorySessionStore(max_sessions, ttl_seconds)
+        return SQLiteSessionStore(str(tmp_path / "sessions.db"), max_sessions, ttl_seconds)
+    return make
+
+
+def test_round_trip(make_store):
+    store = make_store()
+    size = store.save("s1", {"step": "start"})
+    assert store.load("s1") == {"step": "start"}
+    assert store.stats()["sessions"] == 1 and store.stats()["bytes"] == size
+
+    store.delete("s1")
+    assert store.load("s1") is None
+
+
+def test_idle_sessions_expire(make_store, clock):
+    store = make_store(ttl_seconds=60)
+    store.save("idle", "a")
+    store.save("active", "b")
+
+    clock.now += 40
+    assert store.load("active") == "b"
+    clock.now += 40
+    assert store.load("idle") is None
+    assert store.load("active") == "b"
+
+
+def test_least_recently_used_session_is_evicted(make_store, clock):
+    store = make_store(max_sessions=2)
+    store.save("s1", "a")
+    clock.now += 1
+    store.save("s2", "b")
+    clock.now += 1
+    store.load("s1")
+    clock.now += 1
+    store.save("s3", "c")
+
+    assert store.load("s2") is None
+    assert store.load("s1") == "a" and store.load("s3") == "c"
+
+
+def test_store_never_exceeds_max_sessions(make_store, clock):
+    store = make_store(max_sessions=5)
+    for i in range(20):
+        clock.now += 1
+        store.save(f"s{i}", i)
+
+    assert store.stats()["sessions"] == 5
+    assert [store.load(f"s{i}") for i in range(15, 20)] == list(range(15, 20))
+
+
+def test_backends_implement_the_interface():
+    with pytest.raises(TypeError):
+        SessionStore()
@@ -0,0 +1,77 @@
+import threading
+import time
+
+from src.utils.singleflight import SingleFlight
+
+
+def run_concurrently(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def test_concurrent_calls_share_one_run():
+    flights = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(2)
+        return {"value": 42}
+
+    threads = run_concurrently(5, lambda: results.append(flights.do("key", fetch)))
+    # Wait until the four followers are parked on the leader's call
+    for _ in range(200):
+        if flights.stats()["coalesced"] == 4:
+            break
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert len(calls) == 1
+    assert results == [({"value": 42}, True)] * 5
+    assert flights.stats() == {"in_flight": 0, "coalesced": 4}
+
+
+def test_waiters_get_the_leaders_exception():
+    flights = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def fetch():
+        started.set()
+        release.wait(2)
+        raise ValueError("upstream down")
+
+    def call():
+        try:
+            flights.do("key", fetch)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = run_concurrently(1, call)
+    started.wait(2)
+    followers = run_concurrently(3, call)
+    for _ in range(200):
+        if flights.stats()["coalesced"] == 3:
+            break
+        time.sleep(0.01)
+    release.set()
+    for thread in leader + followers:
+        thread.join(2)
+
+    assert errors == ["upstream down"] * 4
+
+
+def test_finished_calls_are_not_remembered():
+    flights = SingleFlight("test")
+    values = iter([1, 2])
+
+    assert flights.do("key", lambda: next(values)) == (1, False)
+    assert flights.do("key", lambda: next(values)) == (2, False)
+    assert flights.stats()["in_flight"] == 0
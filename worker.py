@@ -0,0 +1,150 @@
+"""
+Workers that drain the analysis job queue.
+
+The API server runs JOB_WORKERS of these in-process. More can be started on
+the same host against the same JOB_QUEUE_PATH:
+
+    python worker.py --workers 4
+
+Sessions created by standalone workers are only visible to the API server
+when both use a shared session backend (SESSION_BACKEND=sqlite or redis).
+"""
+
+import argparse
+import os
+import socket
+import threading
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+from agent import ResearchBot, node_update_payload, warmup_shared_components
+from src.utils.job_queue import JobQueue, create_job_queue
+from src.utils.logger import get_logger, set_correlation_id, start_logging, stop_logging
+from src.utils.metrics import Trace
+from src.utils.session_store import create_session_store
+
+# Load environment variables
+load_dotenv()
+
+logger = get_logger(__name__)
+
+# How often finished jobs past their retention period are deleted
+PURGE_INTERVAL_SECONDS = 60
+
+
+class LeaseLost(Exception):
+    """The job's lease expired and another worker has taken it over"""
+
+
+class JobWorker:
+    """
+    Runs queued jobs on a set of daemon threads. Each thread claims one job at
+    a time, records every finished graph node as progress and stores the
+    final analysis (and the session state, when the job has a session id).
+    """
+
+    def __init__(self, queue: JobQueue, store=None, workers: int = 1, poll_interval: float = 1.0):
+        self.queue = queue
+        self.store = store
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._loop, args=(f"{self.worker_prefix}:{index}", index == 0),
+                name=f"job-worker-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = None):
+        """
+        Stop claiming new jobs. Jobs still running after timeout are left to
+        expire their lease and be picked up by another worker.
+        """
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def run_forever(self):
+        self.start()
+        try:
+            while any(thread.is_alive() for thread in self._threads):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stop()
+
+    def _loop(self, worker_id: str, purges: bool):
+        last_purge = 0
+        while not self._stop.is_set():
+            if purges and time.time() - last_purge > PURGE_INTERVAL_SECONDS:
+                last_purge = time.time()
+                try:
+                    self.queue.purge()
+                except Exception as e:
+                    logger.warning("Error purging finished jobs: %s", e)
+
+            try:
+                job = self.queue.claim(worker_id)
+            except Exception as e:
+                logger.warning("Error claiming job: %s", e)
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            self.run_job(job, worker_id)
+
+    def run_job(self, job: dict, worker_id: str):
+        set_correlation_id(job["session_id"] or job["id"])
+        logger.info("Running job %s (attempt %d)", job["id"], job["attempts"])
+        try:
+            if job["kind"] != "analyze":
+                raise ValueError(f"Unknown job kind: {job['kind']}")
+            trace = Trace()
+            result = trace.run(self._analyze, job, worker_id)
+            result["trace"] = trace.to_dict()
+            self.queue.complete(job["id"], worker_id, result)
+        except LeaseLost:
+            logger.warning("Job %s was taken over by another worker", job["id"])
+        except Exception as e:
+            logger.exception("Job %s failed", job["id"])
+            self.queue.fail(job["id"], worker_id, str(e))
+
+    def _analyze(self, job: dict, worker_id: str) -> dict:
+        bot = ResearchBot()
+        for node, update in bot.stream_initial_query(job["payload"]["query"]):
+            if not self.queue.add_progress(job["id"], worker_id, node, node_update_payload(update)):
+                raise LeaseLost()
+
+        if job["session_id"] and self.store is not None:
+            self.store.save(job["session_id"], bot.state)
+        return {"result": bot.state.final_analysis, "has_trading_prompt": True}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run analysis job workers")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("JOB_WORKERS", "2")),
+                        help="number of jobs to run at once")
+    parser.add_argument("--poll-interval", type=float, default=1.0,
+                        help="seconds to wait between polls when the queue is empty")
+    args = parser.parse_args()
+
+    start_logging()
+    try:
+        warmup_shared_components()
+        worker = JobWorker(create_job_queue(), create_session_store(), args.workers, args.poll_interval)
+        logger.info("Running %d job workers on %s", args.workers, worker.queue.path)
+        worker.run_forever()
+    finally:
+        stop_logging()
+
+
+if __name__ == "__main__":
+    main()